@@ -0,0 +1,71 @@
+"""Latency of the portfolio risk engine on synthetic price history.
+
+Prices follow a one-factor model over ``--tickers`` names and ``--days``
+business days; the portfolio holds ``--holdings`` of them with random
+weights, regions and sectors. Reports engine build time, the latency of a
+full risk summary and of applying one new daily bar.
+
+    python benchmark_risk.py --tickers 5000 --days 2520 --holdings 500
+"""
+from risk import RiskEngine, synthetic_prices
+import numpy as np
+import pandas as pd
+import argparse
+import time
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=2520)
+    parser.add_argument("--holdings", type=int, default=500)
+    parser.add_argument("--window", type=int, default=252)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    dates, prices = synthetic_prices(tickers, args.days)
+    rng = np.random.default_rng(1)
+    held = rng.choice(args.tickers, args.holdings, replace=False)
+    holdings = pd.DataFrame({
+        "ticker": [tickers[i] for i in held],
+        "weight": rng.dirichlet(np.ones(args.holdings)),
+        "region": rng.choice(["Asia", "Europe", "North America"], args.holdings),
+        "sector": rng.choice(["Technology", "Financials", "Energy", "Healthcare"], args.holdings),
+    })
+
+    start = time.perf_counter()
+    engine = RiskEngine(dates, tickers, prices, window=args.window)
+    engine.set_portfolio(holdings)
+    build_s = time.perf_counter() - start
+
+    summary_lat = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        engine.summary()
+        summary_lat.append(time.perf_counter() - start)
+
+    bar_lat = []
+    last = prices[-1]
+    day = dates[-1]
+    for _ in range(args.repeats):
+        last = last * np.exp(rng.normal(0, 0.01, args.tickers))
+        day = np.busday_offset(day, 1, roll="forward")
+        bar = dict(zip(tickers, last.tolist()))
+        start = time.perf_counter()
+        engine.add_bar(day, bar)
+        bar_lat.append(time.perf_counter() - start)
+
+    print(f"{args.tickers} tickers x {args.days} days, window {args.window}, {args.holdings} holdings")
+    print(f"build      {build_s * 1000:9.1f} ms")
+    for name, latencies in (("summary", summary_lat), ("add_bar", bar_lat)):
+        p50, p99 = percentiles(latencies)
+        print(f"{name:<10} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
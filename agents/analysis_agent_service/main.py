@@ -1,75 +1,229 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-import numpy as np
-from textblob import TextBlob
+from typing import Any, Dict, List, Optional
+from sentiment import SentimentEngine, label, summarize, top_keywords
+from risk import RiskEngine, load_prices
+from portfolios import REQUIRED_COLUMNS, GROUP_COLUMNS, Portfolio, PortfolioRegistry
 import pandas as pd
+import asyncio
+import io
 import logging
+import os
 
 app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("analysis-agent")
 
+# Per-text sentiment cache and the worker processes that fill it
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "100000"))
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "0")) or None
+SENTIMENT_CHUNK_SIZE = int(os.getenv("SENTIMENT_CHUNK_SIZE", "256"))
+
+sentiment_engine = SentimentEngine(SENTIMENT_CACHE_SIZE, SENTIMENT_WORKERS, SENTIMENT_CHUNK_SIZE)
+
+# Risk engine: daily price history (wide date x ticker .npz/.csv/.parquet) for the portfolio's tickers
+RISK_PRICES_PATH = os.getenv("RISK_PRICES_PATH", "")
+RISK_WINDOW = int(os.getenv("RISK_WINDOW", "252"))
+RISK_EWMA_LAMBDA = float(os.getenv("RISK_EWMA_LAMBDA", "0.94"))
+PORTFOLIO_PATH = os.getenv(
+    "PORTFOLIO_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data_ingestion", "portfolio.csv")
+)
+
+risk_engine = None
+
+# Registered portfolios, referenced by handle from the exposure, sentiment and risk endpoints
+PORTFOLIO_REGISTRY_SIZE = int(os.getenv("PORTFOLIO_REGISTRY_SIZE", "256"))
+
+portfolios = PortfolioRegistry(PORTFOLIO_REGISTRY_SIZE)
+
+class PortfolioRequest(BaseModel):
+    holdings: List[Dict[str, Any]]
+
+class ExposureQuery(BaseModel):
+    region: Optional[str] = None
+    sectors: List[str] = []
+
 class ExposureRequest(BaseModel):
-    portfolio: dict
-    region: str
-    sectors: list
+    portfolio: Optional[dict] = None
+    portfolio_id: Optional[str] = None
+    region: Optional[str] = None
+    sectors: List[str] = []
+    queries: List[ExposureQuery] = []
+    previous_exposure: Optional[float] = None
 
 class SentimentRequest(BaseModel):
     news: dict
     filings: dict
     market_data: dict
+    portfolio_id: Optional[str] = None
+
+class BatchSentimentRequest(BaseModel):
+    texts: List[str]
+    keywords: bool = True
+    details: bool = True
+    portfolio_id: Optional[str] = None
 
 class RiskRequest(BaseModel):
-    prices: dict
-    exposure: dict
-
-def calculate_exposure(portfolio: pd.DataFrame, region: str, sectors: list) -> float:
-    """Calculate portfolio exposure for specific region and sectors"""
-    filtered = portfolio[
-        (portfolio['region'].str.contains(region, case=False)) &
-        (portfolio['sector'].isin(sectors))
-    ]
-    return filtered['weight'].sum() * 100
-
-def calculate_sentiment(texts: list) -> dict:
-    """Calculate sentiment scores from text inputs"""
-    sentiment_scores = []
-    for text in texts:
-        analysis = TextBlob(text)
-        sentiment_scores.append(analysis.sentiment.polarity)
-    
-    avg_score = np.mean(sentiment_scores) if sentiment_scores else 0
+    prices: dict = {}
+    exposure: dict = {}
+    portfolio_id: Optional[str] = None
+    confidence: float = 0.99
+    horizon_days: int = 1
+
+class BarRequest(BaseModel):
+    date: str
+    prices: Dict[str, float]
+
+class CovarianceRequest(BaseModel):
+    tickers: List[str]
+
+def registered_portfolio(portfolio_id: str) -> Portfolio:
+    portfolio = portfolios.get(portfolio_id)
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail=f"Unknown portfolio {portfolio_id}; register it via /portfolios")
+    return portfolio
+
+def register_portfolio(holdings: pd.DataFrame) -> dict:
+    try:
+        handle, portfolio, created = portfolios.register(holdings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"portfolio_id": handle, "created": created, **portfolio.describe()}
+
+def portfolio_sentiment(portfolio: Portfolio, texts: List[str], scores) -> dict:
+    """Sentiment per held ticker the texts mention, and its holding-weighted average"""
+    mentions: Dict[int, List[float]] = {}
+    for text, (polarity, _, _) in zip(texts, scores):
+        for code in portfolio.mentioned(text):
+            mentions.setdefault(code, []).append(polarity)
+    tickers = {
+        portfolio.ticker_names[code]: {
+            "score": round(sum(polarities) / len(polarities), 4),
+            "mentions": len(polarities),
+            "weight": round(float(portfolio.ticker_weights[code]), 6)
+        }
+        for code, polarities in sorted(mentions.items(), key=lambda item: -portfolio.ticker_weights[item[0]])
+    }
+    covered = sum(t["weight"] for t in tickers.values())
+    score = sum(t["score"] * t["weight"] for t in tickers.values()) / covered if covered else 0.0
     return {
-        "score": avg_score,
-        "sentiment": "positive" if avg_score > 0.1 else 
-                     "negative" if avg_score < -0.1 else "neutral"
+        "score": round(score, 4),
+        "sentiment": label(score),
+        "coverage_pct": round(covered / portfolio.total_weight * 100, 2) if portfolio.total_weight else 0.0,
+        "tickers": tickers
     }
 
+def portfolio_risk_view(portfolio: Portfolio) -> dict:
+    """Portfolio weights aligned to the risk engine's price columns, prepared once per engine"""
+    key = id(risk_engine)
+    if key not in portfolio.risk_views:
+        portfolio.risk_views = {key: risk_engine.prepare(portfolio.holdings())}
+    return portfolio.risk_views[key]
+
+def load_risk_engine():
+    """Build the risk engine from the price history, or None when there is none"""
+    if not RISK_PRICES_PATH or not os.path.exists(RISK_PRICES_PATH):
+        logger.info("No RISK_PRICES_PATH price history; /analyze_risk uses the caller's volatility")
+        return None
+    dates, tickers, prices = load_prices(RISK_PRICES_PATH)
+    engine = RiskEngine(dates, tickers, prices, window=RISK_WINDOW, ewma_lambda=RISK_EWMA_LAMBDA)
+    engine.set_portfolio(pd.read_csv(PORTFOLIO_PATH))
+    logger.info(f"Risk engine loaded {len(tickers)} tickers x {len(dates)} days")
+    return engine
+
+def risk_level(score: float) -> str:
+    return "high" if score > 70 else "medium" if score > 30 else "low"
+
+@app.on_event("startup")
+async def startup_event():
+    global risk_engine
+    sentiment_engine.start()
+    try:
+        risk_engine = load_risk_engine()
+    except Exception as e:
+        logger.error(f"Risk engine failed to load: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    sentiment_engine.stop()
+
+@app.post("/portfolios")
+async def create_portfolio(request: PortfolioRequest):
+    """Register holdings once; later calls pass the returned portfolio_id instead of the holdings"""
+    return register_portfolio(pd.DataFrame(request.holdings))
+
+@app.post("/portfolios/upload")
+async def upload_portfolio(request: Request, format: str = "csv"):
+    """Register a raw CSV or parquet body (ticker, weight, optionally region and sector)"""
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}', expected csv or parquet")
+    body = io.BytesIO()
+    async for data in request.stream():
+        body.write(data)
+    body.seek(0)
+    columns = set(REQUIRED_COLUMNS + GROUP_COLUMNS)
+
+    def parse():
+        if format == "parquet":
+            return pd.read_parquet(body)
+        return pd.read_csv(body, usecols=lambda column: column in columns)
+
+    try:
+        holdings = await asyncio.get_running_loop().run_in_executor(None, parse)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse portfolio: {str(e)}")
+    return register_portfolio(holdings)
+
+@app.get("/portfolios/{portfolio_id}")
+async def get_portfolio(portfolio_id: str):
+    portfolio = registered_portfolio(portfolio_id)
+    return {"portfolio_id": portfolio_id, "registered_at": portfolios.registered_at(portfolio_id), **portfolio.describe()}
+
+@app.delete("/portfolios/{portfolio_id}")
+async def delete_portfolio(portfolio_id: str):
+    if not portfolios.remove(portfolio_id):
+        raise HTTPException(status_code=404, detail=f"Unknown portfolio {portfolio_id}")
+    return {"status": "deleted", "portfolio_id": portfolio_id}
+
 @app.post("/analyze_exposure")
 async def analyze_exposure(request: ExposureRequest):
+    if request.portfolio_id:
+        portfolio = registered_portfolio(request.portfolio_id)
     try:
-        # Convert to DataFrame
-        portfolio = pd.DataFrame(request.portfolio.get("holdings", []))
-        
-        # Calculate exposure
-        exposure = calculate_exposure(portfolio, request.region, request.sectors)
-        
-        # Calculate change from previous day
-        prev_exposure = request.portfolio.get("previous_exposure", exposure)
-        change = exposure - prev_exposure
-        
-        return {
-            "current_exposure": round(exposure, 2),
-            "previous_exposure": round(prev_exposure, 2),
-            "change": round(change, 2),
-            "change_pct": round((change / prev_exposure * 100) if prev_exposure else 0, 2)
-        }
+        if not request.portfolio_id:
+            # Unregistered holdings are still accepted, at the cost of building the columns per call
+            portfolio = Portfolio(pd.DataFrame((request.portfolio or {}).get("holdings", [])))
+        previous = request.previous_exposure
+        if previous is None and request.portfolio:
+            previous = request.portfolio.get("previous_exposure")
+
+        response = {}
+        if request.queries:
+            exposures = portfolio.exposures([(q.region, q.sectors) for q in request.queries])
+            response["exposures"] = [
+                {"region": q.region, "sectors": q.sectors, "exposure": round(exposure, 2)}
+                for q, exposure in zip(request.queries, exposures)
+            ]
+        if request.region or request.sectors or not request.queries:
+            exposure = portfolio.exposure(request.region, request.sectors)
+            # Change from the previous day
+            prev_exposure = exposure if previous is None else previous
+            change = exposure - prev_exposure
+            response.update({
+                "current_exposure": round(exposure, 2),
+                "previous_exposure": round(prev_exposure, 2),
+                "change": round(change, 2),
+                "change_pct": round((change / prev_exposure * 100) if prev_exposure else 0, 2)
+            })
+        return response
     except Exception as e:
         logger.error(f"Exposure analysis failed: {str(e)}")
         return {"error": str(e)}
 
 @app.post("/analyze_sentiment")
 async def analyze_sentiment(request: SentimentRequest):
+    portfolio = registered_portfolio(request.portfolio_id) if request.portfolio_id else None
     try:
         # Combine all text sources
         texts = []
@@ -77,27 +231,72 @@ async def analyze_sentiment(request: SentimentRequest):
         texts.extend(request.filings.get("summaries", []))
         texts.extend([n["title"] for n in request.market_data.get("news", [])])
         
-        # Calculate sentiment
-        sentiment = calculate_sentiment(texts)
+        # Calculate sentiment; cached per text, misses scored off the event loop
+        scores = await sentiment_engine.score(texts)
+        sentiment = summarize(scores)
         
-        # Add keyword extraction
-        combined_text = " ".join(texts)
-        blob = TextBlob(combined_text)
-        top_nouns = [np for np in blob.noun_phrases][:10]
-        
-        return {
+        response = {
             "sentiment": sentiment["sentiment"],
             "score": round(sentiment["score"], 4),
-            "keywords": top_nouns
+            "keywords": top_keywords(scores)
         }
+        if portfolio is not None:
+            response["portfolio"] = portfolio_sentiment(portfolio, texts, scores)
+        return response
     except Exception as e:
         logger.error(f"Sentiment analysis failed: {str(e)}")
         return {"error": str(e)}
 
+@app.post("/analyze_sentiment/batch")
+async def analyze_sentiment_batch(request: BatchSentimentRequest):
+    """Score thousands of texts in one call, with per-text results and an aggregate"""
+    portfolio = registered_portfolio(request.portfolio_id) if request.portfolio_id else None
+    try:
+        scores = await sentiment_engine.score(request.texts)
+        sentiment = summarize(scores)
+        response = {
+            "count": len(scores),
+            "sentiment": sentiment["sentiment"],
+            "score": round(sentiment["score"], 4)
+        }
+        if request.keywords:
+            response["keywords"] = top_keywords(scores)
+        if request.details:
+            response["results"] = [
+                {"score": round(polarity, 4), "subjectivity": round(subjectivity, 4), "sentiment": label(polarity)}
+                for polarity, subjectivity, _ in scores
+            ]
+        if portfolio is not None:
+            response["portfolio"] = portfolio_sentiment(portfolio, request.texts, scores)
+        return response
+    except Exception as e:
+        logger.error(f"Batch sentiment analysis failed: {str(e)}")
+        return {"error": str(e)}
+
 @app.post("/analyze_risk")
 async def analyze_risk(request: RiskRequest):
+    portfolio = registered_portfolio(request.portfolio_id) if request.portfolio_id else None
+    if portfolio is not None and risk_engine is None and "current_exposure" not in request.exposure:
+        raise HTTPException(status_code=503, detail="No price history loaded to score a registered portfolio")
     try:
-        # Simplified risk analysis
+        if risk_engine is not None:
+            view = portfolio_risk_view(portfolio) if portfolio is not None else None
+            summary = risk_engine.summary(request.confidence, request.horizon_days, portfolio=view)
+            # Annualized volatility of 35%+ reads as high risk
+            risk_score = min(100.0, summary["ewma_volatility_annual"] * 2)
+            concentrations = [
+                f"{field}_concentration:{name}"
+                for field, shares in summary["contribution_pct"].items()
+                for name, share in shares.items() if share > 50
+            ]
+            return {
+                "risk_score": round(risk_score, 1),
+                "risk_level": risk_level(risk_score),
+                "key_risks": concentrations + [c["ticker"] for c in summary["top_contributors"][:3]],
+                "metrics": summary
+            }
+
+        # Simplified risk analysis when no price history is loaded
         exposure = request.exposure.get("current_exposure", 0)
         volatility = request.prices.get("avg_volatility", 0)
         
@@ -106,8 +305,7 @@ async def analyze_risk(request: RiskRequest):
         
         return {
             "risk_score": round(risk_score, 1),
-            "risk_level": "high" if risk_score > 70 else 
-                         "medium" if risk_score > 30 else "low",
+            "risk_level": risk_level(risk_score),
             "key_risks": [
                 "sector_concentration",
                 "earnings_volatility"
@@ -117,6 +315,38 @@ async def analyze_risk(request: RiskRequest):
         logger.error(f"Risk analysis failed: {str(e)}")
         return {"error": str(e)}
 
+@app.get("/risk/summary")
+async def risk_summary(confidence: float = 0.99, horizon_days: int = 1, top_n: int = 10):
+    """Volatility, VaR/CVaR and region/sector/ticker risk contributions"""
+    if risk_engine is None:
+        raise HTTPException(status_code=503, detail="No price history loaded")
+    return risk_engine.summary(confidence, horizon_days, top_n)
+
+@app.post("/risk/bars")
+async def add_risk_bar(request: BarRequest):
+    """Apply one new daily bar without recomputing the window"""
+    if risk_engine is None:
+        raise HTTPException(status_code=503, detail="No price history loaded")
+    try:
+        applied = risk_engine.add_bar(request.date, request.prices)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "as_of": str(risk_engine.last_date), "prices_applied": applied}
+
+@app.post("/risk/covariance")
+async def risk_covariance(request: CovarianceRequest):
+    """Daily EWMA covariance matrix for the requested tickers"""
+    if risk_engine is None:
+        raise HTTPException(status_code=503, detail="No price history loaded")
+    unknown = [t for t in request.tickers if t not in risk_engine.ticker_index]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"No price history for {', '.join(unknown)}")
+    return {"tickers": request.tickers, "covariance": risk_engine.ewma_covariance(request.tickers).tolist()}
+
+@app.get("/metrics")
+async def metrics():
+    return {"sentiment_cache": sentiment_engine.metrics(), "portfolios": portfolios.metrics()}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "analysis-agent"}
\ No newline at end of file
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import threading
+import hashlib
+import time
+import re
+
+REQUIRED_COLUMNS = ["ticker", "weight"]
+GROUP_COLUMNS = ["region", "sector"]
+UNASSIGNED = "Unassigned"
+
+# Candidate ticker tokens in free text, e.g. TSM, 005930.KS, BRK-B
+TICKER_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[.\-][A-Za-z0-9]+)*")
+
+
+class Portfolio:
+    """Holdings stored column-wise: dictionary-coded region/sector/ticker and float weights.
+
+    A (region x sector) weight matrix is aggregated once, so an exposure query
+    only matches the region and sector names and sums a block of that matrix,
+    however many lots the book holds.
+    """
+
+    def __init__(self, holdings: pd.DataFrame):
+        missing = [c for c in REQUIRED_COLUMNS if c not in holdings]
+        if missing:
+            raise ValueError(f"Holdings are missing column(s): {', '.join(missing)}")
+        holdings = holdings.dropna(subset=REQUIRED_COLUMNS)
+        self.rows = len(holdings)
+        self.weights = holdings["weight"].to_numpy(dtype=np.float64)
+        self.ticker_codes, self.ticker_names = self._encode(holdings["ticker"])
+        self.codes: Dict[str, np.ndarray] = {}
+        self.names: Dict[str, List[str]] = {}
+        for field in GROUP_COLUMNS:
+            values = holdings[field] if field in holdings else pd.Series(UNASSIGNED, index=holdings.index)
+            self.codes[field], self.names[field] = self._encode(values.fillna(UNASSIGNED))
+
+        shape = (len(self.names["region"]), len(self.names["sector"]))
+        flat = self.codes["region"] * shape[1] + self.codes["sector"]
+        self.group_weights = np.bincount(flat, weights=self.weights, minlength=shape[0] * shape[1]).reshape(shape)
+        self.ticker_weights = np.bincount(self.ticker_codes, weights=self.weights, minlength=len(self.ticker_names))
+        self.ticker_lookup = {ticker.upper(): i for i, ticker in enumerate(self.ticker_names)}
+        self.total_weight = float(self.weights.sum())
+        self.risk_views: Dict[int, dict] = {}
+
+    @staticmethod
+    def _encode(values: pd.Series) -> Tuple[np.ndarray, List[str]]:
+        codes, names = pd.factorize(values.astype(str), sort=True)
+        return codes.astype(np.int32), [str(name) for name in names]
+
+    def holdings(self) -> pd.DataFrame:
+        """One row per ticker with its total weight and its first region/sector"""
+        first = np.unique(self.ticker_codes, return_index=True)[1]
+        return pd.DataFrame({
+            "ticker": self.ticker_names,
+            "weight": self.ticker_weights,
+            **{field: np.asarray(self.names[field], dtype=object)[self.codes[field][first]] for field in GROUP_COLUMNS}
+        })
+
+    def _region_mask(self, region: Optional[str]) -> np.ndarray:
+        # Substring, case-insensitive, as /analyze_exposure always matched regions
+        if not region:
+            return np.ones(len(self.names["region"]), dtype=bool)
+        needle = region.lower()
+        return np.array([needle in name.lower() for name in self.names["region"]], dtype=bool)
+
+    def _sector_mask(self, sectors: Optional[Sequence[str]]) -> np.ndarray:
+        if not sectors:
+            return np.ones(len(self.names["sector"]), dtype=bool)
+        wanted = set(sectors)
+        return np.array([name in wanted for name in self.names["sector"]], dtype=bool)
+
+    def exposure(self, region: Optional[str], sectors: Optional[Sequence[str]]) -> float:
+        """Weight (%) in the region and any of the sectors"""
+        return self.exposures([(region, sectors)])[0]
+
+    def exposures(self, queries: Sequence[Tuple[Optional[str], Optional[Sequence[str]]]]) -> List[float]:
+        """Exposure (%) for each (region, sectors) pair; masks are computed once per distinct value"""
+        region_masks: Dict[Optional[str], np.ndarray] = {}
+        sector_masks: Dict[tuple, np.ndarray] = {}
+        results = []
+        for region, sectors in queries:
+            if region not in region_masks:
+                region_masks[region] = self._region_mask(region)
+            sector_key = tuple(sectors or ())
+            if sector_key not in sector_masks:
+                sector_masks[sector_key] = self._sector_mask(sectors)
+            block = self.group_weights[np.ix_(region_masks[region], sector_masks[sector_key])]
+            results.append(float(block.sum()) * 100)
+        return results
+
+    def mentioned(self, text: str) -> List[int]:
+        """Ticker codes of the holdings a text names"""
+        codes = {self.ticker_lookup.get(token.upper()) for token in TICKER_TOKEN.findall(text)}
+        codes.discard(None)
+        return sorted(codes)
+
+    def describe(self) -> dict:
+        groups = [
+            {"region": self.names["region"][r], "sector": self.names["sector"][s],
+             "exposure": round(float(self.group_weights[r, s]) * 100, 2)}
+            for r, s in zip(*np.nonzero(self.group_weights))
+        ]
+        return {
+            "rows": self.rows,
+            "tickers": len(self.ticker_names),
+            "total_weight": round(self.total_weight, 6),
+            "regions": self.names["region"],
+            "sectors": self.names["sector"],
+            "groups": sorted(groups, key=lambda group: -group["exposure"])
+        }
+
+
+def portfolio_id(holdings: pd.DataFrame) -> str:
+    """Content hash of the holdings, so re-registering the same book returns the same handle"""
+    columns = [c for c in REQUIRED_COLUMNS + GROUP_COLUMNS if c in holdings]
+    digest = hashlib.sha1(",".join(columns).encode())
+    digest.update(pd.util.hash_pandas_object(holdings[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+class PortfolioRegistry:
+    """LRU of registered portfolios by handle; handles are process-local and not persisted"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Portfolio, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"registered": 0, "reused": 0, "evictions": 0, "lookups": 0, "misses": 0}
+
+    def register(self, holdings: pd.DataFrame) -> Tuple[str, Portfolio, bool]:
+        """(handle, portfolio, created); an identical book already registered is reused"""
+        handle = portfolio_id(holdings)
+        with self.lock:
+            if handle in self.entries:
+                self.entries.move_to_end(handle)
+                self.stats["reused"] += 1
+                return handle, self.entries[handle][0], False
+        portfolio = Portfolio(holdings)
+        with self.lock:
+            self.entries[handle] = (portfolio, time.time())
+            self.entries.move_to_end(handle)
+            self.stats["registered"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return handle, portfolio, True
+
+    def get(self, handle: str) -> Optional[Portfolio]:
+        with self.lock:
+            self.stats["lookups"] += 1
+            entry = self.entries.get(handle)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(handle)
+            return entry[0]
+
+    def registered_at(self, handle: str) -> Optional[float]:
+        entry = self.entries.get(handle)
+        return entry[1] if entry else None
+
+    def remove(self, handle: str) -> bool:
+        with self.lock:
+            return self.entries.pop(handle, None) is not None
+
+    def metrics(self) -> dict:
+        return {"entries": len(self.entries), "capacity": self.max_entries, **self.stats}
@@ -0,0 +1,235 @@
+from statistics import NormalDist
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import threading
+
+TRADING_DAYS = 252
+
+
+def load_prices(path: str) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """(dates, tickers, prices[T, N]) from an .npz with those arrays or a wide CSV/parquet (date x ticker)"""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as data:
+            return data["dates"].astype("datetime64[D]"), [str(t) for t in data["tickers"]], data["prices"]
+    frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path, index_col=0)
+    frame = frame.sort_index()
+    return (np.asarray(pd.to_datetime(frame.index).values, dtype="datetime64[D]"),
+            [str(t) for t in frame.columns], frame.to_numpy(dtype=np.float64))
+
+
+def save_prices(path: str, dates: np.ndarray, tickers: Sequence[str], prices: np.ndarray):
+    np.savez(path, dates=np.asarray(dates, dtype="datetime64[D]"), tickers=np.asarray(tickers), prices=prices)
+
+
+def synthetic_prices(tickers: Sequence[str], days: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Business-day dates and one-factor log-normal prices, for benchmarks and local runs"""
+    rng = np.random.default_rng(seed)
+    n = len(tickers)
+    market = rng.normal(0.0003, 0.01, days)
+    betas = rng.uniform(0.5, 1.5, n)
+    idio = rng.uniform(0.005, 0.03, n)
+    returns = market[:, None] * betas + rng.standard_normal((days, n)) * idio
+    prices = 100 * np.exp(np.cumsum(returns, axis=0))
+    dates = np.busday_offset(np.datetime64("2015-01-02"), np.arange(days), roll="forward")
+    return dates, prices
+
+
+class RiskEngine:
+    """Portfolio risk over a rolling window of daily log returns.
+
+    Returns live in a ring buffer of ``window`` rows x tickers, with running
+    sums for rolling volatility and an EWMA variance vector, so a new daily bar
+    costs O(tickers). The EWMA covariance is kept factored as the weighted
+    return rows: portfolio variance and risk contributions are O(window x
+    tickers) matrix-vector products, and a dense covariance is only formed for
+    the tickers asked for.
+    """
+
+    def __init__(self, dates: np.ndarray, tickers: Sequence[str], prices: np.ndarray,
+                 window: int = TRADING_DAYS, ewma_lambda: float = 0.94):
+        if prices.shape != (len(dates), len(tickers)):
+            raise ValueError(f"Price matrix {prices.shape} does not match {len(dates)} dates x {len(tickers)} tickers")
+        if len(dates) < 2:
+            raise ValueError("Need at least two days of prices")
+        self.tickers = list(tickers)
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.window = window
+        self.ewma_lambda = ewma_lambda
+        self.lock = threading.RLock()
+
+        prices = self._fill(np.asarray(prices, dtype=np.float64))
+        returns = np.diff(np.log(prices), axis=0)[-window:]
+        self.buffer = np.zeros((window, len(self.tickers)))
+        self.buffer[:len(returns)] = returns
+        self.count = len(returns)
+        self.head = len(returns) % window  # next row to write
+        self.last_prices = prices[-1].copy()
+        self.last_date = np.datetime64(dates[-1], "D")
+        self.bars_since_resync = 0
+        self._resync()
+
+        self.portfolio = self.prepare(pd.DataFrame({"ticker": [], "weight": []}))
+        self.portfolio_returns = np.zeros(window)
+
+    @staticmethod
+    def _fill(prices: np.ndarray) -> np.ndarray:
+        """Forward-fill gaps, then back-fill leading gaps, so missing bars read as zero returns"""
+        frame = pd.DataFrame(prices).ffill().bfill()
+        return frame.to_numpy(dtype=np.float64)
+
+    def _ewma_weights(self) -> np.ndarray:
+        """Normalized EWMA weight of each ring row in buffer order; unfilled rows weigh zero"""
+        ages = (self.head - 1 - np.arange(self.window)) % self.window
+        weights = np.where(ages < self.count, (1 - self.ewma_lambda) * self.ewma_lambda ** ages, 0.0)
+        return weights / weights.sum()
+
+    def _resync(self):
+        """Recompute running statistics from the buffer (also bounds float drift)"""
+        self.sums = self.buffer.sum(axis=0)
+        self.sq_sums = np.einsum("tn,tn->n", self.buffer, self.buffer)
+        self.ewma_var = np.einsum("t,tn,tn->n", self._ewma_weights(), self.buffer, self.buffer)
+        self.bars_since_resync = 0
+
+    def prepare(self, holdings: pd.DataFrame) -> dict:
+        """Weights and region/sector codes aligned to the price columns; holdings need ticker and
+        weight, optionally region and sector"""
+        weights = np.zeros(len(self.tickers))
+        positions = holdings["ticker"].map(self.ticker_index)
+        covered = positions.notna().to_numpy()
+        columns = positions[covered].astype(int).to_numpy()
+        # Repeated tickers (several lots) add up
+        np.add.at(weights, columns, holdings.loc[covered, "weight"].to_numpy(dtype=np.float64))
+        group_codes = {}
+        for field in ("region", "sector"):
+            if field in holdings:
+                labels = np.full(len(self.tickers), "Unassigned", dtype=object)
+                labels[columns] = holdings.loc[covered, field].fillna("Unassigned").to_numpy()
+                names, codes = np.unique(labels.astype(str), return_inverse=True)
+                group_codes[field] = (codes, [str(name) for name in names])
+        return {
+            "weights": weights,
+            "group_codes": group_codes,
+            "uncovered_weight": float(holdings.loc[~covered, "weight"].sum())
+        }
+
+    def set_portfolio(self, holdings: pd.DataFrame):
+        """Default portfolio, whose returns are maintained bar by bar"""
+        with self.lock:
+            self.portfolio = self.prepare(holdings)
+            # Portfolio returns share the buffer's ring order; unfilled rows are zero
+            self.portfolio_returns = self.buffer @ self.portfolio["weights"]
+
+    def add_bar(self, date, prices: Dict[str, float]) -> int:
+        """Apply one daily bar incrementally; tickers without a price carry their last price"""
+        with self.lock:
+            date = np.datetime64(date, "D")
+            if date <= self.last_date:
+                raise ValueError(f"Bar for {date} is not after the last bar {self.last_date}")
+            new_prices = self.last_prices.copy()
+            applied = 0
+            for ticker, price in prices.items():
+                i = self.ticker_index.get(ticker)
+                if i is not None and price and np.isfinite(price) and price > 0:
+                    new_prices[i] = price
+                    applied += 1
+            returns = np.log(new_prices / self.last_prices)
+
+            if self.count == self.window:
+                dropped = self.buffer[self.head]
+                self.sums -= dropped
+                self.sq_sums -= dropped ** 2
+            else:
+                self.count += 1
+            self.buffer[self.head] = returns
+            self.portfolio_returns[self.head] = returns @ self.portfolio["weights"]
+            self.head = (self.head + 1) % self.window
+            self.sums += returns
+            self.sq_sums += returns ** 2
+            self.ewma_var = self.ewma_lambda * self.ewma_var + (1 - self.ewma_lambda) * returns ** 2
+            self.last_prices, self.last_date = new_prices, date
+            self.bars_since_resync += 1
+            if self.bars_since_resync >= self.window:
+                self._resync()
+            return applied
+
+    def volatility(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Annualized (rolling window, EWMA) volatility per ticker"""
+        with self.lock:
+            n = max(self.count, 2)
+            variance = np.maximum((self.sq_sums - self.sums ** 2 / n) / (n - 1), 0)
+            return np.sqrt(variance * TRADING_DAYS), np.sqrt(self.ewma_var * TRADING_DAYS)
+
+    def ewma_covariance(self, tickers: Sequence[str]) -> np.ndarray:
+        """Dense daily EWMA covariance for a subset of tickers"""
+        with self.lock:
+            columns = [self.ticker_index[t] for t in tickers]
+            rows = self.buffer[:, columns]
+            return (rows * self._ewma_weights()[:, None]).T @ rows
+
+    def summary(self, confidence: float = 0.99, horizon_days: int = 1, top_n: int = 10,
+                portfolio: dict = None) -> dict:
+        """Volatility, parametric and historical VaR/CVaR and risk contributions of the default
+        portfolio, or of one from ``prepare``"""
+        with self.lock:
+            if portfolio is None:
+                portfolio, portfolio_returns = self.portfolio, self.portfolio_returns
+            else:
+                portfolio_returns = self.buffer @ portfolio["weights"]
+            weights = portfolio["weights"]
+            ewma = self._ewma_weights()
+            # Filled rows only; VaR quantiles don't depend on their order
+            history = portfolio_returns[:self.count] if self.count < self.window else portfolio_returns
+
+            # Factored EWMA covariance: Sigma w = X^T diag(c) X w
+            sigma_w = self.buffer.T @ (ewma * portfolio_returns)
+            variance = float(weights @ sigma_w)
+            sigma = float(np.sqrt(max(variance, 0.0)))
+            scale = np.sqrt(horizon_days)
+
+            z = NormalDist().inv_cdf(confidence)
+            parametric_var = float(z * sigma * scale)
+            parametric_cvar = float(sigma * scale * NormalDist().pdf(z) / (1 - confidence))
+
+            losses = -history * scale
+            historical_var = float(np.quantile(losses, confidence)) if len(losses) else 0.0
+            tail = losses[losses >= historical_var]
+            historical_cvar = float(tail.mean()) if len(tail) else historical_var
+
+            contributions = weights * sigma_w / sigma if sigma > 0 else np.zeros_like(weights)
+            groups = {}
+            for field, (codes, names) in portfolio["group_codes"].items():
+                totals = np.bincount(codes, weights=contributions, minlength=len(names))
+                groups[field] = {
+                    name: round(float(total / sigma * 100) if sigma > 0 else 0.0, 2)
+                    for name, total in sorted(zip(names, totals), key=lambda item: -item[1]) if total
+                }
+            top = np.argsort(-np.abs(contributions))[:top_n]
+            rolling_vol, ewma_vol = self.volatility()
+            held = weights != 0
+
+            return {
+                "as_of": str(self.last_date),
+                "window_days": int(self.count),
+                "confidence": confidence,
+                "horizon_days": horizon_days,
+                "units": "percent of portfolio value",
+                "ewma_volatility_annual": round(sigma * np.sqrt(TRADING_DAYS) * 100, 4),
+                "realized_volatility_annual": round(float(np.std(history, ddof=1) * np.sqrt(TRADING_DAYS) * 100), 4)
+                if len(history) > 1 else 0.0,
+                "var": {"parametric": round(parametric_var * 100, 4), "historical": round(historical_var * 100, 4)},
+                "cvar": {"parametric": round(parametric_cvar * 100, 4), "historical": round(historical_cvar * 100, 4)},
+                "contribution_pct": groups,
+                "top_contributors": [
+                    {
+                        "ticker": self.tickers[i],
+                        "weight": round(float(weights[i]), 6),
+                        "contribution_pct": round(float(contributions[i] / sigma * 100) if sigma > 0 else 0.0, 2),
+                        "volatility_annual": round(float(rolling_vol[i]) * 100, 2),
+                        "ewma_volatility_annual": round(float(ewma_vol[i]) * 100, 2)
+                    }
+                    for i in top if contributions[i]
+                ],
+                "holdings_covered": int(held.sum()),
+                "uncovered_weight": round(portfolio["uncovered_weight"], 6)
+            }
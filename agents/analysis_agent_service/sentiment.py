@@ -0,0 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger("analysis-agent")
+
+# (polarity, subjectivity, noun phrases) for one text
+TextScore = Tuple[float, float, Tuple[str, ...]]
+
+
+def score_texts(texts: Sequence[str]) -> List[TextScore]:
+    """Score a chunk of texts; runs in a worker process"""
+    from textblob import TextBlob
+
+    results = []
+    for text in texts:
+        blob = TextBlob(text)
+        sentiment = blob.sentiment
+        results.append((sentiment.polarity, sentiment.subjectivity, tuple(blob.noun_phrases)))
+    return results
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def label(score: float) -> str:
+    return "positive" if score > 0.1 else "negative" if score < -0.1 else "neutral"
+
+
+def top_keywords(scores: Sequence[TextScore], limit: int = 10) -> List[str]:
+    """Most frequent noun phrases across texts, ties broken by first appearance"""
+    counts: Dict[str, int] = {}
+    for _, _, phrases in scores:
+        for phrase in phrases:
+            counts[phrase] = counts.get(phrase, 0) + 1
+    return sorted(counts, key=lambda phrase: -counts[phrase])[:limit]
+
+
+def summarize(scores: Sequence[TextScore]) -> dict:
+    polarity = np.fromiter((score[0] for score in scores), dtype=np.float64, count=len(scores))
+    avg_score = float(polarity.mean()) if len(polarity) else 0.0
+    return {"score": avg_score, "sentiment": label(avg_score)}
+
+
+class SentimentEngine:
+    """Content-addressed LRU of per-text sentiment, filled by a process pool.
+
+    Each distinct text is scored once: hits come from the cache, concurrent
+    requests for the same miss share one in-flight future, and misses are
+    scored in chunks on worker processes so TextBlob never blocks the event loop.
+    """
+
+    def __init__(self, max_entries: int = 100_000, workers: int = None, chunk_size: int = 256):
+        self.max_entries = max_entries
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.entries: "OrderedDict[str, TextScore]" = OrderedDict()
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.pool = None
+        self.stats = {"hits": 0, "misses": 0, "scored": 0, "evictions": 0}
+
+    def start(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _store(self, key: str, score: TextScore):
+        self.entries[key] = score
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def _score_chunk(self, keys: List[str], texts: List[str]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.pool, score_texts, texts)
+        except Exception as e:
+            logger.error(f"Sentiment scoring failed ({len(texts)} texts): {str(e)}")
+            for key in keys:
+                future = self.in_flight.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.stats["scored"] += len(texts)
+        for key, result in zip(keys, results):
+            self._store(key, result)
+            future = self.in_flight.pop(key)
+            if not future.done():
+                future.set_result(result)
+
+    async def score(self, texts: Sequence[str]) -> List[TextScore]:
+        """Per-text (polarity, subjectivity, noun phrases), in input order"""
+        keys = [text_key(text) for text in texts]
+        loop = asyncio.get_running_loop()
+        pending: Dict[str, str] = {}
+        waits: Dict[str, asyncio.Future] = {}
+        cached: Dict[str, TextScore] = {}
+        for key, text in zip(keys, texts):
+            if key in cached or key in waits:
+                continue
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                cached[key] = self.entries[key]
+                continue
+            if key in self.in_flight:
+                waits[key] = self.in_flight[key]
+                continue
+            future = loop.create_future()
+            self.in_flight[key] = future
+            waits[key] = future
+            pending[key] = text
+
+        self.stats["hits"] += len(keys) - len(pending)
+        self.stats["misses"] += len(pending)
+        if pending:
+            miss_keys = list(pending)
+            # Shielded: other requests may be waiting on these futures if this caller goes away
+            await asyncio.shield(asyncio.gather(*(
+                self._score_chunk(miss_keys[i:i + self.chunk_size],
+                                  [pending[key] for key in miss_keys[i:i + self.chunk_size]])
+                for i in range(0, len(miss_keys), self.chunk_size)
+            )))
+
+        return [cached[key] if key in cached else await waits[key] for key in keys]
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self.entries),
+            "capacity": self.max_entries,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            **self.stats
+        }
@@ -0,0 +1,111 @@
+"""Startup time and memory of CSV vs memory-mapped Arrow portfolio loading.
+
+Synthetic portfolios are generated for each size, converted with
+portfolio_store, and every loader runs in a fresh process so resident
+memory reflects only that loader.
+
+    python benchmark_portfolio.py --rows 10000 1000000 10000000
+"""
+from portfolio_store import PORTFOLIO_COLUMNS, convert_portfolio, load_portfolio
+from exposure import ExposureIndex
+import multiprocessing as mp
+import pandas as pd
+import numpy as np
+import argparse
+import tempfile
+import time
+import os
+
+REGIONS = ["Asia", "Asia Pacific", "Europe", "North America", "Global", "LatAm"]
+SECTORS = ["Technology", "Financials", "Energy", "Healthcare", "Industrials", "Consumer"]
+
+
+def rss_mb(field: str = "VmRSS") -> float:
+    """Resident memory of this process from /proc, in MB (Linux only)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def write_portfolio(path: str, rows: int, tickers: int = 5000, chunk_rows: int = 1_000_000):
+    rng = np.random.default_rng(0)
+    names = np.array([f"TK{i:05d}" for i in range(tickers)])
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        pd.DataFrame({
+            "ticker": names[rng.integers(0, tickers, n)],
+            "sector": rng.choice(SECTORS, n),
+            "region": rng.choice(REGIONS, n),
+            "weight": rng.random(n) / rows,
+        })[PORTFOLIO_COLUMNS].to_csv(path, mode="a", header=start == 0, index=False)
+
+
+# Both plain loaders finish with the same aggregation, so every value the service uses is
+# materialized: otherwise the Arrow figures would only time a memory map
+def weights_by_group(df: pd.DataFrame) -> pd.Series:
+    return df.dropna().groupby(['region', 'sector'], observed=True)['weight'].sum()
+
+
+def load_csv(path):
+    return weights_by_group(pd.read_csv(path, usecols=PORTFOLIO_COLUMNS))
+
+
+def load_arrow(path):
+    return weights_by_group(load_portfolio(path, PORTFOLIO_COLUMNS).to_pandas())
+
+
+LOADERS = {
+    "csv": load_csv,
+    "arrow": load_arrow,
+    "csv-index": ExposureIndex,
+    "arrow-index": ExposureIndex,
+}
+
+
+def run_loader(name: str, path: str, results):
+    baseline = rss_mb()
+    start = time.perf_counter()
+    loaded = LOADERS[name](path)
+    elapsed = time.perf_counter() - start
+    results.put({"loader": name, "seconds": elapsed, "rss_mb": rss_mb() - baseline})
+    del loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", nargs="+", type=int, default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--workdir", help="where to write the synthetic portfolios (default: a temp dir)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="portfolio-bench-")
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+
+    print(f"{'rows':>10}  {'loader':<12}{'startup s':>11}{'RSS MB':>10}{'file MB':>10}")
+    for rows in args.rows:
+        csv_path = os.path.join(workdir, f"portfolio_{rows}.csv")
+        if not os.path.exists(csv_path):
+            write_portfolio(csv_path, rows)
+        start = time.perf_counter()
+        # Not the CSV's sibling .arrow, which ExposureIndex would pick up for the csv-index run
+        arrow_path = convert_portfolio(csv_path, os.path.join(workdir, f"portfolio_{rows}_columnar.arrow"))
+        print(f"{rows:>10}  {'convert':<12}{time.perf_counter() - start:>11.2f}{'':>10}"
+              f"{os.path.getsize(arrow_path) / 1e6:>10.1f}")
+
+        for name in LOADERS:
+            path = arrow_path if name.startswith("arrow") else csv_path
+            proc = ctx.Process(target=run_loader, args=(name, path, results))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                print(f"{rows:>10}  {name:<12} failed with exit code {proc.exitcode}")
+                continue
+            r = results.get()
+            print(f"{rows:>10}  {r['loader']:<12}{r['seconds']:>11.3f}{r['rss_mb']:>10.1f}"
+                  f"{os.path.getsize(path) / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
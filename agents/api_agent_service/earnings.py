@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional
+import pandas as pd
+import threading
+import hashlib
+import random
+import json
+import time
+import os
+
+
+class YFinanceEarningsProvider:
+    """Latest quarterly earnings surprise (%) per ticker from Yahoo Finance"""
+
+    def fetch(self, ticker: str) -> Optional[float]:
+        import yfinance as yf
+
+        earnings = yf.Ticker(ticker).quarterly_earnings
+        if earnings is None or earnings.empty:
+            return None
+
+        latest = earnings.iloc[0]
+        actual = latest['Actual']
+        estimate = latest['Estimate']
+
+        if pd.notna(actual) and pd.notna(estimate) and estimate != 0:
+            return float((actual - estimate) / abs(estimate)) * 100
+        return None
+
+
+class FakeEarningsProvider:
+    """Deterministic offline stand-in for yfinance with a configurable per-call latency"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+
+    def fetch(self, ticker: str) -> Optional[float]:
+        time.sleep(self.latency)
+        seed = int(hashlib.md5(ticker.encode()).hexdigest(), 16)
+        return random.Random(seed).uniform(-10, 10)
+
+
+PROVIDERS = {
+    "yfinance": YFinanceEarningsProvider,
+    "fake": FakeEarningsProvider,
+}
+
+
+class EarningsCache:
+    """TTL cache of earnings surprises with stale-while-revalidate and disk persistence.
+
+    Entries younger than ``ttl`` are served as-is. Entries up to ``stale_ttl`` old
+    are served immediately while a refresh runs in the background. Anything older
+    or missing is fetched on the thread pool before returning.
+    """
+
+    def __init__(self, provider, ttl: float = 900, stale_ttl: float = 86400,
+                 max_workers: int = 16, cache_path: str = None):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.cache_path = cache_path
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="earnings")
+        self.lock = threading.Lock()
+        # Serializes writers of the cache file without holding up lookups during disk I/O
+        self.save_lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self.in_flight = {}
+        self.dirty = False
+        self.stop_event = threading.Event()
+        self.refresher = None
+        self.load()
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable earnings cache {self.cache_path}: {str(e)}")
+
+    def save(self):
+        """Atomically write the cache to disk if it changed since the last save"""
+        if not self.cache_path or not self.dirty:
+            return
+        with self.save_lock:
+            with self.lock:
+                snapshot = json.dumps(self.entries)
+                self.dirty = False
+            tmp_path = f"{self.cache_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                # The cache file is only a warm start; a failed write must not fail a request
+                print(f"Could not save earnings cache {self.cache_path}: {str(e)}")
+                with self.lock:
+                    self.dirty = True
+
+    def _fetch(self, ticker: str):
+        try:
+            value = self.provider.fetch(ticker)
+        except Exception as e:
+            print(f"Error processing {ticker}: {str(e)}")
+            with self.lock:
+                self.in_flight.pop(ticker, None)
+            return
+        with self.lock:
+            self.entries[ticker] = {"value": value, "fetched_at": time.time()}
+            self.in_flight.pop(ticker, None)
+            self.dirty = True
+
+    def refresh(self, tickers: Iterable[str]) -> list:
+        """Schedule fetches, joining any already running for the same ticker"""
+        futures = []
+        with self.lock:
+            for ticker in tickers:
+                future = self.in_flight.get(ticker)
+                if future is None:
+                    future = self.executor.submit(self._fetch, ticker)
+                    self.in_flight[ticker] = future
+                futures.append(future)
+        return futures
+
+    def get_surprises(self, tickers: Iterable[str]) -> Dict[str, float]:
+        tickers = list(tickers)
+        now = time.time()
+        stale, missing = [], []
+        with self.lock:
+            for ticker in tickers:
+                entry = self.entries.get(ticker)
+                age = now - entry["fetched_at"] if entry else None
+                if age is None or age >= self.stale_ttl:
+                    missing.append(ticker)
+                elif age >= self.ttl:
+                    stale.append(ticker)
+
+        if stale:
+            self.refresh(stale)
+        if missing:
+            wait(self.refresh(missing))
+            self.save()
+
+        with self.lock:
+            return {
+                ticker: round(self.entries[ticker]["value"], 2)
+                for ticker in tickers
+                if ticker in self.entries and self.entries[ticker]["value"] is not None
+            }
+
+    def start_refresher(self, tickers_fn: Callable[[], Iterable[str]], interval: float):
+        """Keep entries for the current tickers warm on a background thread"""
+        def run():
+            while not self.stop_event.is_set():
+                cutoff = time.time() - max(self.ttl - interval, 0)
+                with self.lock:
+                    due = [t for t in tickers_fn()
+                           if t not in self.entries or self.entries[t]["fetched_at"] <= cutoff]
+                if due:
+                    wait(self.refresh(due))
+                self.save()
+                self.stop_event.wait(interval)
+
+        self.refresher = threading.Thread(target=run, daemon=True, name="earnings-refresher")
+        self.refresher.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.save()
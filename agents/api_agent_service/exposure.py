@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional
+from portfolio_store import (ARROW_SUFFIX, BLOCK_ROWS, PORTFOLIO_COLUMNS, block_hashes, csv_blocks,
+                             open_portfolio, resolve_portfolio)
+import pandas as pd
+import threading
+import hashlib
+import time
+import io
+import os
+
+GROUP_KEYS = ['region', 'sector', 'ticker']
+
+
+class ExposureIndex:
+    """Portfolio weights pre-aggregated by region × sector × ticker.
+
+    The portfolio (CSV, or the columnar Arrow file from portfolio_store) is
+    aggregated in blocks keyed by a hash of their CSV bytes (Arrow batches carry
+    the hash of the block they were written from), so a rebuild after an edit
+    or append only re-aggregates the blocks that changed, whichever file the
+    previous build read. Queries scan the
+    aggregated groups, never the underlying lots. ``source`` is the file that
+    is watched and edited; ``path`` is what was loaded, its Arrow copy when fresh.
+    """
+
+    def __init__(self, path: str, block_rows: int = BLOCK_ROWS):
+        self.source = path
+        self.path = path
+        self.block_rows = block_rows
+        self.block_cache: Dict[str, pd.Series] = {}
+        # (groups, ticker_groups): (region, sector) -> weight and -> {ticker: weight}
+        self.snapshot = ({}, {})
+        self.file_signature = None
+        self.digest = None
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.rebuild()
+
+    def _blocks(self):
+        """Yield (content hash, aggregate function) pairs for each block of the file"""
+        if self.path.endswith(ARROW_SUFFIX):
+            yield from self._arrow_blocks()
+            return
+        for digest, block in csv_blocks(self.path, self.block_rows):
+            yield digest, lambda block=block: self._aggregate_csv(block)
+
+    def _arrow_blocks(self):
+        reader = open_portfolio(self.path)
+        hashes = block_hashes(reader, self.block_rows)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if hashes is not None:
+                yield hashes[i], lambda batch=batch: self._aggregate_frame(batch.to_pandas())
+                continue
+            # Files from elsewhere: hash the batch's buffers instead
+            digest = hashlib.sha1()
+            for column in batch.columns:
+                arrays = [column, column.dictionary] if hasattr(column, "dictionary") else [column]
+                for array in arrays:
+                    for buf in array.buffers():
+                        if buf is not None:
+                            digest.update(buf)
+            yield digest.hexdigest(), lambda batch=batch: self._aggregate_frame(batch.to_pandas())
+
+    @staticmethod
+    def _aggregate_csv(block: bytes) -> pd.Series:
+        return ExposureIndex._aggregate_frame(pd.read_csv(io.BytesIO(block), usecols=PORTFOLIO_COLUMNS))
+
+    @staticmethod
+    def _aggregate_frame(df: pd.DataFrame) -> pd.Series:
+        df = df[PORTFOLIO_COLUMNS].dropna()
+        for key in GROUP_KEYS:
+            # Dictionary-encoded Arrow columns arrive as categoricals; keep them that way
+            if not isinstance(df[key].dtype, pd.CategoricalDtype):
+                df[key] = df[key].astype(str)
+        return df.groupby(GROUP_KEYS, observed=True)['weight'].sum()
+
+    def rebuild(self) -> bool:
+        """Re-aggregate changed blocks; returns False when the content is unchanged"""
+        with self.lock:
+            start = time.perf_counter()
+            stat = os.stat(self.source)
+            path = resolve_portfolio(self.source)
+            if path != self.path or self.digest is None:
+                print(f"Loading portfolio from {path}")
+            self.path = path
+            digest = hashlib.sha1()
+            parts, block_cache, reused = [], {}, 0
+
+            for key, aggregate_fn in self._blocks():
+                digest.update(key.encode())
+                aggregate = self.block_cache.get(key)
+                if aggregate is None:
+                    aggregate = block_cache.get(key)
+                if aggregate is None:
+                    aggregate = aggregate_fn()
+                else:
+                    reused += 1
+                block_cache[key] = aggregate
+                parts.append(aggregate)
+
+            self.file_signature = (stat.st_mtime_ns, stat.st_size)
+            if digest.hexdigest() == self.digest:
+                return False
+
+            if parts:
+                combined = pd.concat(parts).groupby(level=GROUP_KEYS).sum()
+            else:
+                combined = pd.Series(dtype=float, index=pd.MultiIndex.from_tuples([], names=GROUP_KEYS))
+
+            ticker_groups = {}
+            for (region, sector, ticker), weight in combined.items():
+                ticker_groups.setdefault((region, sector), {})[ticker] = float(weight)
+
+            # Swap in one assignment so concurrent readers always see a consistent index
+            groups = {key: sum(tickers.values()) for key, tickers in ticker_groups.items()}
+            self.snapshot = (groups, ticker_groups)
+            self.block_cache = block_cache
+            self.digest = digest.hexdigest()
+            self.stats = {
+                "groups": len(groups),
+                "ticker_groups": len(combined),
+                "blocks": len(parts),
+                "blocks_reused": reused,
+                "build_ms": round((time.perf_counter() - start) * 1000, 1),
+                "built_at": time.time()
+            }
+            return True
+
+    def tickers(self) -> List[str]:
+        return sorted({t for tickers in self.snapshot[1].values() for t in tickers})
+
+    @staticmethod
+    def _matches(value: str, pattern: Optional[str], exact: bool) -> bool:
+        if pattern is None:
+            return True
+        if exact:
+            return value == pattern
+        return pattern.lower() in value.lower()
+
+    def exposure(self, region: Optional[str] = None, sectors: Optional[List[str]] = None,
+                 exact: bool = False, by_ticker: bool = False) -> dict:
+        """Exposure (%) for a region and any of the given sectors, matched per group"""
+        groups, ticker_groups = self.snapshot
+        matched = [
+            key for key in groups
+            if self._matches(key[0], region, exact)
+            and (not sectors or any(self._matches(key[1], s, exact) for s in sectors))
+        ]
+        result = {
+            "exposure": round(sum(groups[key] for key in matched) * 100, 2),
+            "groups": [
+                {"region": r, "sector": s, "exposure": round(groups[(r, s)] * 100, 2)}
+                for r, s in matched
+            ]
+        }
+        if by_ticker:
+            tickers = {}
+            for key in matched:
+                for ticker, weight in ticker_groups[key].items():
+                    tickers[ticker] = tickers.get(ticker, 0) + weight
+            result["tickers"] = {t: round(w * 100, 2) for t, w in tickers.items()}
+        return result
+
+    def start_watcher(self, interval: float):
+        """Poll the file's mtime/size and rebuild when it changes on disk"""
+        def run():
+            while not self.stop_event.wait(interval):
+                try:
+                    stat = os.stat(self.source)
+                    if (stat.st_mtime_ns, stat.st_size) != self.file_signature and self.rebuild():
+                        print(f"Rebuilt exposure index from {self.path}: {self.stats}")
+                except Exception as e:
+                    print(f"Exposure index rebuild failed: {str(e)}")
+
+        threading.Thread(target=run, daemon=True, name="exposure-watcher").start()
+
+    def stop(self):
+        self.stop_event.set()
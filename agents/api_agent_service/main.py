@@ -1,15 +1,38 @@
-from fastapi import FastAPI
-import yfinance as yf
-import pandas as pd
+from fastapi import FastAPI, Query
+from typing import List, Optional
+from earnings import EarningsCache, PROVIDERS
+from exposure import ExposureIndex
 import os
 
 app = FastAPI()
 
+# Earnings cache configuration
+EARNINGS_PROVIDER = os.getenv("EARNINGS_PROVIDER", "yfinance")
+EARNINGS_TTL = float(os.getenv("EARNINGS_TTL", "900"))
+EARNINGS_STALE_TTL = float(os.getenv("EARNINGS_STALE_TTL", "86400"))
+EARNINGS_MAX_WORKERS = int(os.getenv("EARNINGS_MAX_WORKERS", "16"))
+EARNINGS_REFRESH_INTERVAL = float(os.getenv("EARNINGS_REFRESH_INTERVAL", "300"))
+EARNINGS_CACHE_PATH = os.getenv(
+    "EARNINGS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "earnings_cache.json")
+)
+PORTFOLIO_WATCH_INTERVAL = float(os.getenv("PORTFOLIO_WATCH_INTERVAL", "5"))
+
 class EarningsAnalyzer:
-    def __init__(self):
-        self.portfolio = self.load_portfolio()
-        
-    def load_portfolio(self):
+    def __init__(self, provider=None):
+        self.index = ExposureIndex(self.portfolio_path())
+        self.earnings = EarningsCache(
+            provider or PROVIDERS[EARNINGS_PROVIDER](),
+            ttl=EARNINGS_TTL,
+            stale_ttl=EARNINGS_STALE_TTL,
+            max_workers=EARNINGS_MAX_WORKERS,
+            cache_path=EARNINGS_CACHE_PATH
+        )
+
+    def portfolio_path(self):
+        if os.getenv("PORTFOLIO_PATH"):
+            return os.getenv("PORTFOLIO_PATH")
+
         current_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
         
@@ -18,48 +41,48 @@ class EarningsAnalyzer:
             "data_ingestion",
             "portfolio.csv"
         )
-        
 
+        # The index loads the memory-mapped copy written by portfolio_store.py
+        # when it is up to date, but always watches the CSV itself
         if not os.path.exists(portfolio_path):
             raise FileNotFoundError(f"Portfolio file missing at: {portfolio_path}")
-            
-        df = pd.read_csv(portfolio_path)
-        return df[['ticker', 'sector', 'region', 'weight']].dropna()
+        return portfolio_path
 
     def get_asia_tech_exposure(self):
-        filtered = self.portfolio[
-            (self.portfolio['sector'].str.contains('Tech', case=False)) &
-            (self.portfolio['region'].str.contains('Asia', case=False))
-        ]
-        return round(filtered['weight'].sum() * 100, 2)
+        return self.index.exposure(region='Asia', sectors=['Tech'])['exposure']
 
     def get_earnings_surprises(self):
-        surprises = {}
-        
-        for ticker in self.portfolio['ticker'].unique():
-            try:
-                stock = yf.Ticker(ticker)
-                earnings = stock.quarterly_earnings
-                if earnings.empty:
-                    continue
-                    
-                latest = earnings.iloc[0]
-                actual = latest['Actual']
-                estimate = latest['Estimate']
-                
-                if pd.notna(actual) and pd.notna(estimate) and estimate != 0:
-                    surprise = ((actual - estimate) / abs(estimate)) * 100
-                    surprises[ticker] = round(surprise, 2)
-            except Exception as e:
-                print(f"Error processing {ticker}: {str(e)}")
-        return surprises
+        return self.earnings.get_surprises(self.index.tickers())
 
 analyzer = EarningsAnalyzer()
 
+@app.on_event("startup")
+def startup_event():
+    analyzer.earnings.start_refresher(analyzer.index.tickers, EARNINGS_REFRESH_INTERVAL)
+    analyzer.index.start_watcher(PORTFOLIO_WATCH_INTERVAL)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    analyzer.earnings.stop()
+    analyzer.index.stop()
+
 @app.get("/exposure")
 def get_exposure():
     return {"exposure": analyzer.get_asia_tech_exposure()}
 
+@app.get("/exposure/query")
+def query_exposure(
+    region: Optional[str] = None,
+    sector: Optional[List[str]] = Query(None),
+    exact: bool = False,
+    by_ticker: bool = False
+):
+    """Exposure for any region/sector combination, answered from the pre-aggregated index"""
+    return {
+        **analyzer.index.exposure(region, sector, exact=exact, by_ticker=by_ticker),
+        "index": analyzer.index.stats
+    }
+
 @app.get("/earnings_surprises")
 def get_earnings():
     return analyzer.get_earnings_surprises()
@@ -0,0 +1,138 @@
+"""Columnar on-disk storage for the portfolio.
+
+Converts portfolio.csv into an uncompressed Arrow IPC file with
+dictionary-encoded ticker/sector/region columns, which the API agent then
+memory-maps instead of parsing the CSV on every start:
+
+    python portfolio_store.py ../../data_ingestion/portfolio.csv
+"""
+from typing import Iterator, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import itertools
+import argparse
+import hashlib
+import json
+import time
+import os
+
+PORTFOLIO_COLUMNS = ['ticker', 'sector', 'region', 'weight']
+DICTIONARY_COLUMNS = ['ticker', 'sector', 'region']
+ARROW_SUFFIX = ".arrow"
+BLOCK_ROWS = 50000  # rows per CSV block and per Arrow batch; the unit of incremental re-aggregation
+
+
+def csv_blocks(csv_path: str, block_rows: int = BLOCK_ROWS) -> Iterator[Tuple[str, bytes]]:
+    """(content hash, header + rows) for each run of ``block_rows`` lines of the CSV.
+
+    The same hashes label the Arrow batches written from each block, so an
+    index built from either file can reuse the other's per-block aggregates.
+    """
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        while True:
+            lines = list(itertools.islice(f, block_rows))
+            if not lines:
+                break
+            block = header + b"".join(lines)
+            yield hashlib.sha1(block).hexdigest(), block
+
+
+def _parse_block(block: bytes) -> pa.Table:
+    column_types = {c: pa.string() for c in DICTIONARY_COLUMNS}
+    column_types['weight'] = pa.float64()
+    return pacsv.read_csv(
+        pa.py_buffer(block),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=PORTFOLIO_COLUMNS,
+            column_types=column_types,
+            strings_can_be_null=True
+        )
+    ).combine_chunks()
+
+
+def block_hashes(reader: pa.ipc.RecordBatchFileReader, block_rows: int) -> Optional[List[str]]:
+    """The CSV block hash of each batch, if the file was written by convert_portfolio with ``block_rows``"""
+    metadata = reader.schema.metadata or {}
+    if metadata.get(b"block_rows") != str(block_rows).encode() or b"block_hashes" not in metadata:
+        return None
+    hashes = json.loads(metadata[b"block_hashes"])
+    return hashes if len(hashes) == reader.num_record_batches else None
+
+
+def convert_portfolio(csv_path: str, out_path: str = None, block_rows: int = BLOCK_ROWS) -> str:
+    """Write the CSV as an Arrow file with one record batch per CSV block and one dictionary per column"""
+    out_path = out_path or os.path.splitext(csv_path)[0] + ARROW_SUFFIX
+
+    # Pass 1: collect global dictionaries, since IPC files cannot replace them between batches
+    uniques = {c: set() for c in DICTIONARY_COLUMNS}
+    hashes = []
+    for digest, block in csv_blocks(csv_path, block_rows):
+        table = _parse_block(block)
+        hashes.append(digest)
+        for name in DICTIONARY_COLUMNS:
+            uniques[name].update(pc.unique(table.column(name)).drop_null().to_pylist())
+    dictionaries = {c: pa.array(sorted(values), pa.string()) for c, values in uniques.items()}
+
+    schema = pa.schema([
+        (name, pa.dictionary(pa.int32(), pa.string()) if name in dictionaries else pa.float64())
+        for name in PORTFOLIO_COLUMNS
+    ], metadata={"block_rows": str(block_rows), "block_hashes": json.dumps(hashes)})
+
+    # Pass 2: encode each block against the global dictionaries and append it as one batch
+    tmp_path = f"{out_path}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for _, block in csv_blocks(csv_path, block_rows):
+            table = _parse_block(block)
+            arrays = []
+            for name in PORTFOLIO_COLUMNS:
+                column = table.column(name).combine_chunks()
+                if name in dictionaries:
+                    indices = pc.index_in(column, value_set=dictionaries[name]).cast(pa.int32())
+                    column = pa.DictionaryArray.from_arrays(indices, dictionaries[name])
+                arrays.append(column)
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def resolve_portfolio(path: str) -> str:
+    """The file to load for a portfolio: its Arrow copy when that is at least as new as the CSV.
+
+    A CSV edited after the last conversion is read directly; its unchanged
+    blocks hash the same as the Arrow batches, so only edited blocks are
+    re-aggregated. Run this module again to refresh the Arrow copy.
+    """
+    arrow_path = os.path.splitext(path)[0] + ARROW_SUFFIX
+    if path.endswith(ARROW_SUFFIX) or not os.path.exists(arrow_path):
+        return path
+    if os.path.getmtime(arrow_path) >= os.path.getmtime(path):
+        return arrow_path
+    print(f"{arrow_path} is older than {path}; reading the CSV until it is converted again")
+    return path
+
+
+def open_portfolio(path: str) -> pa.ipc.RecordBatchFileReader:
+    """Memory-map an Arrow portfolio file; batches are read lazily and without copying"""
+    return pa.ipc.open_file(pa.memory_map(path, 'r'))
+
+
+def load_portfolio(path: str, columns: List[str] = None) -> pa.Table:
+    table = open_portfolio(path).read_all()
+    return table.select(columns) if columns else table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_path")
+    parser.add_argument("--out", help="output path (defaults to the CSV path with an .arrow suffix)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    out_path = convert_portfolio(args.csv_path, args.out)
+    print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+from typing import List
+from transformers import (
+    AutoTokenizer,
+    AutoModelForSeq2SeqLM,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer
+)
+import threading
+import torch
+import logging
+import os
+
+logger = logging.getLogger("LLM-Agent")
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+class StopOnEvent(StoppingCriteria):
+    """Ends generation early once the caller sets the event, e.g. on client disconnect"""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool)
+
+
+class TorchBackend:
+    """Eager PyTorch seq2seq model, optionally int8 dynamically quantized for CPU.
+
+    ``generate`` and ``stream`` may be called from different threads (the batch
+    worker and streaming requests); ``lock`` lets one generation use the model
+    at a time, so they never contend for it mid-step.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        self.name = "torch-int8" if quantize else "torch"
+        self.lock = threading.Lock()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        # Dynamic int8 kernels are CPU-only, so quantized models never go to the GPU
+        use_cuda = torch.cuda.is_available() and not quantize
+        self.device = torch.device("cuda" if use_cuda else "cpu")
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16 if use_cuda else torch.float32
+        )
+        model.eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device)
+
+    def encode(self, prompts: List[str]) -> dict:
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True)
+        return {k: v.to(self.device) for k, v in inputs.items()}
+
+    def generate(self, prompts: List[str], **generation_kwargs) -> List[str]:
+        inputs = self.encode(prompts)
+        with self.lock, torch.inference_mode():
+            output_ids = self.model.generate(**inputs, **generation_kwargs)
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+    def stream(self, prompt: str, stop_event: threading.Event = None, **generation_kwargs):
+        """Yield decoded text pieces for a single prompt as tokens are generated"""
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        if stop_event is not None:
+            generation_kwargs["stopping_criteria"] = StoppingCriteriaList([StopOnEvent(stop_event)])
+        errors = []
+
+        def run():
+            try:
+                with self.lock, torch.inference_mode():
+                    self.model.generate(**self.encode([prompt]), streamer=streamer, **generation_kwargs)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                yield text
+        thread.join()
+        if errors:
+            raise errors[0]
+
+
+class OnnxBackend(TorchBackend):
+    """ONNX Runtime encoder/decoder graphs with KV-cache, exported once and reused from disk"""
+
+    def __init__(self, model_name: str, export_dir: str = None):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError("The onnx backend requires `optimum[onnxruntime]`") from e
+
+        self.name = "onnx"
+        self.lock = threading.Lock()
+        self.device = torch.device("cpu")
+        export_dir = export_dir or os.path.join("onnx", model_name.replace("/", "--"))
+
+        if os.path.isdir(export_dir):
+            self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+            self.model = ORTModelForSeq2SeqLM.from_pretrained(export_dir, use_cache=True)
+        else:
+            logger.info(f"Exporting {model_name} to ONNX at {export_dir}")
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+            self.model.save_pretrained(export_dir)
+            self.tokenizer.save_pretrained(export_dir)
+
+
+def load_backend(name: str, model_name: str):
+    """Build the inference backend selected by LLM_BACKEND"""
+    if name == "torch":
+        backend = TorchBackend(model_name)
+    elif name == "torch-int8":
+        backend = TorchBackend(model_name, quantize=True)
+    elif name == "onnx":
+        backend = OnnxBackend(model_name, os.getenv("LLM_ONNX_DIR"))
+    else:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of {', '.join(BACKENDS)}")
+    logger.info(f"Loaded {model_name} with the {backend.name} backend on {backend.device}")
+    return backend
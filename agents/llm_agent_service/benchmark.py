@@ -0,0 +1,114 @@
+"""Compare LLM inference backends on a fixed prompt set.
+
+Each backend is loaded in its own process so resident memory is not shared
+between runs. Greedy decoding keeps the generated lengths comparable.
+
+    python benchmark.py --backends torch torch-int8 onnx --runs 5
+"""
+from backends import BACKENDS, load_backend
+from prompts import BriefRequest, build_prompt
+import multiprocessing as mp
+import numpy as np
+import argparse
+import time
+
+# Built with the service's own prompt builder, so the benchmark follows prompt changes
+PROMPTS = [build_prompt(BriefRequest(**request)) for request in [
+    {
+        "query": "What's our Asia tech exposure?",
+        "market_data": {"exposure": 30.0, "earnings": {"TSM": 4.0, "005930.KS": -2.0}},
+        "retrieved_chunks": ["TSMC reported 4% earnings beat in Q2 2024",
+                             "Asian tech sector shows neutral sentiment with caution on rising bond yields"],
+        "news": {"TSMC": [{"title": "TSMC raises full-year revenue outlook on AI demand"}]}
+    },
+    {
+        "query": "Any risk in our semiconductor book today?",
+        "market_data": {"exposure": 25.0, "earnings": {}},
+        "retrieved_chunks": ["Samsung Electronics lowered Q3 guidance by 2%",
+                             "Apple increases orders with Asian semiconductor suppliers"],
+        "news": {"Samsung": [{"title": "Samsung shares slip after memory price warning"}]}
+    },
+    {
+        "query": "Summarise earnings surprises for Asian holdings",
+        "market_data": {"exposure": 30.0, "earnings": {"TSM": 4.0, "BABA": 1.5}},
+        "retrieved_chunks": ["Baidu announces new AI chip collaboration with Chinese foundries"],
+        "news": {"TSMC": [{"title": "TSMC March sales jump 35%"}],
+                 "Samsung": [{"title": "Samsung unveils new HBM line"}]}
+    },
+    {
+        "query": "How did bond yields affect Asia tech?",
+        "market_data": {"exposure": 28.5, "earnings": {"TSM": 4.0}},
+        "retrieved_chunks": ["Asian tech sector shows neutral sentiment with caution on rising bond yields"],
+        "news": {}
+    },
+]]
+
+
+def rss_mb(field: str = "VmRSS") -> float:
+    """Resident memory of this process from /proc, in MB (Linux only)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_backend(name: str, model_name: str, runs: int, max_new_tokens: int, results):
+    baseline_rss = rss_mb()
+    start = time.perf_counter()
+    backend = load_backend(name, model_name)
+    load_seconds = time.perf_counter() - start
+    loaded_rss = rss_mb()
+
+    kwargs = {"max_new_tokens": max_new_tokens, "do_sample": False}
+    backend.generate(PROMPTS[:1], **kwargs)  # warm-up
+
+    latencies, tokens = [], 0
+    for _ in range(runs):
+        for prompt in PROMPTS:
+            start = time.perf_counter()
+            text = backend.generate([prompt], **kwargs)[0]
+            latencies.append(time.perf_counter() - start)
+            tokens += len(backend.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    results.put({
+        "backend": name,
+        "load_s": load_seconds,
+        "tokens_per_s": tokens / sum(latencies),
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p99_ms": np.percentile(latencies, 99) * 1000,
+        "model_rss_mb": loaded_rss - baseline_rss,
+        "peak_rss_mb": rss_mb("VmHWM"),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model", default="google/flan-t5-large")
+    parser.add_argument("--runs", type=int, default=3, help="passes over the prompt set per backend")
+    parser.add_argument("--max-new-tokens", type=int, default=150)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    rows = []
+    for name in args.backends:
+        proc = ctx.Process(target=run_backend, args=(name, args.model, args.runs, args.max_new_tokens, results))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            print(f"{name}: failed with exit code {proc.exitcode}")
+            continue
+        rows.append(results.get())
+
+    header = f"{'backend':<12}{'load s':>9}{'tok/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'model MB':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['backend']:<12}{r['load_s']:>9.1f}{r['tokens_per_s']:>9.1f}{r['p50_ms']:>10.0f}"
+              f"{r['p99_ms']:>10.0f}{r['model_rss_mb']:>10.0f}{r['peak_rss_mb']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,238 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Dict
-from transformers import pipeline, AutoTokenizer
-import torch
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from backends import load_backend
+from prompts import BriefRequest, build_prompt
+import asyncio
+import threading
+import json
 import logging
+import os
 
 app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("LLM-Agent")
 
-# Load efficient model
-MODEL_NAME = "google/flan-t5-large"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-pipe = pipeline(
-    "text2text-generation",
-    model=MODEL_NAME,
-    device=0 if torch.cuda.is_available() else -1,
-    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-    model_kwargs={}  # 4-bit quantization for efficiency
-)
-
-class BriefRequest(BaseModel):
-    query: str
-    market_data: Dict
-    news: Dict
-    retrieved_chunks: List[str]
-
-def format_earnings(earnings: dict) -> str:
-    if not earnings:
-        return "None"
-    return ", ".join([f"{k} ({v}% beat)" for k, v in earnings.items()])
-
-def format_news(news: dict) -> str:
-    highlights = []
-    for company, articles in news.items():
-        if company in ["TSMC", "Samsung"] and isinstance(articles, list):
-            for i, art in enumerate(articles[:2]):
-                title = art.get('title', 'No title').replace('"', '').strip()
-                if len(title) > 80:
-                    title = title[:77] + "..."
-                highlights.append(f"{company}: {title}")
-    return " | ".join(highlights) if highlights else "None"
+# Load efficient model; LLM_BACKEND selects torch, torch-int8 or onnx
+MODEL_NAME = os.getenv("LLM_MODEL_NAME", "google/flan-t5-large")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "torch")
+backend = load_backend(LLM_BACKEND, MODEL_NAME)
+tokenizer = backend.tokenizer
+
+# Batching scheduler configuration
+BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "25"))
+QUEUE_MAX_SIZE = int(os.getenv("LLM_QUEUE_MAX_SIZE", "64"))
+STREAM_CONCURRENCY = int(os.getenv("LLM_STREAM_CONCURRENCY", "2"))
+
+GENERATION_KWARGS = {
+    "max_new_tokens": 150,
+    "do_sample": True,
+    "temperature": 0.4,
+    "top_p": 0.9
+}
+
+def postprocess(result: str) -> str:
+    summary = result.replace("SPOKEN BRIEF:", "").strip()
+    if not summary.endswith('.'):
+        summary += '.'
+    return summary
+
+def fallback_summary(request: BriefRequest) -> str:
+    return (f"Our Asian tech exposure is {request.market_data.get('exposure', 0)}%. " +
+            "Recent developments include semiconductor earnings beats and supply chain updates.")
+
+def generate_batch(prompts: List[str]) -> List[str]:
+    """Run prompts through the inference backend as one padded batch"""
+    return backend.generate(prompts, **GENERATION_KWARGS)
+
+class BriefBatcher:
+    """Collects concurrent prompts for up to a window or batch size and generates them together"""
+
+    def __init__(self, generate_fn, max_batch_size: int, window_ms: float, max_queue_size: int):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.queue: asyncio.Queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.worker = None
+        self.in_flight = 0
+        self.stats = {
+            "requests_total": 0,
+            "rejected_total": 0,
+            "batches_total": 0,
+            "batched_requests_total": 0,
+            "batch_size_histogram": {}
+        }
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its generation; raises asyncio.QueueFull under backpressure"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((prompt, future))
+        except asyncio.QueueFull:
+            self.stats["rejected_total"] += 1
+            raise
+        self.stats["requests_total"] += 1
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Callers that disconnected while queued don't need a slot in the batch
+        return [(prompt, future) for prompt, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            size = len(batch)
+            self.in_flight = size
+            self.stats["batches_total"] += 1
+            self.stats["batched_requests_total"] += size
+            histogram = self.stats["batch_size_histogram"]
+            histogram[size] = histogram.get(size, 0) + 1
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.generate_fn, [prompt for prompt, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Batch generation failed ({size} prompts): {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.in_flight = 0
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def metrics(self) -> dict:
+        batches = self.stats["batches_total"]
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.max_queue_size,
+            "in_flight": self.in_flight,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.window * 1000,
+            "avg_batch_size": round(self.stats["batched_requests_total"] / batches, 2) if batches else 0,
+            **self.stats
+        }
+
+batcher = BriefBatcher(generate_batch, BATCH_MAX_SIZE, BATCH_WINDOW_MS, QUEUE_MAX_SIZE)
+
+@app.on_event("startup")
+async def startup_event():
+    batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
 
 @app.post("/generate-brief")
-def generate_brief(request: BriefRequest):
+async def generate_brief(request: BriefRequest):
     try:
-        # Extract core data points
-        exposure = request.market_data.get('exposure', 0)
-        earnings = request.market_data.get('earnings', {})
-        context = " | ".join(request.retrieved_chunks[:3]) or "None"
-        
-        # Format components
-        earnings_str = format_earnings(earnings)
-        news_str = format_news(request.news)
-        
-        # Create directive prompt
-        prompt = f"""Generate a concise 2-sentence spoken market brief about Asia tech exposure using ONLY these facts:
-        
-USER QUERY: "{request.query}"
-PORTFOLIO EXPOSURE: {exposure}% to Asian tech
-EARNINGS RESULTS: {earnings_str}
-KEY CONTEXT: {context}
-NEWS HIGHLIGHTS: {news_str}
-
-RULES:
-- MUST mention {exposure}% exposure first
-- MUST include earnings beats if available
-- MUST reference at least one news item
-- Address bond yields if mentioned in context
-- Use natural, conversational language
-- MAX 40 words
-
-SPOKEN BRIEF:"""
-        
-        # Generate response
-        result = pipe(
-            prompt,
-            max_new_tokens=150,
-            do_sample=True,
-            temperature=0.4,
-            top_p=0.9
-        )[0]['generated_text']
-        
+        result = await batcher.submit(build_prompt(request))
+
         # Post-process for clarity
-        summary = result.replace("SPOKEN BRIEF:", "").strip()
-        if not summary.endswith('.'):
-            summary += '.'
-            
+        summary = postprocess(result)
+
         logger.info(f"Generated summary: {summary}")
         return {"summary": summary}
 
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="LLM queue is full, retry later",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Generation failed: {str(e)}")
-        return {"summary": f"Our Asian tech exposure is {request.market_data.get('exposure', 0)}%. " +
-                           "Recent developments include semiconductor earnings beats and supply chain updates."}
+        return {"summary": fallback_summary(request)}
+
+# Streaming generations run one prompt each, outside the batcher. The backend's
+# lock takes turns on the model with batch generation; beyond STREAM_CONCURRENCY
+# open streams new ones are turned away with 429, like a full batch queue
+stream_slots = asyncio.Semaphore(STREAM_CONCURRENCY)
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_CONCURRENCY)
+stream_stats = {"streams_total": 0, "stream_rejected_total": 0}
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def brief_stream_events(request: BriefRequest):
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    pieces = []
+    try:
+        async with stream_slots:
+            tokens = backend.stream(build_prompt(request), stop_event=stop, **GENERATION_KWARGS)
+            while True:
+                text = await loop.run_in_executor(stream_executor, next, tokens, None)
+                if text is None:
+                    break
+                pieces.append(text)
+                yield sse_event("token", {"text": text})
+        summary = postprocess("".join(pieces))
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client went away: let the generation thread stop at the next token
+        stop.set()
+        raise
+    except Exception as e:
+        logger.error(f"Streaming generation failed: {str(e)}")
+        summary = postprocess("".join(pieces)) if pieces else fallback_summary(request)
+
+    logger.info(f"Generated summary: {summary}")
+    yield sse_event("summary", {"summary": summary})
+
+@app.post("/generate-brief/stream")
+async def stream_brief(request: BriefRequest):
+    """Server-sent `token` events as text is decoded, then the post-processed `summary`"""
+    if stream_slots.locked():
+        stream_stats["stream_rejected_total"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="All streaming slots are busy, retry later",
+            headers={"Retry-After": "1"}
+        )
+    stream_stats["streams_total"] += 1
+    return StreamingResponse(
+        brief_stream_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "backend": backend.name,
+        **batcher.metrics(),
+        "stream_capacity": STREAM_CONCURRENCY,
+        **stream_stats
+    }
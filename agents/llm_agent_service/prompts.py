@@ -0,0 +1,54 @@
+"""Request model and prompt construction, importable without loading a model"""
+from pydantic import BaseModel
+from typing import List, Dict
+
+class BriefRequest(BaseModel):
+    query: str
+    market_data: Dict
+    news: Dict
+    retrieved_chunks: List[str]
+
+def format_earnings(earnings: dict) -> str:
+    if not earnings:
+        return "None"
+    return ", ".join([f"{k} ({v}% beat)" for k, v in earnings.items()])
+
+def format_news(news: dict) -> str:
+    highlights = []
+    for company, articles in news.items():
+        if company in ["TSMC", "Samsung"] and isinstance(articles, list):
+            for i, art in enumerate(articles[:2]):
+                title = art.get('title', 'No title').replace('"', '').strip()
+                if len(title) > 80:
+                    title = title[:77] + "..."
+                highlights.append(f"{company}: {title}")
+    return " | ".join(highlights) if highlights else "None"
+
+def build_prompt(request: BriefRequest) -> str:
+    # Extract core data points
+    exposure = request.market_data.get('exposure', 0)
+    earnings = request.market_data.get('earnings', {})
+    context = " | ".join(request.retrieved_chunks[:3]) or "None"
+
+    # Format components
+    earnings_str = format_earnings(earnings)
+    news_str = format_news(request.news)
+
+    # Create directive prompt
+    return f"""Generate a concise 2-sentence spoken market brief about Asia tech exposure using ONLY these facts:
+        
+USER QUERY: "{request.query}"
+PORTFOLIO EXPOSURE: {exposure}% to Asian tech
+EARNINGS RESULTS: {earnings_str}
+KEY CONTEXT: {context}
+NEWS HIGHLIGHTS: {news_str}
+
+RULES:
+- MUST mention {exposure}% exposure first
+- MUST include earnings beats if available
+- MUST reference at least one news item
+- Address bond yields if mentioned in context
+- Use natural, conversational language
+- MAX 40 words
+
+SPOKEN BRIEF:"""
@@ -0,0 +1,94 @@
+"""Latency of vector-only against hybrid (BM25 + vector, RRF-fused) retrieval.
+
+Chunks are synthetic: Zipf-distributed words from a finance vocabulary plus a
+ticker token, paired with clustered vectors. Queries mix two or three words
+with a ticker, like "TSMC earnings beat". Latencies are single-query,
+single-threaded; hybrid includes the vector search, BM25 and the fusion.
+
+    python benchmark_hybrid.py --sizes 100000 1000000 --index-type hnsw
+"""
+from benchmark_index import synthetic_corpus
+from vector_index import INDEX_TYPES, VectorIndex
+from lexical import BM25Index, reciprocal_rank_fusion
+import numpy as np
+import argparse
+import faiss
+import time
+
+VOCABULARY = [f"term{i}" for i in range(50_000)]
+TICKERS = [f"T{i:04d}.KS" for i in range(2_000)]
+
+
+def synthetic_texts(n: int, words: int = 60, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        picks = np.minimum(rng.zipf(1.3, words), len(VOCABULARY)) - 1
+        yield " ".join([TICKERS[rng.integers(len(TICKERS))], *(VOCABULARY[i] for i in picks)])
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--index-type", default="hnsw", choices=INDEX_TYPES)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=100, help="per-ranker candidates fused by RRF")
+    args = parser.parse_args()
+
+    print(f"{'size':>9}  {'mode':<8}{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}{'MB':>9}")
+    for size in args.sizes:
+        vectors = synthetic_corpus(size, args.dim)
+        query_vecs = synthetic_corpus(args.queries, args.dim, seed=1)
+        rng = np.random.default_rng(2)
+        questions = [
+            " ".join([TICKERS[rng.integers(len(TICKERS))],
+                      *(VOCABULARY[i] for i in np.minimum(rng.zipf(1.3, 3), len(VOCABULARY)) - 1)])
+            for _ in range(args.queries)
+        ]
+
+        faiss.omp_set_num_threads(faiss.omp_get_max_threads())
+        index = VectorIndex(args.dim, args.index_type, "cosine")
+        start = time.perf_counter()
+        index.build(np.arange(size), vectors)
+        vector_build = time.perf_counter() - start
+        del vectors
+
+        lexical = BM25Index()
+        start = time.perf_counter()
+        lexical.add(range(size), synthetic_texts(size))
+        lexical_build = time.perf_counter() - start
+
+        faiss.omp_set_num_threads(1)
+        vector_lat, lexical_lat, hybrid_lat = [], [], []
+        for question, query_vec in zip(questions, query_vecs):
+            start = time.perf_counter()
+            index.search(query_vec[None, :], args.k)
+            vector_lat.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            lexical.search(question, args.k)
+            lexical_lat.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _, vector_rows = index.search(query_vec[None, :], args.candidates)
+            lexical_rows, _ = lexical.search(question, args.candidates)
+            reciprocal_rank_fusion([vector_rows[0].tolist(), lexical_rows.tolist()])[:args.k]
+            hybrid_lat.append(time.perf_counter() - start)
+
+        rows = [
+            ("vector", vector_lat, vector_build, index.memory_bytes()),
+            ("bm25", lexical_lat, lexical_build, lexical.memory_bytes()),
+            ("hybrid", hybrid_lat, vector_build + lexical_build, index.memory_bytes() + lexical.memory_bytes()),
+        ]
+        for mode, latencies, build_s, memory in rows:
+            p50, p99 = percentiles(latencies)
+            print(f"{size:>9}  {mode:<8}{p50:>9.2f}{p99:>9.2f}{build_s:>9.1f}{memory / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
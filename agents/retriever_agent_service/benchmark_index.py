@@ -0,0 +1,83 @@
+"""Recall/latency/memory of the retriever's index types on synthetic corpora.
+
+Vectors are drawn around random cluster centres (closer to sentence
+embeddings than uniform noise). Recall@k is measured against an exact flat
+index with the same metric; QPS is single-query, single-threaded.
+
+    python benchmark_index.py --sizes 10000 100000 1000000 5000000 --metric cosine
+"""
+from vector_index import INDEX_TYPES, METRICS, VectorIndex
+import numpy as np
+import argparse
+import faiss
+import time
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int = 1000, seed: int = 0, chunk: int = 500_000) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        vectors[start:start + m] = centres[rng.integers(0, clusters, m)] \
+            + 0.5 * rng.standard_normal((m, dim)).astype(np.float32)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--metric", default="cosine", choices=METRICS)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings are 384-d")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers (bytes per vector)")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads for search")
+    args = parser.parse_args()
+
+    build_threads = faiss.omp_get_max_threads()
+    print(f"{'size':>9}  {'index':<9}{'build s':>9}{'recall@' + str(args.k):>11}{'QPS':>9}{'p50 ms':>9}{'MB':>9}")
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.dim)
+        queries = synthetic_corpus(args.queries, args.dim, seed=1)
+        ids = np.arange(size, dtype=np.int64)
+
+        faiss.omp_set_num_threads(build_threads)
+        exact = VectorIndex(args.dim, "flat", args.metric)
+        exact.build(ids, corpus)
+        _, truth = exact.search(queries, args.k)
+
+        for index_type in args.types:
+            index = VectorIndex(args.dim, index_type, args.metric, pq_m=args.pq_m,
+                                nprobe=args.nprobe, ef_search=args.ef_search)
+            faiss.omp_set_num_threads(build_threads)
+            start = time.perf_counter()
+            index.build(ids, corpus)
+            build_s = time.perf_counter() - start
+
+            faiss.omp_set_num_threads(args.threads)
+            latencies, found = [], []
+            for q in queries:
+                start = time.perf_counter()
+                _, result = index.search(q[None, :], args.k)
+                latencies.append(time.perf_counter() - start)
+                found.append(result[0])
+
+            label = index_type if index.active_type == index_type else f"{index_type}*"
+            print(f"{size:>9}  {label:<9}{build_s:>9.2f}{recall_at_k(np.array(found), truth):>11.3f}"
+                  f"{len(queries) / sum(latencies):>9.0f}{np.median(latencies) * 1000:>9.2f}"
+                  f"{index.memory_bytes() / 1e6:>9.1f}")
+        del corpus
+    print("* corpus too small to train this type; served by the flat fallback")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Memory per million chunks and recall loss of the retriever's storage modes.
+
+Chunk text is measured as a ``list[str]`` (tracemalloc) against a ``TextStore``
+buffer; vectors as a float32 flat index against the compressed index types,
+with recall@k relative to the float32 flat index. Numbers are measured at
+--size and scaled to one million chunks.
+
+    python benchmark_storage.py --size 200000 --metric cosine
+"""
+from benchmark_index import recall_at_k, synthetic_corpus
+from vector_index import LOSSY_TYPES, METRICS, VectorIndex
+from store import TextStore
+import numpy as np
+import tracemalloc
+import argparse
+
+WORDS = ("revenue", "guidance", "semiconductor", "margin", "quarter", "yield", "foundry",
+         "demand", "inventory", "capex", "TSMC", "Samsung", "beat", "miss", "outlook")
+
+
+def synthetic_chunks(n: int, chars: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        words, length = [f"chunk{i}"], 0
+        while length < chars:
+            word = WORDS[rng.integers(len(WORDS))]
+            words.append(word)
+            length += len(word) + 1
+        yield " ".join(words)
+
+
+def traced_bytes(build) -> int:
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--chunk-chars", type=int, default=600)
+    parser.add_argument("--types", nargs="+", default=["flat", "sq8", "pq", "ivf_pq"])
+    parser.add_argument("--metric", default="cosine", choices=METRICS)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4, help="candidates per result reranked from float16 vectors")
+    args = parser.parse_args()
+    scale = 1_000_000 / args.size
+
+    print(f"chunk text ({args.chunk_chars} chars), MB per 1M chunks")
+    as_list = traced_bytes(lambda: list(synthetic_chunks(args.size, args.chunk_chars)))
+
+    def build_store():
+        store = TextStore()
+        store.extend(synthetic_chunks(args.size, args.chunk_chars))
+        return store
+    as_store = traced_bytes(build_store)
+    print(f"  {'list[str]':<12}{as_list * scale / 1e6:>9.1f}")
+    print(f"  {'TextStore':<12}{as_store * scale / 1e6:>9.1f}  (in memory; memory-mapped once snapshotted)")
+
+    corpus = synthetic_corpus(args.size, args.dim)
+    queries = synthetic_corpus(args.queries, args.dim, seed=1)
+    ids = np.arange(args.size, dtype=np.int64)
+    exact = VectorIndex(args.dim, "flat", args.metric)
+    exact.build(ids, corpus)
+    _, truth = exact.search(queries, args.k)
+
+    stored = corpus.astype(np.float16)
+    print(f"\n{args.dim}-d vectors, MB per 1M chunks and recall@{args.k} vs float32 flat"
+          f" (last column: after reranking {args.rerank}x candidates)")
+    for index_type in args.types:
+        index = VectorIndex(args.dim, index_type, args.metric, pq_m=args.pq_m, nprobe=args.nprobe)
+        index.build(ids, corpus)
+        _, found = index.search(queries, args.k)
+        label = index_type if index.active_type == index_type else f"{index_type}*"
+        line = f"  {label:<12}{index.memory_bytes() * scale / 1e6:>9.1f}{recall_at_k(found, truth):>9.3f}"
+        if index.active_type in LOSSY_TYPES and args.rerank > 1:
+            _, candidates = index.search(queries, args.k * args.rerank)
+            _, found = index.rerank(queries, candidates, lambda rows: stored[rows].astype(np.float32), args.k)
+            line += f"{recall_at_k(found, truth):>11.3f}"
+        print(line)
+
+    # Stored embeddings (rebuilds, exact filtered search, reranking) kept as float16
+    half = VectorIndex(args.dim, "flat", args.metric)
+    half.build(ids, stored.astype(np.float32))
+    _, found = half.search(queries, args.k)
+    print(f"  {'float16 store':<12}{stored.nbytes * scale / 1e6:>9.1f}{recall_at_k(found, truth):>9.3f}")
+    print("* corpus too small to train this type; served by the flat fallback")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+import logging
+import codecs
+import json
+import time
+import uuid
+import os
+
+logger = logging.getLogger("retriever-agent")
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+READ_BLOCK_BYTES = 1 << 20
+PENDING_STATUSES = ("queued", "running")
+
+
+def parse_published(value) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def chunk_text(blocks: Iterator[str], chunk_size: int, overlap: int) -> Iterator[str]:
+    """Split a stream of text blocks into overlapping chunks, holding one chunk of lookahead.
+
+    Chunk ends snap back to whitespace when there is some in the second half of
+    the window, so words are not cut; whitespace inside a chunk is collapsed.
+    """
+    buffer, start = "", 0
+    emitted = False
+    for block in blocks:
+        buffer = buffer[start:] + block
+        start = 0
+        while len(buffer) - start > chunk_size:
+            window_end = start + chunk_size
+            end = max(buffer.rfind(c, start + chunk_size // 2, window_end) for c in " \n\t")
+            end = window_end if end < 0 else end
+            chunk = " ".join(buffer[start:end].split())
+            if chunk:
+                yield chunk
+                emitted = True
+            start = end - overlap
+    tail = " ".join(buffer[start:].split())
+    # After the last full chunk the buffer may hold nothing but its overlap
+    if tail and (not emitted or len(buffer) - start > overlap):
+        yield tail
+
+
+class IngestProgress:
+    """Bytes consumed from the source file, for progress reporting"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+
+
+def _read_blocks(path: str, progress: IngestProgress) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_BLOCK_BYTES)
+            progress.done += len(data)
+            if not data:
+                yield decoder.decode(b"", final=True)
+                return
+            yield decoder.decode(data)
+
+
+def iter_text_chunks(path: str, doc_id: str, metadata: dict, chunk_size: int, overlap: int,
+                     progress: IngestProgress) -> Iterator[Tuple[str, str, str, dict]]:
+    """(document id, chunk id, text, metadata) for one plain-text filing"""
+    for i, chunk in enumerate(chunk_text(_read_blocks(path, progress), chunk_size, overlap)):
+        yield doc_id, f"{doc_id}#{i}", chunk, metadata
+
+
+def iter_ndjson_chunks(path: str, doc_id: str, metadata: dict, chunk_size: int, overlap: int,
+                       progress: IngestProgress) -> Iterator[Tuple[str, str, str, dict]]:
+    """(document id, chunk id, text, metadata) for NDJSON records with ``text`` and optional
+    ``id``, ``ticker``, ``source``, ``region`` and ``published`` fields"""
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f):
+            progress.done += len(line)
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record_id = str(record.get("id") or f"{doc_id}:{line_no}")
+            record_meta = {
+                **metadata,
+                **{field: record[field] for field in ("ticker", "source", "region") if record.get(field)},
+            }
+            if record.get("published") is not None:
+                record_meta["published"] = parse_published(record["published"])
+            for i, chunk in enumerate(chunk_text(iter([record.get("text") or ""]), chunk_size, overlap)):
+                yield record_id, f"{record_id}#{i}", chunk, record_meta
+
+
+class Ingestor:
+    """Resumable background ingestion of large files into a ``RetrieverAgent``.
+
+    Sources are read in blocks and chunked lazily, and chunks are embedded and
+    upserted ``batch_size`` at a time, so memory does not grow with the file.
+    Job state is checkpointed after every batch under ``<data_dir>/ingest``. A
+    resumed job re-reads the file and skips the chunks it already committed,
+    without embedding them again.
+    """
+
+    def __init__(self, agent, data_dir: str, chunk_size: int = 1000, overlap: int = 200, batch_size: int = 256):
+        if overlap >= chunk_size // 2:
+            raise ValueError("Chunk overlap must be less than half the chunk size")
+        self.agent = agent
+        self.jobs_dir = os.path.join(data_dir, "ingest", "jobs")
+        self.uploads_dir = os.path.join(data_dir, "ingest", "uploads")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.jobs: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retriever-ingest")
+        for filename in os.listdir(self.jobs_dir):
+            if filename.endswith(".json"):
+                with open(os.path.join(self.jobs_dir, filename)) as f:
+                    job = json.load(f)
+                self.jobs[job["id"]] = job
+
+    def new_upload_path(self, filename: str) -> Tuple[str, str]:
+        """(job id, path) for an upload that is about to be streamed to disk"""
+        job_id = uuid.uuid4().hex[:12]
+        return job_id, os.path.join(self.uploads_dir, f"{job_id}-{os.path.basename(filename)}")
+
+    def submit(self, path: str, doc_id: str = None, fmt: str = None, metadata: dict = None,
+               job_id: str = None) -> dict:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No such file: {path}")
+        fmt = fmt or ("ndjson" if path.lower().endswith(NDJSON_SUFFIXES) else "text")
+        if fmt not in ("text", "ndjson"):
+            raise ValueError(f"Unknown format '{fmt}', expected text or ndjson")
+        job = {
+            "id": job_id or uuid.uuid4().hex[:12],
+            "path": os.path.abspath(path),
+            "doc_id": doc_id or os.path.splitext(os.path.basename(path))[0],
+            "format": fmt,
+            "metadata": metadata or {},
+            "status": "queued",
+            "total_bytes": os.path.getsize(path),
+            "bytes_done": 0,
+            "chunks_done": 0,
+            "chunks_encoded": 0,
+            "error": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        self._save(job)
+        self.executor.submit(self._run, job["id"])
+        return self.status(job["id"])
+
+    def resume_pending(self):
+        """Restart jobs a previous process left queued or half done"""
+        for job_id, job in list(self.jobs.items()):
+            if job["status"] in PENDING_STATUSES:
+                logger.info(f"Resuming ingest job {job_id} after {job['chunks_done']} chunks")
+                self.executor.submit(self._run, job_id)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        job["percent"] = round(100 * job["bytes_done"] / job["total_bytes"], 1) if job["total_bytes"] else 100.0
+        return job
+
+    def list(self) -> List[dict]:
+        return [self.status(job_id) for job_id in sorted(self.jobs, key=lambda j: self.jobs[j]["created_at"])]
+
+    def stop(self):
+        """Stop after the current batch; unfinished jobs resume on the next start"""
+        self.stop_event.set()
+        self.executor.shutdown(wait=True)
+
+    def _save(self, job: dict):
+        job["updated_at"] = time.time()
+        with self.lock:
+            self.jobs[job["id"]] = dict(job)
+        path = os.path.join(self.jobs_dir, f"{job['id']}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(job, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _chunks(self, job: dict, progress: IngestProgress):
+        reader = iter_ndjson_chunks if job["format"] == "ndjson" else iter_text_chunks
+        return reader(job["path"], job["doc_id"], job["metadata"], self.chunk_size, self.overlap, progress)
+
+    def _run(self, job_id: str):
+        with self.lock:
+            job = dict(self.jobs[job_id])
+        if self.stop_event.is_set():
+            return
+        job["status"] = "running"
+        self._save(job)
+        started = time.perf_counter()
+        committed = job["chunks_done"]
+        progress = IngestProgress(job["total_bytes"])
+        chunk_counts: Dict[str, int] = {}
+        batch = []
+        try:
+            for position, (doc_id, chunk_id, text, meta) in enumerate(self._chunks(job, progress)):
+                chunk_counts[doc_id] = chunk_counts.get(doc_id, 0) + 1
+                if position < committed:
+                    continue
+                batch.append((chunk_id, text, meta))
+                if len(batch) >= self.batch_size:
+                    self._commit(job, batch, progress)
+                    batch = []
+                    if self.stop_event.is_set():
+                        logger.info(f"Ingest job {job_id} paused after {job['chunks_done']} chunks")
+                        return
+            if batch:
+                self._commit(job, batch, progress)
+            job["stale_deleted"] = self._delete_stale(chunk_counts)
+            job["status"] = "done"
+            job["bytes_done"] = job["total_bytes"]
+            logger.info(f"Ingest job {job_id} finished: {job['chunks_done']} chunks in "
+                        f"{time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Ingest job {job_id} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        self._save(job)
+
+    def _commit(self, job: dict, batch: List[tuple], progress: IngestProgress):
+        result = self.agent.upsert(batch)
+        job["chunks_done"] += len(batch)
+        job["chunks_encoded"] += result["encoded"]
+        job["bytes_done"] = progress.done
+        self._save(job)
+
+    def _delete_stale(self, chunk_counts: Dict[str, int]) -> int:
+        """Drop chunks left over from a longer earlier version of a re-ingested document"""
+        stale = []
+        for chunk_id in list(self.agent.doc_rows):
+            doc_id, _, position = chunk_id.rpartition("#")
+            if doc_id in chunk_counts and position.isdigit() and int(position) >= chunk_counts[doc_id]:
+                stale.append(chunk_id)
+        return self.agent.delete(stale) if stale else 0
@@ -0,0 +1,157 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from array import array
+import numpy as np
+import re
+
+# Keeps tickers such as 2330.TW or 005930.KS and figures such as 4.5 whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank); returns (id, score) best first"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class BM25Index:
+    """Incremental in-memory BM25 inverted index over row ids.
+
+    Each term keeps parallel ``array`` postings of rows and term frequencies;
+    rows only ever grow, so postings stay sorted. Removed rows are masked out
+    of results, the length statistics and document frequencies straight away,
+    and dropped from the postings when the owner rebuilds the index after
+    compaction.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("i")
+        self.alive = array("b")
+        self.live_count = 0
+        self.live_length = 0
+        self.impact_cache: Dict[str, tuple] = {}
+        # Live document frequencies, valid while a term's postings and the removal count are unchanged
+        self.df_cache: Dict[str, Tuple[int, int, int]] = {}
+        self.removals = 0
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def add(self, rows: Iterable[int], texts: Iterable[str]):
+        for row, text in zip(rows, texts):
+            while len(self.doc_lengths) <= row:
+                self.doc_lengths.append(0)
+                self.alive.append(0)
+            tokens = tokenize(text)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                rows_, tfs = self.postings.setdefault(token, (array("q"), array("i")))
+                rows_.append(row)
+                tfs.append(count)
+            self.doc_lengths[row] = len(tokens)
+            self.alive[row] = 1
+            self.live_count += 1
+            self.live_length += len(tokens)
+
+    def remove(self, rows: Iterable[int]):
+        for row in rows:
+            if row < len(self.alive) and self.alive[row]:
+                self.removals += 1
+                self.alive[row] = 0
+                self.live_count -= 1
+                self.live_length -= self.doc_lengths[row]
+
+    def _impacts(self, term: str, avg_length: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, length-normalized tf weights) for a term, cached until it grows or avgdl drifts"""
+        rows_, tfs_ = self.postings[term]
+        cached = self.impact_cache.get(term)
+        if cached is not None and cached[0] == len(rows_) and abs(cached[1] - avg_length) <= 0.02 * cached[1]:
+            return cached[2], cached[3]
+        # Copies: a live view of an array.array would block later appends to it
+        rows = np.frombuffer(rows_, dtype=np.int64).copy()
+        tfs = np.frombuffer(tfs_, dtype=np.int32).astype(np.float32)
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.int32)[rows]
+        weights = tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * doc_lengths / avg_length))
+        self.impact_cache[term] = (len(rows_), avg_length, rows, weights)
+        return rows, weights
+
+    def _doc_freq(self, term: str) -> int:
+        """Number of live rows containing the term; postings still hold removed rows until a rebuild"""
+        rows_ = self.postings[term][0]
+        cached = self.df_cache.get(term)
+        if cached is not None and cached[0] == len(rows_) and cached[1] == self.removals:
+            return cached[2]
+        df = len(rows_)
+        if self.removals:
+            alive = np.frombuffer(self.alive, dtype=np.int8)
+            df = int(alive[np.frombuffer(rows_, dtype=np.int64)].sum())
+        self.df_cache[term] = (len(rows_), self.removals, df)
+        return df
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, scores) for the query terms, optionally restricted to sorted ``allowed`` rows.
+
+        Terms are visited rarest first (MaxScore): once the k-th best partial
+        score beats the most the remaining terms could add, those terms only
+        rescore the candidates found so far instead of widening the union.
+        """
+        terms = [term for term in set(tokenize(query)) if term in self.postings]
+        if not terms or not self.live_count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        avg_length = max(self.live_length / self.live_count, 1.0)
+        usable = np.frombuffer(self.alive, dtype=np.int8).astype(bool)
+        if allowed is not None:
+            restricted = np.zeros(len(usable), dtype=bool)
+            # Metadata still lists rows deleted past the end of a rebuilt index
+            restricted[allowed[allowed < len(usable)]] = True
+            usable &= restricted
+
+        # Live document frequency, so idf stays positive and the MaxScore bounds below monotonic
+        dfs = {term: self._doc_freq(term) for term in terms}
+        terms = [term for term in terms if dfs[term]]
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        idfs = {term: np.log(1 + (self.live_count - dfs[term] + 0.5) / (dfs[term] + 0.5)) for term in terms}
+        terms.sort(key=lambda term: -idfs[term])
+        bounds = np.cumsum([idfs[term] * (self.k1 + 1) for term in reversed(terms)])[::-1]
+
+        rows = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float32)
+        for position, term in enumerate(terms):
+            term_rows, weights = self._impacts(term, avg_length)
+            if len(rows) >= k and np.partition(scores, len(scores) - k)[len(scores) - k] > bounds[position]:
+                # Non-essential term: only add to rows already in the candidate set
+                hits = np.searchsorted(term_rows, rows)
+                hits[hits == len(term_rows)] = 0
+                found = term_rows[hits] == rows
+                scores[found] += idfs[term] * weights[hits[found]]
+                continue
+            keep = usable[term_rows]
+            term_rows, contributions = term_rows[keep], idfs[term] * weights[keep]
+            if not len(rows):
+                rows, scores = term_rows, contributions.astype(np.float32)
+                continue
+            rows, inverse = np.unique(np.concatenate([rows, term_rows]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([scores, contributions])).astype(np.float32)
+
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def memory_bytes(self) -> int:
+        postings = sum(rows.itemsize * len(rows) + tfs.itemsize * len(tfs) for rows, tfs in self.postings.values())
+        impacts = sum(cached[2].nbytes + cached[3].nbytes for cached in self.impact_cache.values())
+        return postings + impacts + len(self.doc_lengths) * 4 + len(self.alive)
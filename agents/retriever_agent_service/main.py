@@ -1,76 +1,382 @@
 # retriever/main.py
-from fastapi import FastAPI
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
-from pydantic import BaseModel
-from typing import List
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from retriever import QUERY_MODES, RetrieverAgent
+from ingest import Ingestor
+from news import NewsPipeline
+import asyncio
+import logging
+import os
 
 app = FastAPI()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("retriever-agent")
+
+# Snapshots of the index, chunks and embeddings live here across restarts
+RETRIEVER_DATA_DIR = os.getenv(
+    "RETRIEVER_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "retriever_data")
+)
+SNAPSHOT_INTERVAL = float(os.getenv("RETRIEVER_SNAPSHOT_INTERVAL", "300"))
+
+# flat | ivf_flat | ivf_pq | hnsw | sq8 | pq, scored by l2 | cosine | ip
+INDEX_CONFIG = {
+    "index_type": os.getenv("RETRIEVER_INDEX_TYPE", "flat"),
+    "metric": os.getenv("RETRIEVER_METRIC", "l2"),
+    "nlist": int(os.getenv("RETRIEVER_NLIST", "0")) or None,
+    "nprobe": int(os.getenv("RETRIEVER_NPROBE", "16")),
+    "pq_m": int(os.getenv("RETRIEVER_PQ_M", "48")),
+    "hnsw_m": int(os.getenv("RETRIEVER_HNSW_M", "32")),
+    "ef_search": int(os.getenv("RETRIEVER_EF_SEARCH", "64")),
+}
+
+# Query micro-batching and the query embedding LRU
+QUERY_BATCH_MAX_SIZE = int(os.getenv("RETRIEVER_QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_WINDOW_MS = float(os.getenv("RETRIEVER_QUERY_BATCH_WINDOW_MS", "5"))
+QUERY_QUEUE_MAX_SIZE = int(os.getenv("RETRIEVER_QUERY_QUEUE_MAX_SIZE", "256"))
+QUERY_CACHE_SIZE = int(os.getenv("RETRIEVER_QUERY_CACHE_SIZE", "4096"))
+MAX_TOP_K = int(os.getenv("RETRIEVER_MAX_TOP_K", "100"))
+
+# float16 halves the stored embeddings used for rebuilds and exact filtered search
+EMBEDDING_DTYPE = os.getenv("RETRIEVER_EMBEDDING_DTYPE", "float32")
+# sq8 / pq / ivf_pq fetch top_k x this many candidates and rerank them from stored embeddings
+RERANK_FACTOR = int(os.getenv("RETRIEVER_RERANK_FACTOR", "4"))
+
+# vector | lexical (BM25) | hybrid (both, fused by reciprocal rank) when a query doesn't say
+QUERY_MODE = os.getenv("RETRIEVER_QUERY_MODE", "vector")
+HYBRID_CANDIDATES = int(os.getenv("RETRIEVER_HYBRID_CANDIDATES", "100"))
+
+# Streaming ingestion of large filings: chunk size and overlap are in characters
+CHUNK_SIZE = int(os.getenv("RETRIEVER_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVER_CHUNK_OVERLAP", "200"))
+INGEST_BATCH_SIZE = int(os.getenv("RETRIEVER_INGEST_BATCH_SIZE", "256"))
+
+# Scraper headlines streamed into the index; a poll interval of 0 turns the pipeline off
+NEWS_SCRAPER_URL = os.getenv("RETRIEVER_NEWS_SCRAPER_URL", "http://localhost:8003")
+NEWS_POLL_INTERVAL = float(os.getenv("RETRIEVER_NEWS_POLL_INTERVAL", "60"))
+NEWS_BATCH_SIZE = int(os.getenv("RETRIEVER_NEWS_BATCH_SIZE", "32"))
+NEWS_RETENTION_HOURS = float(os.getenv("RETRIEVER_NEWS_RETENTION_HOURS", "168"))
 
 # Request models
 class IndexRequest(BaseModel):
     documents: List[str]
 
+class QueryFilters(BaseModel):
+    ticker: Optional[Union[str, List[str]]] = None
+    source: Optional[Union[str, List[str]]] = None
+    region: Optional[Union[str, List[str]]] = None
+    published_after: Optional[datetime] = None
+    published_before: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        """Fields as lists of accepted values, dates as epoch seconds"""
+        filters = {}
+        for field in ("ticker", "source", "region"):
+            value = getattr(self, field)
+            if value:
+                filters[field] = [value] if isinstance(value, str) else list(value)
+        for field in ("published_after", "published_before"):
+            value = getattr(self, field)
+            if value is not None:
+                filters[field] = value.timestamp()
+        return filters
+
 class QueryRequest(BaseModel):
     question: str
-    top_k: int = 3
-
-# Retriever implementation
-class RetrieverAgent:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.index = None
-        self.text_chunks = []
-        self.initialize_default_data()
-
-    def initialize_default_data(self):
-        default_docs = [
-            "TSMC reported 4% earnings beat in Q2 2024",
-            "Samsung Electronics lowered Q3 guidance by 2%",
-            "Asian tech sector shows neutral sentiment with caution on rising bond yields",
-            "Apple increases orders with Asian semiconductor suppliers",
-            "Baidu announces new AI chip collaboration with Chinese foundries"
-        ]
-        self.build_index(default_docs)
-
-    def build_index(self, documents: List[str]):
-        self.text_chunks = documents
-        embeddings = self.model.encode(documents)
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(np.array(embeddings))
-
-    def query(self, question: str, top_k=3):
-        query_vec = self.model.encode([question])
-        distances, indices = self.index.search(np.array(query_vec), top_k)
-        return [self.text_chunks[i] for i in indices[0]]
+    top_k: int = Field(3, gt=0, le=MAX_TOP_K)
+    filters: Optional[QueryFilters] = None
+    mode: Optional[str] = None
+
+class DocumentMetadata(BaseModel):
+    ticker: Optional[str] = None
+    source: Optional[str] = None
+    region: Optional[str] = None
+    published: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "ticker": self.ticker,
+            "source": self.source,
+            "region": self.region,
+            "published": self.published.timestamp() if self.published else None
+        }
+
+class Document(BaseModel):
+    id: str
+    text: str
+    metadata: Optional[DocumentMetadata] = None
+
+    def to_tuple(self) -> tuple:
+        return (self.id, self.text, self.metadata.to_dict() if self.metadata else None)
+
+class DocumentsRequest(BaseModel):
+    documents: List[Document]
+
+class DeleteRequest(BaseModel):
+    ids: List[str]
+
+class IngestRequest(BaseModel):
+    path: str
+    doc_id: Optional[str] = None
+    format: Optional[str] = None
+    metadata: Optional[DocumentMetadata] = None
 
 # Initialize agent
-agent = RetrieverAgent()
+agent = RetrieverAgent(RETRIEVER_DATA_DIR, index_config=INDEX_CONFIG, query_cache_size=QUERY_CACHE_SIZE,
+                       embedding_dtype=EMBEDDING_DTYPE, rerank_factor=RERANK_FACTOR,
+                       query_mode=QUERY_MODE, hybrid_candidates=HYBRID_CANDIDATES)
+
+class QueryBatcher:
+    """Merges queries arriving within a short window into one encode and one index search"""
+
+    def __init__(self, query_fn, max_batch_size: int, window_ms: float, max_queue_size: int):
+        self.query_fn = query_fn
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.queue: asyncio.Queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.worker = None
+        self.stats = {
+            "requests_total": 0,
+            "rejected_total": 0,
+            "batches_total": 0,
+            "batched_requests_total": 0,
+            "batch_size_histogram": {}
+        }
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, question: str, top_k: int, filters: dict = None, mode: str = None) -> List[dict]:
+        """Queue a query and wait for its matches; raises asyncio.QueueFull under backpressure"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((question, top_k, filters, mode, future))
+        except asyncio.QueueFull:
+            self.stats["rejected_total"] += 1
+            raise
+        self.stats["requests_total"] += 1
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return [item for item in batch if not item[-1].cancelled()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            size = len(batch)
+            self.stats["batches_total"] += 1
+            self.stats["batched_requests_total"] += size
+            histogram = self.stats["batch_size_histogram"]
+            histogram[size] = histogram.get(size, 0) + 1
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.query_fn,
+                    *([item[field] for item in batch] for field in range(4))
+                )
+            except Exception as e:
+                logger.error(f"Batch query failed ({size} queries): {str(e)}")
+                if size > 1:
+                    # Re-run each query alone so only the one that broke the batch fails
+                    await self._run_each(batch)
+                    continue
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (*_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _run_each(self, batch: list):
+        loop = asyncio.get_running_loop()
+        for question, top_k, filters, mode, future in batch:
+            if future.done():
+                continue
+            try:
+                result = await loop.run_in_executor(
+                    self.executor, self.query_fn, [question], [top_k], [filters], [mode]
+                )
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(result[0])
+
+    def metrics(self) -> dict:
+        batches = self.stats["batches_total"]
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.max_queue_size,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.window * 1000,
+            "avg_batch_size": round(self.stats["batched_requests_total"] / batches, 2) if batches else 0,
+            **self.stats
+        }
+
+batcher = QueryBatcher(agent.query_batch, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_WINDOW_MS, QUERY_QUEUE_MAX_SIZE)
+ingestor = Ingestor(agent, RETRIEVER_DATA_DIR, CHUNK_SIZE, CHUNK_OVERLAP, INGEST_BATCH_SIZE)
+news_pipeline = NewsPipeline(agent, NEWS_SCRAPER_URL, NEWS_POLL_INTERVAL, NEWS_BATCH_SIZE,
+                             NEWS_RETENTION_HOURS * 3600)
 
 # API endpoints
+@app.on_event("startup")
+async def startup_event():
+    batcher.start()
+    agent.start_snapshotter(SNAPSHOT_INTERVAL)
+    ingestor.resume_pending()
+    news_pipeline.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
+    ingestor.stop()
+    news_pipeline.stop()
+    agent.stop()
+
+# Update handlers are sync so FastAPI runs them on its threadpool; the agent's
+# read/write lock keeps batched queries consistent while updates are applied.
 @app.post("/index_documents")
-async def index_documents(request: IndexRequest):
-    """Endpoint to update the document index"""
-    agent.build_index(request.documents)
-    return {"status": "success", "indexed_documents": len(request.documents)}
+def index_documents(request: IndexRequest):
+    """Endpoint to replace the whole document index"""
+    result = agent.build_index(request.documents)
+    return {"status": "success", "indexed_documents": len(request.documents), **result}
+
+@app.post("/documents/add")
+def add_documents(request: DocumentsRequest):
+    """Insert new documents by id; ids that already exist are reported as conflicts"""
+    result = agent.upsert([d.to_tuple() for d in request.documents], add_only=True)
+    return {"status": "success", **result}
+
+@app.post("/documents/upsert")
+def upsert_documents(request: DocumentsRequest):
+    """Insert or replace documents by id; unchanged documents skip the encoder"""
+    result = agent.upsert([d.to_tuple() for d in request.documents])
+    return {"status": "success", **result}
+
+@app.post("/documents/delete")
+def delete_documents(request: DeleteRequest):
+    """Remove documents by id"""
+    return {"status": "success", "deleted": agent.delete(request.ids)}
+
+@app.post("/ingest")
+def ingest_file(request: IngestRequest):
+    """Chunk, embed and index a text or NDJSON file on local disk in the background"""
+    metadata = request.metadata.to_dict() if request.metadata else None
+    try:
+        return ingestor.submit(request.path, request.doc_id, request.format, metadata)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/ingest/upload")
+async def ingest_upload(request: Request, filename: str, doc_id: Optional[str] = None,
+                        format: Optional[str] = None, ticker: Optional[str] = None,
+                        source: Optional[str] = None, region: Optional[str] = None):
+    """Stream a raw request body to disk, then ingest it like /ingest"""
+    job_id, path = ingestor.new_upload_path(filename)
+    loop = asyncio.get_running_loop()
+    with open(path, "wb") as f:
+        async for data in request.stream():
+            await loop.run_in_executor(None, f.write, data)
+    metadata = {"ticker": ticker, "source": source, "region": region}
+    try:
+        return ingestor.submit(path, doc_id or os.path.splitext(filename)[0], format, metadata, job_id=job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/ingest")
+def list_ingest_jobs():
+    """All ingest jobs with their progress"""
+    return {"jobs": ingestor.list()}
+
+@app.get("/ingest/{job_id}")
+def ingest_status(job_id: str):
+    """Progress of one ingest job"""
+    job = ingestor.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job {job_id}")
+    return job
+
+@app.post("/news/poll")
+def poll_news():
+    """Pull new scraper headlines into the index now instead of waiting for the next poll"""
+    try:
+        return news_pipeline.poll()
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"Scraping agent unreachable: {str(e)}")
 
 @app.post("/query")
 async def query_documents(request: QueryRequest):
-    """Endpoint to query the document index"""
-    results = agent.query(request.question, request.top_k)
-    return {"results": results}
+    """Endpoint to query the document index, optionally restricted by metadata filters"""
+    filters = request.filters.to_dict() if request.filters else None
+    mode = request.mode or QUERY_MODE
+    if mode not in QUERY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown query mode '{mode}', expected one of {', '.join(QUERY_MODES)}")
+    try:
+        matches = await batcher.submit(request.question, request.top_k, filters, mode)
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Retriever query queue is full, retry later",
+            headers={"Retry-After": "1"}
+        )
+    for match in matches:
+        published = match["metadata"]["published"]
+        if published is not None:
+            match["metadata"]["published"] = datetime.fromtimestamp(published, tz=timezone.utc).isoformat()
+    # results keeps the plain chunk list existing callers consume
+    return {
+        "results": [match["text"] for match in matches],
+        "matches": matches,
+        "mode": mode,
+        "metric": {"vector": agent.index.metric, "lexical": "bm25", "hybrid": "rrf"}[mode]
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Query batching, embedding cache and news pipeline counters"""
+    return {
+        "batcher": batcher.metrics(),
+        "query_cache": agent.query_cache.metrics(),
+        "news_pipeline": news_pipeline.metrics()
+    }
 
 @app.get("/")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "index_size": len(agent.text_chunks),
+        "index_size": len(agent),
+        "index": agent.index.config,
         "model": agent.model.get_sentence_embedding_dimension()
     }
-
-# Initialize with default data on startup
-@app.on_event("startup")
-async def startup_event():
-    agent.initialize_default_data()
\ No newline at end of file
@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import faiss
+
+FIELDS = ("ticker", "source", "region")
+DATE_FIELD = "published"
+SNAPSHOT_STRINGS = [f"meta_{field}" for field in FIELDS]
+SNAPSHOT_ARRAYS = [f"meta_{DATE_FIELD}"]
+
+
+def filter_key(field: str, value: str) -> str:
+    value = value.strip()
+    return value.upper() if field == "ticker" else value.lower()
+
+
+def normalize_metadata(meta: Optional[dict]) -> dict:
+    meta = meta or {}
+    normalized = {field: meta.get(field) or None for field in FIELDS}
+    published = meta.get(DATE_FIELD)
+    normalized[DATE_FIELD] = None if published is None else float(published)
+    return normalized
+
+
+def filter_signature(filters: Optional[dict]) -> tuple:
+    """Hashable form of a filter, so queries sharing one can share a search"""
+    return tuple(sorted(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in (filters or {}).items() if value not in (None, [], "")
+    ))
+
+
+class MetadataIndex:
+    """Per-row document metadata with postings lists for filtering.
+
+    Categorical fields keep a value -> rows postings list (rows are appended in
+    ascending order, so every list stays sorted); the published timestamp is a
+    float64 column (NaN when unknown) compared vectorized. ``allowed_rows``
+    intersects them into the row set that a FAISS ID selector restricts the
+    search to.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, List[str]] = {field: [] for field in FIELDS}
+        self.postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in FIELDS}
+        self.published = np.full(1024, np.nan)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, rows: Sequence[int], metadata: Sequence[Optional[dict]]):
+        if self.size + len(rows) > len(self.published):
+            grown = np.full(max(2 * len(self.published), self.size + len(rows)), np.nan)
+            grown[:self.size] = self.published[:self.size]
+            self.published = grown
+        for row, meta in zip(rows, metadata):
+            meta = meta or {}
+            for field in FIELDS:
+                value = meta.get(field) or ""
+                self.values[field].append(value)
+                if value:
+                    self.postings[field].setdefault(filter_key(field, value), []).append(row)
+            published = meta.get(DATE_FIELD)
+            self.published[row] = np.nan if published is None else float(published)
+        self.size += len(rows)
+
+    def row(self, row: int) -> dict:
+        meta = {field: self.values[field][row] or None for field in FIELDS}
+        published = self.published[row]
+        meta[DATE_FIELD] = None if np.isnan(published) else float(published)
+        return meta
+
+    def rows(self, rows: Sequence[int]) -> List[dict]:
+        return [self.row(row) for row in rows]
+
+    def allowed_rows(self, filters: dict) -> Optional[np.ndarray]:
+        """Sorted rows matching every given field (any of its values), or None when unfiltered"""
+        mask = None
+        for field in FIELDS:
+            wanted = filters.get(field)
+            if not wanted:
+                continue
+            field_mask = np.zeros(self.size, dtype=bool)
+            for value in wanted:
+                field_mask[self.postings[field].get(filter_key(field, value), [])] = True
+            mask = field_mask if mask is None else mask & field_mask
+        after, before = filters.get("published_after"), filters.get("published_before")
+        if after is not None or before is not None:
+            published = self.published[:self.size]
+            date_mask = ~np.isnan(published)
+            if after is not None:
+                date_mask &= published >= after
+            if before is not None:
+                date_mask &= published <= before
+            mask = date_mask if mask is None else mask & date_mask
+        return None if mask is None else np.flatnonzero(mask)
+
+    @staticmethod
+    def selector(rows: np.ndarray, size: int, keep_alive: list):
+        """Bitmap ID selector over rows; the packed bitmap must outlive the search"""
+        bitmap = np.zeros(size, dtype=bool)
+        bitmap[rows] = True
+        packed = np.packbits(bitmap, bitorder="little")
+        keep_alive.append(packed)
+        return faiss.IDSelectorBitmap(size, faiss.swig_ptr(packed))
+
+    def columns(self):
+        """(strings, arrays) for a snapshot"""
+        strings = {key: self.values[field] for key, field in zip(SNAPSHOT_STRINGS, FIELDS)}
+        return strings, {SNAPSHOT_ARRAYS[0]: self.published[:self.size].copy()}
+
+    @classmethod
+    def from_columns(cls, size: int, strings: dict, arrays: dict) -> "MetadataIndex":
+        index = cls()
+        metadata = [{} for _ in range(size)]
+        for key, field in zip(SNAPSHOT_STRINGS, FIELDS):
+            values = strings.get(key)
+            if values is not None:
+                for meta, value in zip(metadata, values):
+                    meta[field] = value
+        published = arrays.get(SNAPSHOT_ARRAYS[0])
+        if published is not None:
+            for meta, value in zip(metadata, published):
+                meta[DATE_FIELD] = None if np.isnan(value) else value
+        index.append(range(size), metadata)
+        return index
@@ -0,0 +1,223 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from retriever import content_hash
+import urllib.request
+import threading
+import hashlib
+import logging
+import json
+import time
+
+logger = logging.getLogger("retriever-agent")
+
+NEWS_PREFIX = "news:"
+NEWS_SOURCE = "news"
+
+
+def news_doc_id(item: dict) -> str:
+    """Stable document id of a news item: its feed identity (guid/link), not its wording"""
+    key = item.get("id") or item.get("link") or f"{item.get('title', '')}\n{item.get('summary', '')}"
+    return NEWS_PREFIX + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def news_text(item: dict) -> str:
+    title, summary = (item.get("title") or "").strip(), (item.get("summary") or "").strip()
+    return f"{title}. {summary}" if title and summary else title or summary
+
+
+class NewsPipeline:
+    """Background poller that streams new scraper headlines into a ``RetrieverAgent``.
+
+    Each poll asks the scraping agent's ``/news`` for items first seen after
+    the last cursor, drops those already indexed with the same text (by
+    stable id and content hash), and upserts the rest in small batches so
+    queries never wait on one large encode. News documents older than the
+    retention window are deleted, which keeps the news share of the index
+    bounded. The indexed set is rebuilt from the agent's metadata on start,
+    so a restart doesn't re-embed anything. Whether an item is already indexed
+    is checked against the agent itself, so news deleted or replaced through
+    other endpoints is picked up again by the next poll.
+    """
+
+    def __init__(self, agent, scraper_url: str, interval: float = 60, batch_size: int = 32,
+                 retention: float = 7 * 86400, timeout: float = 15, page_size: int = 500):
+        self.agent = agent
+        self.scraper_url = scraper_url.rstrip("/")
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.timeout = timeout
+        self.page_size = page_size
+        self.cursor = 0.0
+        # document id -> (content hash, published timestamp) of the news this pipeline indexed
+        self.indexed: Dict[str, Tuple[str, float]] = {}
+        # One poll at a time (background thread or /news/poll); the state lock is only held
+        # briefly around changes to the dict and deques, so metrics never wait on a poll
+        self.poll_lock = threading.RLock()
+        self.state_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.lags = deque(maxlen=1000)          # seconds from scraper first-seen to searchable
+        self.recent = deque()                   # (indexed_at, count) within the throughput window
+        self.throughput_window = 300.0
+        self.stats = {
+            "polls": 0, "poll_errors": 0, "items_received": 0, "items_unchanged": 0,
+            "items_indexed": 0, "items_encoded": 0, "items_evicted": 0, "batches": 0,
+            "encode_seconds": 0.0, "last_poll_at": None, "last_indexed_at": None
+        }
+        self._restore()
+
+    def _restore(self):
+        """Recover the indexed news set from the agent, e.g. after loading a snapshot"""
+        with self.agent.lock.read():
+            for doc_id, row in self.agent.doc_rows.items():
+                if doc_id.startswith(NEWS_PREFIX):
+                    published = self.agent.metadata.row(row).get("published") or time.time()
+                    self.indexed[doc_id] = (self.agent.row_hashes[row], published)
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True, name="retriever-news")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.timeout)
+
+    def _run(self):
+        failing = False
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+                if failing:
+                    logger.info("News pipeline reached the scraping agent again")
+                failing = False
+            except Exception as e:
+                self.stats["poll_errors"] += 1
+                # One log line per outage, not one per poll
+                if not failing:
+                    logger.warning(f"News pipeline poll failed: {str(e)}")
+                failing = True
+            self.stop_event.wait(self.interval)
+
+    def _fetch(self, cursor: float) -> dict:
+        url = f"{self.scraper_url}/news?{urlencode({'since': cursor, 'limit': self.page_size})}"
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def poll(self) -> dict:
+        """Pull everything new since the cursor, index it and evict expired news"""
+        with self.poll_lock:
+            self.stats["polls"] += 1
+            self.stats["last_poll_at"] = time.time()
+            indexed = 0
+            while not self.stop_event.is_set():
+                page = self._fetch(self.cursor)
+                indexed += self.index_items(page["items"])
+                with self.state_lock:
+                    self.cursor = max(self.cursor, page["cursor"])
+                if not page.get("has_more"):
+                    break
+            evicted = self.evict()
+            return {"indexed": indexed, "evicted": evicted, "cursor": self.cursor}
+
+    def _live_hashes(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Content hash of each document the agent currently holds, by id"""
+        with self.agent.lock.read():
+            rows = {doc_id: self.agent.doc_rows.get(doc_id) for doc_id in doc_ids}
+            return {doc_id: self.agent.row_hashes[row] for doc_id, row in rows.items() if row is not None}
+
+    def _reconcile(self):
+        """Forget news the agent no longer holds, e.g. deleted through /documents/delete"""
+        live = self._live_hashes(list(self.indexed))
+        with self.state_lock:
+            for doc_id in [doc_id for doc_id in self.indexed if doc_id not in live]:
+                del self.indexed[doc_id]
+
+    def index_items(self, items: List[dict]) -> int:
+        """Upsert new or edited items in batches; returns how many were indexed"""
+        with self.poll_lock:
+            return self._index_items(items)
+
+    def _index_items(self, items: List[dict]) -> int:
+        self.stats["items_received"] += len(items)
+        cutoff = time.time() - self.retention
+        live = self._live_hashes([news_doc_id(item) for item in items])
+        pending = []
+        for item in items:
+            text = news_text(item)
+            if not text:
+                continue
+            doc_id = news_doc_id(item)
+            published = item.get("published") or item.get("first_seen") or time.time()
+            if published < cutoff:
+                continue
+            if live.get(doc_id) == content_hash(text):
+                self.stats["items_unchanged"] += 1
+                continue
+            meta = {"ticker": item.get("ticker"), "source": NEWS_SOURCE, "published": published}
+            pending.append((doc_id, text, meta, item.get("first_seen")))
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            started = time.perf_counter()
+            result = self.agent.upsert([(doc_id, text, meta) for doc_id, text, meta, _ in batch])
+            now = time.time()
+            self.stats["encode_seconds"] += time.perf_counter() - started
+            self.stats["batches"] += 1
+            self.stats["items_indexed"] += len(batch)
+            self.stats["items_encoded"] += result["encoded"]
+            self.stats["last_indexed_at"] = now
+            with self.state_lock:
+                self.recent.append((now, len(batch)))
+                for doc_id, text, meta, first_seen in batch:
+                    self.indexed[doc_id] = (content_hash(text), meta["published"])
+                    if first_seen:
+                        self.lags.append(max(now - first_seen, 0.0))
+        return len(pending)
+
+    def evict(self) -> int:
+        """Delete news published before the retention window"""
+        with self.poll_lock:
+            self._reconcile()
+            cutoff = time.time() - self.retention
+            expired = [doc_id for doc_id, (_, published) in self.indexed.items() if published < cutoff]
+            if not expired:
+                return 0
+            deleted = self.agent.delete(expired)
+            with self.state_lock:
+                for doc_id in expired:
+                    del self.indexed[doc_id]
+            self.stats["items_evicted"] += deleted
+            return deleted
+
+    def metrics(self) -> dict:
+        with self.state_lock:
+            return self._metrics()
+
+    def _metrics(self) -> dict:
+        now = time.time()
+        while self.recent and self.recent[0][0] < now - self.throughput_window:
+            self.recent.popleft()
+        lags = sorted(self.lags)
+        indexed = self.stats["items_indexed"]
+        return {
+            "enabled": self.interval > 0,
+            "scraper_url": self.scraper_url,
+            "cursor": self.cursor,
+            "news_documents": len(self.indexed),
+            "retention_hours": round(self.retention / 3600, 2),
+            "lag_seconds": {
+                "p50": round(lags[len(lags) // 2], 3) if lags else None,
+                "p95": round(lags[int(len(lags) * 0.95)], 3) if lags else None,
+                "max": round(lags[-1], 3) if lags else None
+            },
+            "since_last_poll_seconds": round(now - self.stats["last_poll_at"], 1) if self.stats["last_poll_at"] else None,
+            "items_per_second": round(sum(n for _, n in self.recent) / self.throughput_window, 3),
+            "indexed_per_encode_second": round(indexed / self.stats["encode_seconds"], 1)
+            if self.stats["encode_seconds"] else None,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
@@ -1,20 +1,515 @@
 from sentence_transformers import SentenceTransformer
-import faiss
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+from snapshot import (
+    append_wal,
+    decode_vectors,
+    encode_vectors,
+    read_snapshot,
+    read_wal,
+    truncate_wal,
+    write_snapshot
+)
+from metadata import SNAPSHOT_ARRAYS, SNAPSHOT_STRINGS, MetadataIndex, filter_signature, normalize_metadata
+from store import EmbeddingStore, TextStore
+from vector_index import LOSSY_TYPES, VectorIndex
+from lexical import BM25Index, reciprocal_rank_fusion
 import numpy as np
+import threading
+import hashlib
+import logging
+import re
+
+logger = logging.getLogger("retriever-agent")
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+QUERY_MODES = ("vector", "lexical", "hybrid")
+SNAPSHOT_FORMAT = 3
+# Format 2 snapshots predate document metadata and load with none
+COMPATIBLE_FORMATS = (2, 3)
+
+DEFAULT_DOCS = [
+    "TSMC reported 4% earnings beat in Q2 2024",
+    "Samsung Electronics lowered Q3 guidance by 2%",
+    "Asian tech sector shows neutral sentiment with caution on rising bond yields",
+    "Apple increases orders with Asian semiconductor suppliers",
+    "Baidu announces new AI chip collaboration with Chinese foundries"
+]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query embeddings keyed on normalized question text"""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = vector
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "capacity": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; a waiting writer blocks new readers"""
 
-class RetrieverAgent:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.index = None
-        self.text_chunks = []
-
-    def build_index(self, documents: list[str]):
-        self.text_chunks = documents
-        embeddings = self.model.encode(documents)
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(np.array(embeddings))
-
-    def query(self, question: str, top_k=3):
-        query_vec = self.model.encode([question])
-        distances, indices = self.index.search(np.array(query_vec), top_k)
-        return [self.text_chunks[i] for i in indices[0]]
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+class RetrieverAgent:
+    """ID-addressed FAISS retriever.
+
+    Every chunk gets an append-only row; the row number doubles as its FAISS id
+    in a ``VectorIndex``. Upserting a document appends a new row and removes the
+    old one, so queries only ever see fully applied updates. Dead rows are
+    dropped by ``compact()`` when a snapshot is taken; the same rebuild trains
+    IVF indexes once the corpus is large enough. Metadata filters restrict the
+    search through an ID selector, or score small candidate sets exactly. A
+    BM25 index over the same rows serves lexical and hybrid (RRF-fused) queries.
+    """
+
+    def __init__(self, data_dir: str = None, model_name: str = MODEL_NAME, compact_ratio: float = 0.3,
+                 index_config: dict = None, query_cache_size: int = 4096, exact_filter_rows: int = 4096,
+                 embedding_dtype: str = "float32", rerank_factor: int = 4, query_mode: str = "vector",
+                 hybrid_candidates: int = 100):
+        self.model_name = model_name
+        self.index_config = index_config or {}
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.data_dir = data_dir
+        self.compact_ratio = compact_ratio
+        self.exact_filter_rows = exact_filter_rows
+        self.embedding_dtype = embedding_dtype
+        self.rerank_factor = rerank_factor
+        self.query_mode = query_mode
+        self.hybrid_candidates = hybrid_candidates
+        self.lock = ReadWriteLock()
+        self.update_lock = threading.RLock()
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.stop_event = threading.Event()
+        self.query_cache = QueryEmbeddingCache(query_cache_size)
+        self.reset()
+        if not self.load_snapshot():
+            self.initialize_default_data()
+
+    def new_index(self) -> VectorIndex:
+        return VectorIndex(self.dim, **self.index_config)
+
+    def reset(self):
+        self.index = self.new_index()
+        self.embeddings = EmbeddingStore(self.dim, dtype=self.embedding_dtype)
+        self.text_chunks = TextStore()      # row -> chunk text
+        self.row_doc_ids: List[str] = []    # row -> document id
+        self.row_hashes: List[str] = []     # row -> content hash
+        self.doc_rows: Dict[str, int] = {}  # document id -> live row
+        self.hash_rows: Dict[str, int] = {} # content hash -> a row holding its embedding
+        self.metadata = MetadataIndex()     # row -> ticker/source/region/published
+        self.lexical = BM25Index()          # BM25 postings over live rows
+
+    def initialize_default_data(self):
+        self.build_index(DEFAULT_DOCS)
+
+    def __len__(self) -> int:
+        return len(self.doc_rows)
+
+    # Persistence
+
+    def load_snapshot(self) -> bool:
+        """Restore the persisted index and replay the WAL instead of re-embedding"""
+        if not self.data_dir:
+            return False
+        try:
+            snapshot = read_snapshot(
+                self.data_dir,
+                ["doc_ids", "hashes", *SNAPSHOT_STRINGS],
+                ["alive", *SNAPSHOT_ARRAYS],
+                mapped_strings=["texts"]
+            )
+        except Exception as e:
+            logger.warning(f"Could not load snapshot from {self.data_dir}: {str(e)}")
+            return False
+        if snapshot is None:
+            return False
+        manifest = snapshot["manifest"]
+        if manifest.get("model") != self.model_name or manifest.get("format") not in COMPATIBLE_FORMATS:
+            logger.info(f"Ignoring incompatible snapshot at {snapshot['path']}")
+            return False
+
+        alive = snapshot["alive"]
+        self.index = VectorIndex.restore(
+            snapshot["index"],
+            manifest["index"],
+            live_ids=np.flatnonzero(alive),
+            **{k: v for k, v in self.index_config.items() if k not in ("index_type", "metric")}
+        )
+        self.embeddings = EmbeddingStore(self.dim, snapshot["embeddings"], dtype=self.embedding_dtype)
+        self.text_chunks = TextStore(*snapshot["texts"])
+        self.row_doc_ids = snapshot["doc_ids"]
+        self.row_hashes = snapshot["hashes"]
+        self.doc_rows = {self.row_doc_ids[row]: int(row) for row in np.flatnonzero(alive)}
+        self.hash_rows = {h: row for row, h in enumerate(self.row_hashes)}
+        self.metadata = MetadataIndex.from_columns(len(self.text_chunks), snapshot, snapshot)
+        self.lexical = self._build_lexical(self.doc_rows.values())
+        self.seq = self.snapshot_seq = manifest.get("seq", 0)
+
+        records = read_wal(self.data_dir, after_seq=self.seq)
+        for record in records:
+            if record["op"] == "upsert":
+                docs = [(d["id"], d["text"], d.get("meta")) for d in record["docs"]]
+                hashes = [d["hash"] for d in record["docs"]]
+                self._apply_upsert(docs, hashes, decode_vectors(record["vectors"], self.dim))
+            elif record["op"] == "delete":
+                self._apply_delete(record["ids"])
+            self.seq = record["seq"]
+        logger.info(f"Loaded {len(self)} chunks from {snapshot['path']} and {len(records)} WAL records")
+
+        # A changed index type or metric only needs a rebuild from stored embeddings
+        configured = self.new_index()
+        if (configured.index_type, configured.metric) != (self.index.index_type, self.index.metric):
+            logger.info(f"Rebuilding {self.index.config} index as {configured.config}")
+            self.compact()
+        elif self.index.needs_rebuild:
+            self.compact()
+        return True
+
+    def save_snapshot(self):
+        """Compact if needed, write a full snapshot and trim the WAL it covers"""
+        if not self.data_dir:
+            return
+        with self.update_lock:
+            if self.seq == self.snapshot_seq and self.snapshot_seq:
+                return
+            dead = len(self.text_chunks) - len(self.doc_rows)
+            if dead and dead > self.compact_ratio * len(self.text_chunks):
+                self.compact()
+            alive = np.zeros(len(self.text_chunks), dtype=bool)
+            alive[list(self.doc_rows.values())] = True
+            meta_strings, meta_arrays = self.metadata.columns()
+            write_snapshot(
+                self.data_dir,
+                self.index.index,
+                self.embeddings,
+                {"texts": self.text_chunks, "doc_ids": self.row_doc_ids, "hashes": self.row_hashes, **meta_strings},
+                {"alive": alive, **meta_arrays},
+                {"model": self.model_name, "format": SNAPSHOT_FORMAT, "dim": self.dim,
+                 "count": len(self), "seq": self.seq, "index": self.index.config}
+            )
+            truncate_wal(self.data_dir, self.seq)
+            self.snapshot_seq = self.seq
+
+    def start_snapshotter(self, interval: float):
+        """Periodically fold the WAL into a fresh snapshot on a background thread"""
+        def run():
+            while not self.stop_event.wait(interval):
+                try:
+                    self.save_snapshot()
+                except Exception as e:
+                    logger.error(f"Snapshot failed: {str(e)}")
+
+        threading.Thread(target=run, daemon=True, name="retriever-snapshotter").start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.save_snapshot()
+
+    def _log(self, record: dict):
+        self.seq += 1
+        if self.data_dir:
+            append_wal(self.data_dir, {"seq": self.seq, **record})
+
+    def _build_lexical(self, rows) -> BM25Index:
+        lexical = BM25Index()
+        rows = sorted(rows)
+        lexical.add(rows, (self.text_chunks[row] for row in rows))
+        return lexical
+
+    def compact(self):
+        """Rebuild rows and index from live documents only, retraining the index"""
+        with self.update_lock:
+            live = sorted(self.doc_rows.values())
+            vectors = self.embeddings.get(live)
+            embeddings = EmbeddingStore(self.dim, dtype=self.embedding_dtype)
+            rows = embeddings.append(vectors)
+            index = self.new_index()
+            index.build(rows, vectors)
+            texts = TextStore()
+            texts.extend(self.text_chunks[r] for r in live)
+            doc_ids = [self.row_doc_ids[r] for r in live]
+            hashes = [self.row_hashes[r] for r in live]
+            metadata = MetadataIndex()
+            metadata.append(rows.tolist(), self.metadata.rows(live))
+            lexical = BM25Index()
+            lexical.add(rows.tolist(), texts)
+
+            with self.lock.write():
+                self.index, self.embeddings = index, embeddings
+                self.text_chunks, self.row_doc_ids, self.row_hashes = texts, doc_ids, hashes
+                self.doc_rows = {d: row for row, d in enumerate(doc_ids)}
+                self.hash_rows = {h: row for row, h in enumerate(hashes)}
+                self.metadata, self.lexical = metadata, lexical
+            logger.info(f"Compacted index to {len(live)} rows ({index.active_type})")
+
+    # Updates
+
+    def _embed(self, texts: List[str]) -> Tuple[List[str], np.ndarray, int]:
+        """Embed texts, reusing stored embeddings for content already seen"""
+        hashes = [content_hash(t) for t in texts]
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        cached = [i for i, h in enumerate(hashes) if h in self.hash_rows]
+        if cached:
+            vectors[cached] = self.embeddings.get([self.hash_rows[hashes[i]] for i in cached])
+
+        # Encode each distinct new text once
+        pending = {}
+        for i, h in enumerate(hashes):
+            if h not in self.hash_rows:
+                pending.setdefault(h, []).append(i)
+        if pending:
+            unique = [texts[positions[0]] for positions in pending.values()]
+            encoded = np.asarray(self.model.encode(unique), dtype=np.float32)
+            for vector, positions in zip(encoded, pending.values()):
+                vectors[positions] = vector
+        return hashes, vectors, len(pending)
+
+    def _apply_upsert(self, docs: List[Tuple[str, str, dict]], hashes: List[str], vectors: np.ndarray):
+        with self.lock.write():
+            replaced = [self.doc_rows[doc_id] for doc_id, _, _ in docs if doc_id in self.doc_rows]
+            if replaced:
+                self.index.remove(replaced)
+                self.lexical.remove(replaced)
+            rows = self.embeddings.append(vectors)
+            self.metadata.append(rows.tolist(), [meta for _, _, meta in docs])
+            for row, (doc_id, text, _), h in zip(rows.tolist(), docs, hashes):
+                self.text_chunks.append(text)
+                self.row_doc_ids.append(doc_id)
+                self.row_hashes.append(h)
+                self.doc_rows[doc_id] = row
+                self.hash_rows[h] = row
+            self.index.add(vectors, rows)
+            self.lexical.add(rows.tolist(), [text for _, text, _ in docs])
+
+    def _apply_delete(self, doc_ids: List[str]) -> int:
+        with self.lock.write():
+            rows = [self.doc_rows.pop(doc_id) for doc_id in doc_ids if doc_id in self.doc_rows]
+            if rows:
+                self.index.remove(rows)
+                self.lexical.remove(rows)
+            return len(rows)
+
+    def _unchanged(self, doc_id: str, text: str, meta: dict) -> bool:
+        row = self.doc_rows.get(doc_id)
+        return row is not None and self.row_hashes[row] == content_hash(text) and self.metadata.row(row) == meta
+
+    def upsert(self, documents: List[tuple], add_only: bool = False) -> dict:
+        """Insert or replace (id, text[, metadata]) documents; unchanged documents are skipped entirely"""
+        with self.update_lock:
+            latest = {doc[0]: (doc[1], normalize_metadata(doc[2] if len(doc) > 2 else None)) for doc in documents}
+            changed = [
+                (doc_id, text, meta) for doc_id, (text, meta) in latest.items()
+                if not self._unchanged(doc_id, text, meta)
+            ]
+            conflicts = []
+            if add_only:
+                conflicts = [doc_id for doc_id, _, _ in changed if doc_id in self.doc_rows]
+                changed = [doc for doc in changed if doc[0] not in self.doc_rows]
+
+            encoded = 0
+            if changed:
+                # Encoding happens outside the write lock, so queries keep running;
+                # metadata-only changes reuse the stored embedding
+                hashes, vectors, encoded = self._embed([text for _, text, _ in changed])
+                self._log({
+                    "op": "upsert",
+                    "docs": [{"id": d, "text": t, "hash": h, "meta": m} for (d, t, m), h in zip(changed, hashes)],
+                    "vectors": encode_vectors(vectors)
+                })
+                self._apply_upsert(changed, hashes, vectors)
+                if self.index.needs_rebuild:
+                    self.compact()
+
+            return {
+                "upserted": len(changed),
+                "unchanged": len(latest) - len(changed) - len(conflicts),
+                "encoded": encoded,
+                "conflicts": conflicts
+            }
+
+    def delete(self, doc_ids: List[str]) -> int:
+        with self.update_lock:
+            doc_ids = [doc_id for doc_id in doc_ids if doc_id in self.doc_rows]
+            if not doc_ids:
+                return 0
+            self._log({"op": "delete", "ids": doc_ids})
+            return self._apply_delete(doc_ids)
+
+    def build_index(self, documents: List[str]):
+        """Replace the whole corpus; documents are addressed by their content hash"""
+        with self.update_lock:
+            docs = [(content_hash(text), text) for text in documents]
+            keep = {doc_id for doc_id, _ in docs}
+            self.delete([doc_id for doc_id in list(self.doc_rows) if doc_id not in keep])
+            result = self.upsert(docs)
+            self.save_snapshot()
+            return result
+
+    # Queries
+
+    def encode_queries(self, questions: Sequence[str]) -> np.ndarray:
+        """Embed questions in one encoder call, serving repeats from the LRU cache"""
+        keys = [normalize_question(q) for q in questions]
+        vectors = np.empty((len(keys), self.dim), dtype=np.float32)
+        pending = {}
+        for i, key in enumerate(keys):
+            vector = self.query_cache.get(key) if key not in pending else None
+            if vector is None:
+                pending.setdefault(key, []).append(i)
+            else:
+                vectors[i] = vector
+        if pending:
+            encoded = np.asarray(self.model.encode([questions[p[0]] for p in pending.values()]), dtype=np.float32)
+            for key, vector, positions in zip(pending, encoded, pending.values()):
+                self.query_cache.put(key, vector)
+                vectors[positions] = vector
+        return vectors
+
+    def _search(self, query_vecs: np.ndarray, k: int, allowed: np.ndarray = None):
+        """Vector search under the read lock, restricted to ``allowed`` rows when given"""
+        if allowed is not None and len(allowed) <= self.exact_filter_rows:
+            # Few candidates: scoring them directly beats a selective ANN search
+            live = [row for row in allowed.tolist() if self.doc_rows.get(self.row_doc_ids[row]) == row]
+            return self.index.search_subset(query_vecs, self.embeddings.get(live), live, k)
+        keep_alive = []
+        selector = None
+        if allowed is not None:
+            selector = MetadataIndex.selector(allowed, len(self.text_chunks), keep_alive)
+        if self.rerank_factor > 1 and self.index.active_type in LOSSY_TYPES:
+            # Compressed codes pick candidates; stored embeddings decide the order
+            _, candidates = self.index.search(query_vecs, k * self.rerank_factor, selector=selector)
+            return self.index.rerank(query_vecs, candidates, self.embeddings.get, k)
+        return self.index.search(query_vecs, k, selector=selector)
+
+    def _hybrid(self, question: str, vector_rows: np.ndarray, allowed: np.ndarray, k: int):
+        """Fuse the vector ranking with BM25 over the same filtered rows by reciprocal rank"""
+        lexical_rows, _ = self.lexical.search(question, self.hybrid_candidates, allowed)
+        fused = reciprocal_rank_fusion([vector_rows[vector_rows >= 0].tolist(), lexical_rows.tolist()])[:k]
+        return [row for row, _ in fused], [score for _, score in fused]
+
+    def _match(self, row: int, score: float) -> dict:
+        return {
+            "id": self.row_doc_ids[row],
+            "text": self.text_chunks[row],
+            "score": float(score),
+            "metadata": self.metadata.row(row)
+        }
+
+    def query_batch(self, questions: Sequence[str], top_ks: Sequence[int],
+                    filters: Sequence[dict] = None, modes: Sequence[str] = None) -> List[List[dict]]:
+        """Answer several questions with one encode and one index search per distinct filter and mode"""
+        if not questions:
+            return []
+        if any(k <= 0 for k in top_ks):
+            raise ValueError("top_k must be positive")
+        filters = filters or [None] * len(questions)
+        modes = modes or [self.query_mode] * len(questions)
+        for mode in modes:
+            if mode not in QUERY_MODES:
+                raise ValueError(f"Unknown query mode '{mode}', expected one of {', '.join(QUERY_MODES)}")
+        needs_vectors = [i for i, mode in enumerate(modes) if mode != "lexical"]
+        query_vecs = np.empty((len(questions), self.dim), dtype=np.float32)
+        if needs_vectors:
+            query_vecs[needs_vectors] = self.encode_queries([questions[i] for i in needs_vectors])
+        groups = {}
+        for i, (query_filters, mode) in enumerate(zip(filters, modes)):
+            groups.setdefault((filter_signature(query_filters), mode), []).append(i)
+
+        results = [None] * len(questions)
+        with self.lock.read():
+            for (_, mode), positions in groups.items():
+                query_filters = filters[positions[0]]
+                allowed = self.metadata.allowed_rows(query_filters) if query_filters else None
+                k = max(top_ks[i] for i in positions)
+                if mode == "lexical":
+                    for i in positions:
+                        rows, scores = self.lexical.search(questions[i], top_ks[i], allowed)
+                        results[i] = [self._match(row, score) for row, score in zip(rows.tolist(), scores)]
+                    continue
+                if mode == "hybrid":
+                    k = max(k, self.hybrid_candidates)
+                scores, indices = self._search(query_vecs[positions], k, allowed)
+                for i, row_scores, row_ids in zip(positions, scores, indices):
+                    if mode == "hybrid":
+                        row_ids, row_scores = self._hybrid(questions[i], row_ids, allowed, top_ks[i])
+                    results[i] = [
+                        self._match(row, score)
+                        for row, score in zip(row_ids[:top_ks[i]], row_scores) if row != -1
+                    ]
+        return results
+
+    def query(self, question: str, top_k=3, filters: dict = None, mode: str = None) -> List[str]:
+        return [match["text"] for match in self.query_batch([question], [top_k], [filters], [mode or self.query_mode])[0]]
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional
+import numpy as np
+import base64
+import logging
+import faiss
+import shutil
+import json
+import time
+import os
+
+logger = logging.getLogger("retriever-agent")
+
+CURRENT = "CURRENT"
+WAL = "wal.ndjson"
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_strings(directory: str, name: str, strings: List[str]):
+    """Store strings as one UTF-8 buffer plus an int64 offsets array (N + 1 entries)"""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for i, text in enumerate(strings):
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+
+def read_strings(directory: str, name: str) -> List[str]:
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"))
+    with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+        buffer = f.read()
+    return [buffer[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def open_strings(directory: str, name: str):
+    """Memory-map strings written by ``write_strings`` as (uint8 buffer, offsets)"""
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"))
+    path = os.path.join(directory, f"{name}.bin")
+    if not os.path.getsize(path):
+        return np.zeros(0, dtype=np.uint8), offsets
+    return np.memmap(path, dtype=np.uint8, mode="r"), offsets
+
+
+def write_embeddings(path: str, embeddings):
+    """Write an ndarray, or a store exposing ``shape`` and ``iter_chunks()``, as .npy"""
+    if isinstance(embeddings, np.ndarray):
+        np.save(path, embeddings)
+        return
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=embeddings.dtype, shape=embeddings.shape)
+    start = 0
+    for chunk in embeddings.iter_chunks():
+        out[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    out.flush()
+    del out
+
+
+def write_snapshot(data_dir: str, index, embeddings, strings: Dict[str, List[str]],
+                   arrays: Dict[str, np.ndarray], manifest: dict) -> str:
+    """Write a complete snapshot to a temp dir, then atomically repoint CURRENT at it"""
+    os.makedirs(data_dir, exist_ok=True)
+    name = f"snapshot-{time.time_ns()}"
+    tmp_dir = os.path.join(data_dir, f"{name}.tmp")
+    os.makedirs(tmp_dir)
+
+    faiss.write_index(index, os.path.join(tmp_dir, "index.faiss"))
+    write_embeddings(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+    for key, values in strings.items():
+        write_strings(tmp_dir, key, values)
+    for key, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{key}.npy"), values)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump({**manifest, "created_at": time.time()}, f)
+    for filename in os.listdir(tmp_dir):
+        with open(os.path.join(tmp_dir, filename), "rb") as f:
+            os.fsync(f.fileno())
+
+    os.replace(tmp_dir, os.path.join(data_dir, name))
+    pointer = os.path.join(data_dir, f"{CURRENT}.tmp")
+    with open(pointer, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(data_dir, CURRENT))
+    _fsync_dir(data_dir)
+
+    # Older snapshots (and temp dirs left by a crash) are no longer reachable
+    for entry in os.listdir(data_dir):
+        if entry.startswith("snapshot-") and entry != name:
+            shutil.rmtree(os.path.join(data_dir, entry), ignore_errors=True)
+    return os.path.join(data_dir, name)
+
+
+def read_snapshot(data_dir: str, strings: List[str], arrays: List[str],
+                  mapped_strings: List[str] = ()) -> Optional[dict]:
+    """Load the current snapshot; embeddings and ``mapped_strings`` are memory-mapped rather than read into RAM"""
+    pointer = os.path.join(data_dir, CURRENT)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        directory = os.path.join(data_dir, f.read().strip())
+
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    # Columns added by later formats may be absent from older snapshots
+    return {
+        "manifest": manifest,
+        "index": faiss.read_index(os.path.join(directory, "index.faiss")),
+        "embeddings": np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r"),
+        **{key: read_strings(directory, key) for key in strings
+           if os.path.exists(os.path.join(directory, f"{key}.bin"))},
+        **{key: np.load(os.path.join(directory, f"{key}.npy")) for key in arrays
+           if os.path.exists(os.path.join(directory, f"{key}.npy"))},
+        **{key: open_strings(directory, key) for key in mapped_strings},
+        "path": directory,
+    }
+
+
+def encode_vectors(vectors: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vectors(data: str, dim: int) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(-1, dim)
+
+
+def append_wal(data_dir: str, record: dict):
+    """Durably append one update record to the write-ahead log"""
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, WAL), "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_wal(data_dir: str, after_seq: int = 0) -> List[dict]:
+    """Records after ``after_seq``; a torn tail from a crash is cut off so later appends start clean"""
+    path = os.path.join(data_dir, WAL)
+    if not os.path.exists(path):
+        return []
+    records, good_offset = [], 0
+    with open(path, "rb+") as f:
+        for line in f:
+            # A line without its newline is a torn write even if it happens to parse
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn final write from a crash
+            good_offset += len(line)
+            if record["seq"] > after_seq:
+                records.append(record)
+        if f.seek(0, os.SEEK_END) > good_offset:
+            logger.warning(f"Truncating torn write-ahead log tail at byte {good_offset}")
+            f.truncate(good_offset)
+            f.flush()
+            os.fsync(f.fileno())
+    return records
+
+
+def truncate_wal(data_dir: str, upto_seq: int):
+    """Drop records already captured by a snapshot"""
+    path = os.path.join(data_dir, WAL)
+    if not os.path.exists(path):
+        return
+    remaining = read_wal(data_dir, after_seq=upto_seq)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        for record in remaining:
+            f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,96 @@
+from typing import Iterable, Iterator, Sequence
+from array import array
+import numpy as np
+
+
+class EmbeddingStore:
+    """Row-addressed embeddings, stored as float32 or float16 and read back as float32.
+
+    Rows loaded from a snapshot stay in the memory-mapped ``base`` array; rows
+    appended since live in an in-memory ``tail`` buffer that grows by doubling.
+    """
+
+    def __init__(self, dim: int, base: np.ndarray = None, dtype: str = "float32"):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.base = base if base is not None else np.zeros((0, dim), dtype=self.dtype)
+        self.tail = np.zeros((1024, dim), dtype=self.dtype)
+        self.tail_len = 0
+
+    def __len__(self) -> int:
+        return len(self.base) + self.tail_len
+
+    @property
+    def shape(self):
+        return (len(self), self.dim)
+
+    def append(self, vectors: np.ndarray) -> np.ndarray:
+        """Append vectors and return their row numbers"""
+        n = len(vectors)
+        if self.tail_len + n > len(self.tail):
+            capacity = max(len(self.tail) * 2, self.tail_len + n)
+            grown = np.zeros((capacity, self.dim), dtype=self.dtype)
+            grown[:self.tail_len] = self.tail[:self.tail_len]
+            self.tail = grown
+        self.tail[self.tail_len:self.tail_len + n] = vectors
+        rows = np.arange(len(self), len(self) + n, dtype=np.int64)
+        self.tail_len += n
+        return rows
+
+    def get(self, rows: Sequence[int]) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_base = rows < len(self.base)
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.tail[rows[~in_base] - len(self.base)]
+        return out
+
+    def iter_chunks(self, chunk_rows: int = 65536) -> Iterator[np.ndarray]:
+        for start in range(0, len(self.base), chunk_rows):
+            yield np.asarray(self.base[start:start + chunk_rows])
+        for start in range(0, self.tail_len, chunk_rows):
+            yield self.tail[start:min(start + chunk_rows, self.tail_len)]
+
+
+class TextStore:
+    """Row-addressed strings in one contiguous UTF-8 buffer indexed by int64 offsets.
+
+    Rows loaded from a snapshot are sliced out of the memory-mapped ``base``
+    buffer; rows appended since go to a ``bytearray`` tail. Either way a row
+    costs its encoded bytes plus one offset, not a Python ``str`` object.
+    """
+
+    def __init__(self, base: np.ndarray = None, base_offsets: np.ndarray = None):
+        self.base = base if base is not None else np.zeros(0, dtype=np.uint8)
+        self.base_offsets = base_offsets if base_offsets is not None else np.zeros(1, dtype=np.int64)
+        self.base_len = len(self.base_offsets) - 1
+        self.tail = bytearray()
+        self.tail_offsets = array("q", [0])
+
+    def __len__(self) -> int:
+        return self.base_len + len(self.tail_offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        if row < 0:
+            row += len(self)
+        if row < self.base_len:
+            return self.base[self.base_offsets[row]:self.base_offsets[row + 1]].tobytes().decode("utf-8")
+        row -= self.base_len
+        return self.tail[self.tail_offsets[row]:self.tail_offsets[row + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def append(self, text: str):
+        self.tail += text.encode("utf-8")
+        self.tail_offsets.append(len(self.tail))
+
+    def extend(self, texts: Iterable[str]):
+        for text in texts:
+            self.append(text)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory; the memory-mapped base is paged in by the OS on demand"""
+        return len(self.tail) + self.tail_offsets.itemsize * len(self.tail_offsets) + self.base_offsets.nbytes
@@ -0,0 +1,189 @@
+from typing import Callable, Optional, Tuple
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "pq")
+# Types that must be trained before vectors can be added
+TRAINED_TYPES = ("ivf_flat", "ivf_pq", "sq8", "pq")
+IVF_TYPES = ("ivf_flat", "ivf_pq")
+# Types whose stored codes only approximate the vectors
+LOSSY_TYPES = ("sq8", "pq", "ivf_pq")
+METRICS = ("l2", "cosine", "ip")
+
+
+class VectorIndex:
+    """FAISS index of a configurable type over externally assigned int64 ids.
+
+    IVF and the compressed ``sq8`` (one byte per dimension) and ``pq`` (``pq_m``
+    bytes per vector) types need training, so until the corpus is large enough
+    they are served by an exact flat index of the same metric; ``needs_rebuild`` then
+    tells the owner to rebuild from its stored embeddings. HNSW cannot remove
+    vectors, so deletions there are tombstoned and excluded at search time.
+    With the ``cosine`` metric vectors are L2-normalized and scored by inner
+    product.
+    """
+
+    def __init__(self, dim: int, index_type: str = "flat", metric: str = "l2", nlist: int = None,
+                 pq_m: int = 48, hnsw_m: int = 32, nprobe: int = 16, ef_search: int = 64):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+        self.dim = dim
+        self.index_type = index_type
+        self.metric = metric
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.active_type = "flat" if index_type in TRAINED_TYPES else index_type
+        self.index = self._create(self.active_type, 0)
+        self.tombstones = set()
+
+    @property
+    def faiss_metric(self):
+        return faiss.METRIC_L2 if self.metric == "l2" else faiss.METRIC_INNER_PRODUCT
+
+    @property
+    def config(self) -> dict:
+        return {"index_type": self.index_type, "metric": self.metric, "active_type": self.active_type}
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal - len(self.tombstones)
+
+    def _nlist(self, n: int) -> int:
+        return self.nlist or int(min(65536, max(16, 4 * np.sqrt(n))))
+
+    def _pq_m(self) -> int:
+        # PQ needs the dimension split evenly; use the largest divisor not above pq_m
+        return next(m for m in range(min(self.pq_m, self.dim), 0, -1) if self.dim % m == 0)
+
+    def can_train(self, n: int) -> bool:
+        if self.index_type == "sq8":
+            return n >= 1000
+        if self.index_type == "pq":
+            return n >= 39 * 256  # 256 centroids per sub-quantizer
+        return n >= 39 * self._nlist(n)
+
+    def _max_train(self, n: int) -> int:
+        return 256 * (self._nlist(n) if self.index_type in IVF_TYPES else 256)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """True once an untrained fallback holds enough vectors to train the configured type"""
+        return self.active_type != self.index_type and self.can_train(self.index.ntotal)
+
+    def _create(self, index_type: str, n: int):
+        if index_type == "flat":
+            description = "IDMap2,Flat"
+        elif index_type == "hnsw":
+            description = f"IDMap2,HNSW{self.hnsw_m}"
+        elif index_type == "sq8":
+            description = "IDMap2,SQ8"
+        elif index_type == "pq":
+            description = f"IDMap2,PQ{self._pq_m()}"
+        elif index_type == "ivf_flat":
+            description = f"IVF{self._nlist(n)},Flat"
+        else:
+            description = f"IVF{self._nlist(n)},PQ{self._pq_m()}"
+        return faiss.index_factory(self.dim, description, self.faiss_metric)
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def build(self, ids: np.ndarray, vectors: np.ndarray, seed: int = 0):
+        """(Re)build from scratch, training the configured type if there is enough data"""
+        vectors = self._prepare(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        n = len(vectors)
+        index_type = self.index_type if self.index_type not in TRAINED_TYPES or self.can_train(n) else "flat"
+        index = self._create(index_type, n)
+        if not index.is_trained:
+            max_train = self._max_train(n)
+            sample = vectors
+            if n > max_train:
+                sample = vectors[np.random.default_rng(seed).choice(n, max_train, replace=False)]
+            index.train(sample)
+        if n:
+            index.add_with_ids(vectors, ids)
+        self.index, self.active_type, self.tombstones = index, index_type, set()
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        self.index.add_with_ids(self._prepare(vectors), np.asarray(ids, dtype=np.int64))
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.active_type == "hnsw":
+            self.tombstones.update(ids.tolist())
+        else:
+            self.index.remove_ids(ids)
+
+    def _search_params(self, selector, keep_alive: list):
+        # SWIG selectors hold raw pointers, so every intermediate goes in keep_alive
+        if self.tombstones:
+            dead = faiss.IDSelectorNot(faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype=np.int64)))
+            keep_alive.append(dead)
+            selector = faiss.IDSelectorAnd(selector, dead) if selector is not None else dead
+            keep_alive.append(selector)
+        if self.active_type in IVF_TYPES:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if self.active_type == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+    def search(self, queries: np.ndarray, k: int, selector=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, ids); scores are L2 distances or inner-product similarities"""
+        keep_alive = []
+        params = self._search_params(selector, keep_alive)
+        return self.index.search(self._prepare(queries), k, params=params)
+
+    def search_subset(self, queries: np.ndarray, vectors: np.ndarray, ids: np.ndarray,
+                      k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact search over a small candidate set, scored like ``search``"""
+        queries, vectors = self._prepare(queries), self._prepare(vectors)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        if not len(ids):
+            scores.fill(np.inf if self.metric == "l2" else -np.inf)
+            return scores, found
+        if self.metric == "l2":
+            distances = faiss.pairwise_distances(queries, vectors)
+            order = np.argsort(distances, axis=1)[:, :k]
+        else:
+            distances = queries @ vectors.T
+            order = np.argsort(-distances, axis=1)[:, :k]
+        m = order.shape[1]
+        scores[:, :m] = np.take_along_axis(distances, order, axis=1)
+        scores[:, m:] = np.inf if self.metric == "l2" else -np.inf
+        found[:, :m] = np.asarray(ids, dtype=np.int64)[order]
+        return scores, found
+
+    def rerank(self, queries: np.ndarray, candidates: np.ndarray, get_vectors: Callable[[np.ndarray], np.ndarray],
+               k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exactly rescore each query's candidate ids using full-precision vectors from ``get_vectors``"""
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        found = np.empty((len(queries), k), dtype=np.int64)
+        for i, row in enumerate(candidates):
+            row = row[row >= 0]
+            scores[i], found[i] = self.search_subset(queries[i:i + 1], get_vectors(row), row, k)
+        return scores, found
+
+    @classmethod
+    def restore(cls, index, config: dict, live_ids: Optional[np.ndarray] = None, **kwargs) -> "VectorIndex":
+        """Wrap an index loaded from disk, re-deriving HNSW tombstones from the live ids"""
+        vector_index = cls(index.d, config["index_type"], config["metric"], **kwargs)
+        vector_index.index = index
+        vector_index.active_type = config["active_type"]
+        if vector_index.active_type == "hnsw" and live_ids is not None:
+            stored = faiss.vector_to_array(faiss.downcast_index(index).id_map)
+            vector_index.tombstones = set(np.setdiff1d(stored, live_ids).tolist())
+        return vector_index
+
+    def memory_bytes(self) -> int:
+        return faiss.serialize_index(self.index).nbytes
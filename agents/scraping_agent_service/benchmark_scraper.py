@@ -0,0 +1,80 @@
+"""Fetch latency of the feed cache against the original sequential feedparser loop.
+
+Starts the fake feed server in-process with ``--feeds`` tickers and a fixed
+per-response latency, then times one request's worth of news:
+
+  sequential  feedparser.parse(url) per feed, as /scrape_news used to
+  cold        FeedCache with an empty cache: concurrent full fetches
+  warm        FeedCache within the TTL: served from memory
+  revalidate  FeedCache past the TTL: concurrent conditional GETs, all 304
+
+    python benchmark_scraper.py --feeds 50 --latency 0.2
+"""
+from fake_feeds import make_app
+from feeds import FeedCache, load_feeds
+from aiohttp import web
+import feedparser
+import argparse
+import asyncio
+import time
+
+
+async def run(args):
+    app = make_app(args.latency, args.items, interval=3600)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+
+    tickers = ",".join(f"Company{i}=T{i:03d}" for i in range(args.feeds))
+    feeds = load_feeds(tickers=tickers, url_template=f"http://127.0.0.1:{args.port}/rss/{{ticker}}")
+    rows = []
+
+    if not args.skip_sequential:
+        start = time.perf_counter()
+        for feed in feeds.values():
+            await asyncio.get_running_loop().run_in_executor(None, feedparser.parse, feed["url"])
+        rows.append(("sequential", time.perf_counter() - start))
+
+    cache = FeedCache(feeds, ttl=60, stale_ttl=3600, concurrency=args.concurrency)
+    await cache.start()
+    start = time.perf_counter()
+    result = await cache.get(feeds)
+    rows.append(("cold", time.perf_counter() - start))
+    assert all(len(items) == args.items for items in result.values())
+
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        await cache.get(feeds)
+    rows.append(("warm", (time.perf_counter() - start) / args.repeats))
+
+    # Past the stale window so the request waits on the revalidation
+    cache.ttl = cache.stale_ttl = 0
+    start = time.perf_counter()
+    await cache.get(feeds)
+    rows.append(("revalidate", time.perf_counter() - start))
+    await cache.stop()
+    await runner.cleanup()
+
+    print(f"{args.feeds} feeds, {args.latency * 1000:.0f} ms server latency, concurrency {args.concurrency}")
+    for name, seconds in rows:
+        print(f"{name:<12}{seconds * 1000:10.2f} ms")
+    print(f"server: {app['stats']}")
+    print(f"cache:  {cache.metrics()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feeds", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Local stand-in for the Yahoo Finance RSS feeds, for offline runs and benchmarks.
+
+Serves /rss/{ticker} as RSS 2.0 with a configurable latency. Every feed
+gains a new item each ``--new-item-every`` seconds and keeps the latest
+``--items``. Responses carry an ETag and Last-Modified and honour
+conditional requests with 304s. Point the scraper at it with:
+
+    python fake_feeds.py --port 8090 --latency 0.2
+    SCRAPER_FEED_URL="http://localhost:8090/rss/{ticker}" uvicorn main:app --port 8003
+"""
+from email.utils import formatdate
+from aiohttp import web
+import argparse
+import asyncio
+import hashlib
+import html
+import time
+
+STARTED_AT = time.time()
+
+
+def feed_items(ticker: str, now: float, items: int, interval: float):
+    newest = int((now - STARTED_AT) // interval) if interval > 0 else 0
+    for n in range(newest, newest - items, -1):
+        yield n, STARTED_AT + n * interval
+
+
+def render_feed(ticker: str, now: float, items: int, interval: float) -> str:
+    entries = "".join(
+        f"<item><title>{html.escape(ticker)} headline {n}</title>"
+        f"<description>{html.escape(ticker)} story {n}: results, guidance and supply-chain commentary.</description>"
+        f"<link>http://fake-feeds.local/{html.escape(ticker)}/{n}</link>"
+        f"<guid>{html.escape(ticker)}-{n}</guid>"
+        f"<pubDate>{formatdate(published, usegmt=True)}</pubDate></item>"
+        for n, published in feed_items(ticker, now, items, interval)
+    )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{html.escape(ticker)} news</title>{entries}</channel></rss>")
+
+
+def make_app(latency: float = 0.2, items: int = 20, interval: float = 60) -> web.Application:
+    stats = {"requests": 0, "not_modified": 0}
+
+    async def rss(request: web.Request) -> web.Response:
+        stats["requests"] += 1
+        await asyncio.sleep(latency)
+        ticker = request.match_info["ticker"]
+        now = time.time()
+        newest = next(feed_items(ticker, now, 1, interval))[1]
+        etag = '"' + hashlib.sha1(f"{ticker}:{newest}".encode()).hexdigest()[:16] + '"'
+        last_modified = formatdate(newest, usegmt=True)
+        if request.headers.get("If-None-Match") == etag or (
+                "If-None-Match" not in request.headers and request.headers.get("If-Modified-Since") == last_modified):
+            stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag, "Last-Modified": last_modified})
+        return web.Response(
+            text=render_feed(ticker, now, items, interval),
+            content_type="application/rss+xml",
+            headers={"ETag": etag, "Last-Modified": last_modified}
+        )
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_get("/rss/{ticker}", rss)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before each response")
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--new-item-every", type=float, default=60, help="seconds between new items per feed")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.items, args.new_item_every), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+from typing import Dict, Iterable, List, Optional
+import feedparser
+import calendar
+import aiohttp
+import asyncio
+import hashlib
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger("scraping-agent")
+
+YAHOO_FEED_URL = "https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US"
+
+DEFAULT_FEEDS = {
+    "TSMC": {"ticker": "TSM"},
+    "Samsung": {"ticker": "005930.KS"},
+}
+
+
+def load_feeds(path: Optional[str] = None, tickers: Optional[str] = None,
+               url_template: str = YAHOO_FEED_URL) -> Dict[str, dict]:
+    """Feed config by company: a JSON file of {name: {ticker, url?}}, or "Name=TICKER,..." pairs"""
+    if path:
+        with open(path) as f:
+            feeds = json.load(f)
+    elif tickers:
+        feeds = {}
+        for pair in tickers.split(","):
+            name, _, ticker = pair.strip().partition("=")
+            feeds[name.strip()] = {"ticker": (ticker or name).strip()}
+    else:
+        feeds = DEFAULT_FEEDS
+    return {
+        name: {"ticker": feed["ticker"], "url": feed.get("url") or url_template.format(ticker=feed["ticker"])}
+        for name, feed in feeds.items()
+    }
+
+
+def entry_id(entry) -> str:
+    """Stable identity of a feed item: its guid, else its link, else a hash of its text"""
+    key = entry.get("id") or entry.get("link")
+    if key:
+        return key
+    return hashlib.sha1(f"{entry.get('title', '')}\n{entry.get('summary', '')}".encode("utf-8")).hexdigest()
+
+
+def parse_entries(body: bytes) -> List[dict]:
+    """Items of an RSS/Atom document, newest first where they carry a date"""
+    items = []
+    for entry in feedparser.parse(body).entries:
+        published = entry.get("published_parsed") or entry.get("updated_parsed")
+        items.append({
+            "id": entry_id(entry),
+            "title": entry.get("title", ""),
+            "summary": entry.get("summary", ""),
+            "link": entry.get("link"),
+            "published": calendar.timegm(published) if published else None
+        })
+    return items
+
+
+class FeedCache:
+    """TTL cache of RSS feeds with conditional GETs, stale-while-revalidate and item de-duplication.
+
+    Feeds younger than ``ttl`` are served as-is; up to ``stale_ttl`` old they
+    are served at once while a refresh runs in the background; anything older
+    or missing is fetched before returning. Refreshes send the stored ETag and
+    Last-Modified, so an unchanged feed costs a 304 and no parsing. Items are
+    merged by id across polls, so a story seen before is never duplicated.
+    Changes are saved to ``cache_path`` at most ``save_delay`` seconds after a
+    fetch makes them, so validators survive a crash as well as a clean stop.
+    """
+
+    def __init__(self, feeds: Dict[str, dict], ttl: float = 300, stale_ttl: float = 3600,
+                 concurrency: int = 16, timeout: float = 10, max_items: int = 50,
+                 cache_path: str = None, save_delay: float = 5):
+        self.feeds = feeds
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.max_items = max_items
+        self.cache_path = cache_path
+        self.save_delay = save_delay
+        self.pending_save: asyncio.TimerHandle = None
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session: aiohttp.ClientSession = None
+        self.entries: Dict[str, dict] = {}
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.refresher: asyncio.Task = None
+        self.dirty = False
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "fetches": 0, "not_modified": 0,
+                      "errors": 0, "new_items": 0, "duplicate_items": 0, "fetch_seconds": 0.0}
+        self.load()
+
+    async def start(self, refresh_interval: float = 0):
+        # Every feed usually lives on one host, so the per-host limit is the real concurrency
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=self.concurrency, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        if refresh_interval > 0:
+            self.refresher = asyncio.create_task(self._refresh_loop(refresh_interval))
+
+    async def stop(self):
+        if self.refresher is not None:
+            self.refresher.cancel()
+        if self.pending_save is not None:
+            self.pending_save.cancel()
+        if self.session is not None:
+            await self.session.close()
+        self.save()
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable feed cache {self.cache_path}: {str(e)}")
+
+    def save(self):
+        """Atomically write the cache (items and validators) if it changed since the last save"""
+        self.pending_save = None
+        if not self.cache_path or not self.dirty:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save feed cache {self.cache_path}: {str(e)}")
+            return
+        self.dirty = False
+
+    def _schedule_save(self):
+        """Debounced save: one write covers every fetch that lands within ``save_delay``"""
+        if self.cache_path and self.pending_save is None:
+            self.pending_save = asyncio.get_running_loop().call_later(self.save_delay, self.save)
+
+    async def _fetch(self, name: str):
+        feed = self.feeds[name]
+        cached = self.entries.get(name, {})
+        headers = {}
+        # Validators only count if they belong to the URL currently configured
+        if cached.get("url") == feed["url"]:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        start = time.perf_counter()
+        try:
+            async with self.semaphore:
+                async with self.session.get(feed["url"], headers=headers) as response:
+                    if response.status == 304:
+                        self.stats["not_modified"] += 1
+                        cached["fetched_at"] = time.time()
+                        self.dirty = True
+                        self._schedule_save()
+                        return
+                    response.raise_for_status()
+                    body = await response.read()
+                    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            items = await asyncio.get_running_loop().run_in_executor(None, parse_entries, body)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Fetching feed {name} failed: {str(e)}")
+            return
+        finally:
+            self.stats["fetches"] += 1
+            self.stats["fetch_seconds"] += time.perf_counter() - start
+            self.in_flight.pop(name, None)
+
+        known = {item["id"]: item for item in cached.get("items", [])} if cached.get("url") == feed["url"] else {}
+        new = [item for item in items if item["id"] not in known]
+        now = time.time()
+        for item in items:
+            # When this cache first saw the item; downstream consumers poll with it as a cursor
+            item["first_seen"] = known[item["id"]].get("first_seen", now) if item["id"] in known else now
+        self.stats["new_items"] += len(new)
+        self.stats["duplicate_items"] += len(items) - len(new)
+        # Re-fetched items replace their old copy (titles get edited); dropped ones age out by max_items.
+        # The feed's own order breaks ties between items published in the same second
+        fetched = {item["id"] for item in items}
+        merged = items + [item for key, item in known.items() if key not in fetched]
+        merged.sort(key=lambda item: item["published"] or 0, reverse=True)
+        self.entries[name] = {
+            "url": feed["url"],
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": now,
+            "items": merged[:self.max_items]
+        }
+        self.dirty = True
+        self._schedule_save()
+
+    def refresh(self, names: Iterable[str]) -> List[asyncio.Task]:
+        """Schedule fetches, joining any already running for the same feed"""
+        tasks = []
+        for name in names:
+            task = self.in_flight.get(name)
+            if task is None:
+                task = asyncio.create_task(self._fetch(name))
+                self.in_flight[name] = task
+            tasks.append(task)
+        return tasks
+
+    async def get(self, names: Iterable[str]) -> Dict[str, List[dict]]:
+        """Cached items per feed, fetching only what is missing or too old to serve"""
+        names = [name for name in names if name in self.feeds]
+        now = time.time()
+        blocking, background = [], []
+        for name in names:
+            cached = self.entries.get(name)
+            age = now - cached["fetched_at"] if cached and cached.get("url") == self.feeds[name]["url"] else None
+            if age is not None and age < self.ttl:
+                self.stats["hits"] += 1
+            elif age is not None and age < self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                background.append(name)
+            else:
+                self.stats["misses"] += 1
+                blocking.append(name)
+
+        self.refresh(background)
+        if blocking:
+            # Shielded: a disconnecting caller shouldn't cancel fetches other callers share
+            await asyncio.shield(asyncio.gather(*self.refresh(blocking)))
+        return {name: self.entries.get(name, {}).get("items", []) for name in names}
+
+    async def since(self, cursor: float, names: Iterable[str] = None, limit: int = 1000) -> List[dict]:
+        """Items first seen after ``cursor`` across feeds, oldest first, tagged with company and ticker"""
+        items = await self.get(names or self.feeds)
+        fresh = [
+            {**item, "company": name, "ticker": self.feeds[name]["ticker"]}
+            for name, entries in items.items() for item in entries
+            if item.get("first_seen", 0) > cursor
+        ]
+        fresh.sort(key=lambda item: item["first_seen"])
+        # Never split items sharing a timestamp (one fetch), or a cursor at it would skip the rest
+        end = limit
+        while 0 < end < len(fresh) and fresh[end]["first_seen"] == fresh[end - 1]["first_seen"]:
+            end += 1
+        return fresh[:end]
+
+    async def _refresh_loop(self, interval: float):
+        """Keep every configured feed warm so requests are served from cache"""
+        while True:
+            try:
+                await asyncio.gather(*self.refresh(self.feeds))
+                self.save()
+            except Exception as e:
+                logger.error(f"Feed refresh failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        fetches = self.stats["fetches"]
+        return {
+            "feeds": len(self.feeds),
+            "cached": len(self.entries),
+            "in_flight": len(self.in_flight),
+            "hit_rate": (self.stats["hits"] + self.stats["stale_hits"]) / lookups if lookups else 0.0,
+            "avg_fetch_ms": round(self.stats["fetch_seconds"] / fetches * 1000, 2) if fetches else 0.0,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
@@ -1,23 +1,85 @@
-from fastapi import FastAPI
-import feedparser
+from fastapi import FastAPI, Query
+from typing import List, Optional
+from feeds import FeedCache, YAHOO_FEED_URL, load_feeds
+import logging
+import os
 
 app = FastAPI()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("scraping-agent")
+
+# Feeds: a JSON file of {company: {ticker, url?}}, or "Company=TICKER,..." pairs; TSMC and Samsung by default
+SCRAPER_FEEDS_PATH = os.getenv("SCRAPER_FEEDS_PATH")
+SCRAPER_TICKERS = os.getenv("SCRAPER_TICKERS")
+SCRAPER_FEED_URL = os.getenv("SCRAPER_FEED_URL", YAHOO_FEED_URL)
+
+# Feed cache configuration
+SCRAPER_TTL = float(os.getenv("SCRAPER_TTL", "300"))
+SCRAPER_STALE_TTL = float(os.getenv("SCRAPER_STALE_TTL", "3600"))
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "16"))
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "10"))
+SCRAPER_MAX_ITEMS = int(os.getenv("SCRAPER_MAX_ITEMS", "50"))
+SCRAPER_REFRESH_INTERVAL = float(os.getenv("SCRAPER_REFRESH_INTERVAL", "0"))
+SCRAPER_SAVE_DELAY = float(os.getenv("SCRAPER_SAVE_DELAY", "5"))
+SCRAPER_CACHE_PATH = os.getenv(
+    "SCRAPER_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "feed_cache.json")
+)
+
+feed_cache = FeedCache(
+    load_feeds(SCRAPER_FEEDS_PATH, SCRAPER_TICKERS, SCRAPER_FEED_URL),
+    ttl=SCRAPER_TTL,
+    stale_ttl=SCRAPER_STALE_TTL,
+    concurrency=SCRAPER_CONCURRENCY,
+    timeout=SCRAPER_TIMEOUT,
+    max_items=SCRAPER_MAX_ITEMS,
+    cache_path=SCRAPER_CACHE_PATH,
+    save_delay=SCRAPER_SAVE_DELAY
+)
+
+@app.on_event("startup")
+async def startup_event():
+    await feed_cache.start(SCRAPER_REFRESH_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await feed_cache.stop()
 
 @app.get("/scrape_news")
-def scrape_news():
-    scraped_data = {}
+async def scrape_news(company: Optional[List[str]] = Query(None), limit: int = 3):
+    """Latest items per configured company, fetched concurrently and served from the feed cache"""
+    items = await feed_cache.get(company or feed_cache.feeds)
+    return {
+        name: [{
+            "title": item["title"],
+            "summary": item["summary"],
+            "link": item["link"],
+            "published": item["published"]
+        } for item in entries[:limit]]
+        for name, entries in items.items()
+    }
+
+@app.get("/news")
+async def news_since(since: float = 0, company: Optional[List[str]] = Query(None), limit: int = 1000):
+    """Items first seen after the ``since`` cursor, oldest first, for incremental consumers"""
+    items = await feed_cache.since(since, company, limit)
+    return {
+        "items": items,
+        "cursor": items[-1]["first_seen"] if items else since,
+        "has_more": len(items) >= limit
+    }
 
-    # Use Yahoo Finance RSS feeds instead of scraping HTML
-    feeds = {
-        "TSMC": "https://feeds.finance.yahoo.com/rss/2.0/headline?s=TSM&region=US&lang=en-US",
-        "Samsung": "https://feeds.finance.yahoo.com/rss/2.0/headline?s=005930.KS&region=US&lang=en-US"
+@app.get("/feeds")
+async def list_feeds():
+    return {
+        name: {**feed, "fetched_at": feed_cache.entries.get(name, {}).get("fetched_at")}
+        for name, feed in feed_cache.feeds.items()
     }
 
-    for company, url in feeds.items():
-        feed = feedparser.parse(url)
-        scraped_data[company] = [{
-            "title": entry.title,
-            "summary": entry.summary
-        } for entry in feed.entries[:3]]  # Return top 3 news items
+@app.get("/metrics")
+async def metrics():
+    return {"feed_cache": feed_cache.metrics()}
 
-    return scraped_data
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "scraping-agent"}
@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Tuple
+import numpy as np
+import subprocess
+import asyncio
+import logging
+import queue
+import math
+import io
+
+logger = logging.getLogger("voice-agent")
+
+SAMPLING_RATE = 16000  # Whisper's input rate
+
+
+def ffmpeg_decode(data: bytes, sampling_rate: int = SAMPLING_RATE) -> np.ndarray:
+    """Decode any container/codec ffmpeg knows through pipes: bytes on stdin, raw float32 on stdout"""
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+               "-ac", "1", "-ar", str(sampling_rate), "-f", "f32le", "pipe:1"]
+    try:
+        process = subprocess.run(command, input=data, capture_output=True, check=False)
+    except FileNotFoundError:
+        raise ValueError("ffmpeg is required to decode this audio format")
+    if process.returncode != 0:
+        raise ValueError(f"Could not decode audio: {process.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+def decode_audio(data: bytes, sampling_rate: int = SAMPLING_RATE) -> np.ndarray:
+    """Mono float32 samples at ``sampling_rate`` from an uploaded clip, without touching disk"""
+    try:
+        import soundfile as sf
+
+        audio, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except Exception:
+        # MP3, M4A, WebM and the like
+        audio = ffmpeg_decode(data, sampling_rate)
+    else:
+        audio = audio.mean(axis=1)
+        if rate != sampling_rate:
+            from scipy.signal import resample_poly
+
+            divisor = math.gcd(rate, sampling_rate)
+            audio = resample_poly(audio, sampling_rate // divisor, rate // divisor).astype(np.float32)
+    if not len(audio):
+        raise ValueError("Audio contains no samples")
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def split_audio(audio: np.ndarray, chunk_seconds: float = 30, search_seconds: float = 5,
+                sampling_rate: int = SAMPLING_RATE) -> List[Tuple[int, int]]:
+    """(start, end) sample ranges of at most ``chunk_seconds``, each cut at the quietest 20 ms
+    in its last ``search_seconds`` so words are rarely split"""
+    limit = int(chunk_seconds * sampling_rate)
+    frame = int(0.02 * sampling_rate)
+    search = int(search_seconds * sampling_rate)
+    spans, start = [], 0
+    while len(audio) - start > limit:
+        window = audio[start + limit - search:start + limit]
+        frames = window[:len(window) // frame * frame].reshape(-1, frame)
+        quietest = int(np.argmin(np.einsum("ij,ij->i", frames, frames)))
+        end = start + limit - search + quietest * frame + frame // 2
+        spans.append((start, end))
+        start = end
+    spans.append((start, len(audio)))
+    return spans
+
+
+class SpeechRecognizer:
+    """Whisper transcription off the event loop, batched across requests.
+
+    Segments from every request (short clips, or the pieces of a long
+    recording) share one queue; a dispatcher groups whatever arrives within
+    ``window_ms`` into one pipeline call, and up to ``workers`` such batches run
+    at once, each on its own pipeline instance in a thread pool.
+    """
+
+    def __init__(self, model_name: str = "openai/whisper-base", workers: int = 1, max_batch_size: int = 8,
+                 window_ms: float = 20, max_queue_size: int = 256, chunk_seconds: float = 30,
+                 device: str = None):
+        self.model_name = model_name
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.chunk_seconds = chunk_seconds
+        self.device = device
+        self.pipelines: "queue.Queue" = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+        self.queue: asyncio.Queue = None
+        self.slots: asyncio.Semaphore = None
+        self.dispatcher = None
+        self.in_flight = 0
+        self.stats = {
+            "segments_total": 0,
+            "rejected_total": 0,
+            "batches_total": 0,
+            "batched_segments_total": 0,
+            "audio_seconds_total": 0.0,
+            "inference_seconds_total": 0.0,
+            "batch_size_histogram": {}
+        }
+
+    def start(self):
+        from transformers import pipeline
+
+        for _ in range(self.workers):
+            self.pipelines.put(pipeline("automatic-speech-recognition", model=self.model_name, device=self.device))
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.dispatcher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+        self.executor.shutdown(wait=False)
+
+    def _infer(self, segments: List[np.ndarray]) -> List[str]:
+        model = self.pipelines.get()
+        try:
+            outputs = model(
+                [{"raw": segment, "sampling_rate": SAMPLING_RATE} for segment in segments],
+                batch_size=len(segments)
+            )
+        finally:
+            self.pipelines.put(model)
+        return [output["text"].strip() for output in outputs]
+
+    async def submit(self, segment: np.ndarray) -> str:
+        """Queue one segment (at most ``chunk_seconds``); raises asyncio.QueueFull under backpressure"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((segment, future))
+        except asyncio.QueueFull:
+            self.stats["rejected_total"] += 1
+            raise
+        self.stats["segments_total"] += 1
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Callers that disconnected while queued don't need a slot in the batch
+        return [(segment, future) for segment, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        while True:
+            # Only collect a batch once a worker is free, so batches fill up under load
+            await self.slots.acquire()
+            batch = await self._collect()
+            if not batch:
+                self.slots.release()
+                continue
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        size = len(batch)
+        self.in_flight += size
+        self.stats["batches_total"] += 1
+        self.stats["batched_segments_total"] += size
+        histogram = self.stats["batch_size_histogram"]
+        histogram[size] = histogram.get(size, 0) + 1
+        started = loop.time()
+        try:
+            results = await loop.run_in_executor(self.executor, self._infer, [segment for segment, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch transcription failed ({size} segments): {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight -= size
+            self.slots.release()
+        self.stats["inference_seconds_total"] += loop.time() - started
+        self.stats["audio_seconds_total"] += sum(len(segment) for segment, _ in batch) / SAMPLING_RATE
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def stream(self, audio: np.ndarray) -> AsyncIterator[dict]:
+        """Partial transcripts of a recording, in order, each as soon as it and its predecessors are done"""
+        spans = split_audio(audio, self.chunk_seconds)
+        # All pieces are queued up front so they batch with each other
+        tasks = [asyncio.ensure_future(self.submit(audio[start:end])) for start, end in spans]
+        try:
+            for index, ((start, end), task) in enumerate(zip(spans, tasks)):
+                yield {
+                    "index": index,
+                    "start": round(start / SAMPLING_RATE, 2),
+                    "end": round(end / SAMPLING_RATE, 2),
+                    "text": await task
+                }
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        parts = [part["text"] async for part in self.stream(audio)]
+        return " ".join(part for part in parts if part)
+
+    def metrics(self) -> dict:
+        batches = self.stats["batches_total"]
+        inference = self.stats["inference_seconds_total"]
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.max_queue_size,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.window * 1000,
+            "avg_batch_size": round(self.stats["batched_segments_total"] / batches, 2) if batches else 0,
+            "realtime_factor": round(self.stats["audio_seconds_total"] / inference, 2) if inference else None,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
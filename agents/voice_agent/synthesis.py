@@ -0,0 +1,246 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+import numpy as np
+import unicodedata
+import threading
+import asyncio
+import hashlib
+import logging
+import struct
+import re
+import os
+
+logger = logging.getLogger("voice-agent")
+
+# A sentence ends at . ! or ? followed by whitespace and something that can start a sentence
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*(\s+)(?=[A-Z0-9\"'(\[$])")
+ABBREVIATIONS = {"inc.", "corp.", "co.", "ltd.", "vs.", "e.g.", "i.e.", "approx.", "u.s.", "mr.", "ms.", "dr.", "no."}
+
+
+def normalize_sentence(text: str) -> str:
+    """Cache key form of a sentence: NFKC, single spaces, no surrounding whitespace"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences, start = [], 0
+    for match in SENTENCE_END.finditer(text):
+        candidate = text[start:match.start(1)].strip()
+        last_word = candidate.rsplit(None, 1)[-1].lower().rstrip("\"')]") if candidate else ""
+        if last_word in ABBREVIATIONS:
+            continue
+        sentences.append(candidate)
+        start = match.end()
+    sentences.append(text[start:].strip())
+    return [normalize_sentence(s) for s in sentences if s.strip()]
+
+
+def wav_header(sample_rate: int, data_bytes: int = 0xFFFFFFFF, channels: int = 1, sample_width: int = 2) -> bytes:
+    """RIFF/WAVE header for 16-bit PCM; the default sizes mark a stream of unknown length"""
+    riff_size = 0xFFFFFFFF if data_bytes == 0xFFFFFFFF else 36 + data_bytes
+    return (b"RIFF" + struct.pack("<I", riff_size) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * channels * sample_width,
+                          channels * sample_width, sample_width * 8)
+            + b"data" + struct.pack("<I", data_bytes))
+
+
+def to_pcm16(samples) -> bytes:
+    audio = np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0)
+    return (audio * 32767).astype("<i2").tobytes()
+
+
+class SpeechCache:
+    """Synthesized PCM by sentence key: an in-memory LRU bounded by bytes over an on-disk store.
+
+    Disk entries are one ``<key>.pcm`` file each, written atomically; when the
+    directory outgrows ``max_disk_bytes`` the least recently used files go.
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_memory_bytes: int = 64 << 20, max_disk_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.disk_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".pcm"))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def _remember(self, key: str, pcm: bytes):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = pcm
+            self.memory_bytes += len(pcm)
+            while self.memory_bytes > self.max_memory_bytes and len(self.entries) > 1:
+                _, dropped = self.entries.popitem(last=False)
+                self.memory_bytes -= len(dropped)
+                self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            pcm = self.entries.get(key)
+            if pcm is not None:
+                self.entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return pcm
+        if self.cache_dir:
+            try:
+                with open(self._path(key), "rb") as f:
+                    pcm = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                pcm = None
+            if pcm is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key, pcm)
+                return pcm
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, pcm: bytes):
+        self._remember(key, pcm)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(pcm)
+            os.replace(f"{path}.tmp", path)
+            self.disk_bytes += len(pcm) - replaced
+            if self.disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+        except OSError as e:
+            # The disk tier is an optimisation: keep the audio, just don't persist it
+            logger.warning(f"Could not write speech cache entry {path}: {str(e)}")
+
+    def _trim_disk(self):
+        files = sorted((entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".pcm")),
+                       key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in files)
+        for entry in files:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["disk_evictions"] += 1
+        self.disk_bytes = total
+
+    def metrics(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        return {
+            "entries": len(self.entries),
+            "memory_bytes": self.memory_bytes,
+            "disk_bytes": self.disk_bytes,
+            "hit_rate": (self.stats["memory_hits"] + self.stats["disk_hits"]) / lookups if lookups else 0.0,
+            **self.stats
+        }
+
+
+class SpeechSynthesizer:
+    """Sentence-at-a-time TTS with caching, streamed in order.
+
+    Text is split into sentences; cached sentences cost a lookup, the rest are
+    synthesized one after another on a dedicated thread (the TTS model is not
+    thread-safe), and concurrent requests for the same sentence share one
+    synthesis. ``stream`` yields each sentence's PCM as soon as it and the
+    sentences before it are ready, so playback starts after the first one.
+    """
+
+    def __init__(self, model_name: str, cache: SpeechCache, pause_ms: int = 150):
+        self.model_name = model_name
+        self.cache = cache
+        self.pause_ms = pause_ms
+        self.model = None
+        self.sample_rate = 22050
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {"sentences": 0, "synthesized": 0, "synthesis_seconds": 0.0}
+
+    def start(self):
+        from TTS.api import TTS
+
+        self.model = TTS(model_name=self.model_name, progress_bar=False)
+        self.sample_rate = self.model.synthesizer.output_sample_rate
+
+    def stop(self):
+        self.executor.shutdown(wait=False)
+
+    def key(self, sentence: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\n{sentence}".encode("utf-8")).hexdigest()
+
+    def _synthesize(self, sentence: str) -> bytes:
+        return to_pcm16(self.model.tts(text=sentence))
+
+    async def _produce(self, sentence: str, key: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            pcm = await loop.run_in_executor(self.executor, self._synthesize, sentence)
+            await loop.run_in_executor(None, self.cache.put, key, pcm)
+        finally:
+            self.in_flight.pop(key, None)
+        self.stats["synthesized"] += 1
+        self.stats["synthesis_seconds"] += loop.time() - started
+        return pcm
+
+    def _synthesis(self, sentence: str, key: str) -> asyncio.Task:
+        """The shared synthesis task for a sentence; callers shield it, so one leaving doesn't cancel it"""
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._produce(sentence, key))
+            # Marks a failure as seen even when every caller has already gone
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.in_flight[key] = task
+        return task
+
+    async def stream(self, text: str, trailing_pause: bool = False) -> AsyncIterator[bytes]:
+        """PCM (16-bit mono at ``sample_rate``) per sentence, in order, with a short pause between;
+        ``trailing_pause`` also pauses after the last one, for streams continued by another request"""
+        sentences = split_sentences(text)
+        self.stats["sentences"] += len(sentences)
+        keys = [self.key(sentence) for sentence in sentences]
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, lambda: [self.cache.get(key) for key in keys])
+        # Misses are queued on the synthesis thread in sentence order, so the first one is never behind the rest
+        pending = {
+            key: self._synthesis(sentence, key)
+            for sentence, key, pcm in zip(sentences, keys, cached) if pcm is None
+        }
+        pause = bytes(2 * int(self.sample_rate * self.pause_ms / 1000))
+        for i, (key, pcm) in enumerate(zip(keys, cached)):
+            if pcm is None:
+                pcm = await asyncio.shield(pending[key])
+            yield pcm + pause if trailing_pause or i < len(keys) - 1 else pcm
+
+    async def synthesize(self, text: str) -> bytes:
+        """A complete WAV file for the text"""
+        pcm = b"".join([chunk async for chunk in self.stream(text)])
+        return wav_header(self.sample_rate, len(pcm)) + pcm
+
+    def metrics(self) -> dict:
+        synthesized = self.stats["synthesized"]
+        return {
+            "model": self.model_name,
+            "sample_rate": self.sample_rate,
+            "in_flight": len(self.in_flight),
+            "avg_synthesis_ms": round(self.stats["synthesis_seconds"] / synthesized * 1000, 1) if synthesized else None,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()},
+            "cache": self.cache.metrics()
+        }
@@ -1,38 +1,128 @@
-from fastapi import FastAPI, File, UploadFile, Form
-from transformers import pipeline
-from TTS.api import TTS
-import tempfile
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from stt import SpeechRecognizer, decode_audio, SAMPLING_RATE
+from synthesis import SpeechCache, SpeechSynthesizer, wav_header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import logging
+import json
 import os
 
 app = FastAPI()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("voice-agent")
 
-# STT Configuration
-stt_model = pipeline("automatic-speech-recognition", model="openai/whisper-base")
+# STT Configuration: Whisper pipelines on a worker pool, fed by a cross-request batcher
+STT_MODEL = os.getenv("STT_MODEL", "openai/whisper-base")
+STT_DEVICE = os.getenv("STT_DEVICE") or None
+STT_WORKERS = int(os.getenv("STT_WORKERS", "1"))
+STT_MAX_BATCH_SIZE = int(os.getenv("STT_MAX_BATCH_SIZE", "8"))
+STT_BATCH_WINDOW_MS = float(os.getenv("STT_BATCH_WINDOW_MS", "20"))
+STT_QUEUE_MAX_SIZE = int(os.getenv("STT_QUEUE_MAX_SIZE", "256"))
+# Long recordings are cut into pieces of at most this many seconds (Whisper's window is 30)
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "30"))
 
-# TTS Configuration
-tts = TTS(model_name="tts_models/en/ljspeech/glow-tts", progress_bar=False)
+recognizer = SpeechRecognizer(STT_MODEL, STT_WORKERS, STT_MAX_BATCH_SIZE, STT_BATCH_WINDOW_MS,
+                              STT_QUEUE_MAX_SIZE, STT_CHUNK_SECONDS, STT_DEVICE)
+
+# TTS Configuration: synthesized per sentence, cached in memory and on disk by normalized sentence
+TTS_MODEL = os.getenv("TTS_MODEL", "tts_models/en/ljspeech/glow-tts")
+TTS_CACHE_DIR = os.getenv(
+    "TTS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+)
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "1024"))
+TTS_PAUSE_MS = int(os.getenv("TTS_PAUSE_MS", "150"))
+
+synthesizer = SpeechSynthesizer(
+    TTS_MODEL,
+    SpeechCache(TTS_CACHE_DIR, TTS_CACHE_MEMORY_MB << 20, TTS_CACHE_DISK_MB << 20),
+    TTS_PAUSE_MS
+)
+
+@app.on_event("startup")
+async def startup_event():
+    recognizer.start()
+    synthesizer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await recognizer.stop()
+    synthesizer.stop()
+
+async def read_audio(file: UploadFile):
+    """Decode an upload in memory, off the event loop; 400 when it isn't audio"""
+    data = await file.read()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, decode_audio, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/stt")
 async def speech_to_text(file: UploadFile = File(...)):
+    audio = await read_audio(file)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        result = stt_model(tmp_path)
-        os.remove(tmp_path)
-        return {"transcript": result["text"]}
+        transcript = await recognizer.transcribe(audio)
+        return {"transcript": transcript, "duration_seconds": round(len(audio) / SAMPLING_RATE, 2)}
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=429, detail="Transcription queue is full", headers={"Retry-After": "1"})
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+@app.post("/stt/stream")
+async def speech_to_text_stream(file: UploadFile = File(...)):
+    """NDJSON partial transcripts of a long recording as each piece is done, then the full transcript"""
+    audio = await read_audio(file)
+
+    async def lines():
+        parts = []
+        try:
+            async for part in recognizer.stream(audio):
+                parts.append(part["text"])
+                yield json.dumps({**part, "final": False}) + "\n"
+            yield json.dumps({"transcript": " ".join(p for p in parts if p), "final": True}) + "\n"
+        except asyncio.QueueFull:
+            yield json.dumps({"error": "Transcription queue is full", "final": True}) + "\n"
+        except Exception as e:
+            logger.error(f"Streaming transcription failed: {str(e)}")
+            yield json.dumps({"error": str(e), "final": True}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/tts")
 async def text_to_speech(text: str = Form(...)):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_out:
-            audio_path = tmp_out.name
-
-        tts.tts_to_file(text=text, file_path=audio_path)
-        return FileResponse(audio_path, media_type="audio/wav", filename="speech.wav")
+        audio = await synthesizer.synthesize(text)
+        return Response(audio, media_type="audio/wav", headers={"Content-Disposition": 'inline; filename="speech.wav"'})
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
+
+@app.post("/tts/stream")
+async def text_to_speech_stream(text: str = Form(...), raw: bool = Form(False)):
+    """A streaming WAV (length left open) whose audio arrives sentence by sentence.
+
+    With ``raw`` the body is bare PCM ending in a pause, so callers speaking a
+    text one sentence at a time can concatenate responses behind one header.
+    """
+    async def chunks():
+        if not raw:
+            yield wav_header(synthesizer.sample_rate)
+        try:
+            async for pcm in synthesizer.stream(text, trailing_pause=raw):
+                yield pcm
+        except Exception as e:
+            # Headers are gone by now; end the stream after the sentences that made it
+            logger.error(f"Streaming synthesis failed: {str(e)}")
+
+    if raw:
+        return StreamingResponse(
+            chunks(),
+            # 16-bit little-endian mono; audio/L16 would promise big-endian
+            media_type="application/octet-stream",
+            headers={"X-Sample-Rate": str(synthesizer.sample_rate)}
+        )
+    return StreamingResponse(chunks(), media_type="audio/wav")
+
+@app.get("/metrics")
+async def metrics():
+    return {"stt": recognizer.metrics(), "tts": synthesizer.metrics()}
@@ -1,9 +1,19 @@
 import pandas as pd
 import yfinance as yf
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents", "api_agent_service"))
+from portfolio_store import PORTFOLIO_COLUMNS, load_portfolio, resolve_portfolio
 
 class APIAgent:
     def __init__(self, portfolio_path="data_ingestion/portfolio.csv"):
-        self.portfolio = pd.read_csv(portfolio_path)
+        # The memory-mapped Arrow copy when it is up to date, else the CSV itself
+        path = resolve_portfolio(portfolio_path)
+        if path != portfolio_path:
+            self.portfolio = load_portfolio(path, PORTFOLIO_COLUMNS).to_pandas()
+        else:
+            self.portfolio = pd.read_csv(portfolio_path)
 
     def get_asia_tech_exposure(self):
         asia_tech = self.portfolio[
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("orchestrator")
+
+
+class TTLCache:
+    """In-process LRU of values with per-entry TTLs, single-flight fetches and stale-while-revalidate.
+
+    Concurrent misses for one key share a single fetch. An entry past its
+    ``ttl`` but within ``stale_ttl`` more is returned at once while one
+    background fetch replaces it (when ``stale_while_revalidate`` is on).
+    Fetches returning None count as failures and are never cached, so an
+    outage isn't remembered past the call that saw it.
+    """
+
+    def __init__(self, max_entries: int = 1024, stale_while_revalidate: bool = True):
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        # key -> (value, stored_at, ttl, stale_ttl)
+        self.entries: "OrderedDict[str, Tuple[Any, float, float, float]]" = OrderedDict()
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "fetches": 0,
+                      "fetch_errors": 0, "evictions": 0, "expired": 0}
+
+    def put(self, key: str, value: Any, ttl: float, stale_ttl: float = 0):
+        if value is None or ttl <= 0:
+            return
+        self.entries[key] = (value, time.time(), ttl, stale_ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        """(value, fresh): fresh entries, or stale ones that may still be served; (None, False) otherwise"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, False
+        value, stored_at, ttl, stale_ttl = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            self.entries.move_to_end(key)
+            return value, True
+        if self.stale_while_revalidate and age < ttl + stale_ttl:
+            return value, False
+        del self.entries[key]
+        self.stats["expired"] += 1
+        return None, False
+
+    def get(self, key: str) -> Optional[Any]:
+        """A fresh value or None, counted as a hit or miss; for callers that fill the cache themselves"""
+        value, fresh = self.lookup(key)
+        self.stats["hits" if fresh else "misses"] += 1
+        return value if fresh else None
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable], ttl: float, stale_ttl: float):
+        self.stats["fetches"] += 1
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.stats["fetch_errors"] += 1
+            logger.error(f"Cache fill for {key} failed: {str(e)}")
+            return None
+        finally:
+            self.in_flight.pop(key, None)
+        if value is None:
+            self.stats["fetch_errors"] += 1
+        self.put(key, value, ttl, stale_ttl)
+        return value
+
+    def _start(self, key: str, fetch: Callable[[], Awaitable], ttl: float, stale_ttl: float) -> asyncio.Task:
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch, ttl, stale_ttl))
+            self.in_flight[key] = task
+        else:
+            self.stats["coalesced"] += 1
+        return task
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable], ttl: float, stale_ttl: float = 0):
+        """The cached value for ``key``, calling ``fetch`` at most once across concurrent callers"""
+        value, fresh = self.lookup(key)
+        if fresh:
+            self.stats["hits"] += 1
+            return value
+        if value is not None:
+            self.stats["stale_hits"] += 1
+            self._start(key, fetch, ttl, stale_ttl)
+            return value
+        self.stats["misses"] += 1
+        # Shielded: a disconnecting caller shouldn't cancel a fetch other callers share
+        return await asyncio.shield(self._start(key, fetch, ttl, stale_ttl))
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            "entries": len(self.entries),
+            "capacity": self.max_entries,
+            "in_flight": len(self.in_flight),
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+            **self.stats
+        }
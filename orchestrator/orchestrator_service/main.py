@@ -1,5 +1,6 @@
 # Add to the top of your file
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 # app = FastAPI()
 
 
@@ -9,11 +10,18 @@ from fastapi import FastAPI, HTTPException, UploadFile, File
 
 
 from pydantic import BaseModel
-import requests
+from collections import OrderedDict
+from cache import TTLCache
+import asyncio
+import hashlib
+import json
 import logging
+import os
 import re
+import struct
+import uuid
+from urllib.parse import quote
 import aiohttp
-import base64
 
 app = FastAPI()
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +34,11 @@ SERVICE_CONFIG = {
         "endpoints": {
             "exposure": "/exposure",
             "earnings": "/earnings_surprises"
+        },
+        # Seconds a GET response is reused for every brief, then may be served stale while refreshed
+        "cache": {
+            "exposure": {"ttl": 60, "stale_ttl": 300},
+            "earnings": {"ttl": 300, "stale_ttl": 1800}
         }
     },
     "scraper": {
@@ -33,6 +46,9 @@ SERVICE_CONFIG = {
         "timeout": 10,
         "endpoints": {
             "news": "/scrape_news"
+        },
+        "cache": {
+            "news": {"ttl": 120, "stale_ttl": 600}
         }
     },
     "retriever": {
@@ -46,7 +62,8 @@ SERVICE_CONFIG = {
         "port": 8400,
         "timeout": 30,
         "endpoints": {
-            "brief": "/generate-brief"
+            "brief": "/generate-brief",
+            "brief_stream": "/generate-brief/stream"
         }
     },
     "voice": {
@@ -54,31 +71,87 @@ SERVICE_CONFIG = {
         "timeout": 15,
         "endpoints": {
             "stt": "/stt",
-            "tts": "/tts"
+            "tts": "/tts",
+            "tts_stream": "/tts/stream"
         }
     }
 }
 
-def service_url(service: str, endpoint: str) -> str:
-    return f"http://localhost:{SERVICE_CONFIG[service]['port']}{SERVICE_CONFIG[service]['endpoints'][endpoint]}"
-
-
 def service_url(service: str, endpoint: str) -> str:
     cfg = SERVICE_CONFIG[service]
-    return f"http://{cfg['host']}:{cfg['port']}{cfg['endpoints'][endpoint]}"
-
-def safe_request(method: str, url: str, json_data: dict = None, timeout: int = 5):
+    return f"http://{cfg.get('host', 'localhost')}:{cfg['port']}{cfg['endpoints'][endpoint]}"
+
+# One pooled, keep-alive client shared by every request on this worker
+http_session: aiohttp.ClientSession = None
+
+# Caching (per worker): upstream GETs with the TTLs in SERVICE_CONFIG, whole
+# summaries by normalized query plus a fingerprint of the data they were written from
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_STALE_WHILE_REVALIDATE = os.getenv("CACHE_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+BRIEF_CACHE_TTL = float(os.getenv("BRIEF_CACHE_TTL", "300"))
+BRIEF_CACHE_MAX_ENTRIES = int(os.getenv("BRIEF_CACHE_MAX_ENTRIES", "512"))
+
+upstream_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_STALE_WHILE_REVALIDATE)
+# Stale summaries are never served: a new fingerprint already means new data
+brief_cache = TTLCache(BRIEF_CACHE_MAX_ENTRIES, stale_while_revalidate=False)
+
+@app.on_event("startup")
+async def startup_event():
+    global http_session
+    connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=30)
+    http_session = aiohttp.ClientSession(connector=connector)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if http_session is not None:
+        await http_session.close()
+
+async def safe_request(method: str, service: str, endpoint: str, json_data: dict = None, timeout: float = None):
+    """Call a downstream agent, returning its JSON body or None on any failure"""
+    url = service_url(service, endpoint)
+    timeout = aiohttp.ClientTimeout(total=timeout or SERVICE_CONFIG[service]["timeout"])
     try:
         if method.lower() == 'get':
-            response = requests.get(url, timeout=timeout)
+            request = http_session.get(url, timeout=timeout)
         else:
-            response = requests.post(url, json=json_data, timeout=timeout)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.warning(f"Service call failed: {url} - {str(e)}")
+            request = http_session.post(url, json=json_data, timeout=timeout)
+        async with request as response:
+            response.raise_for_status()
+            return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.warning(f"Service call failed: {url} - {str(e) or type(e).__name__}")
         return None
 
+async def cached_request(service: str, endpoint: str):
+    """GET through the shared cache when SERVICE_CONFIG gives the endpoint a TTL;
+    concurrent callers share one upstream call"""
+    policy = SERVICE_CONFIG[service].get("cache", {}).get(endpoint)
+    if not policy:
+        return await safe_request('get', service, endpoint)
+    return await upstream_cache.get_or_fetch(
+        f"{service}:{endpoint}",
+        lambda: safe_request('get', service, endpoint),
+        policy["ttl"],
+        policy.get("stale_ttl", 0)
+    )
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def iter_sse(response: aiohttp.ClientResponse):
+    """Yield (event, data) pairs from a text/event-stream response"""
+    event, data_lines = "message", []
+    async for raw in response.content:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].lstrip())
+
 def extract_earnings_from_context(context: list) -> dict:
     earnings = {}
     for item in context:
@@ -100,99 +173,460 @@ def extract_earnings_from_context(context: list) -> dict:
 class UserQuery(BaseModel):
     user_query: str
 
-@app.post("/brief")
-async def generate_brief(payload: UserQuery):
-    components = {}
-
-    exposure = safe_request('get', service_url("api", "exposure")) or {"exposure": 0}
-    earnings_api = safe_request('get', service_url("api", "earnings")) or {}
-
-    news_data = safe_request('get', service_url("scraper", "news")) or {}
-
-    retrieved = safe_request(
-        'post', 
-        service_url("retriever", "query"),
-        {"question": payload.user_query, "top_k": 3}
-    ) or {"results": ["Market context unavailable"]}
-
-    context_items = retrieved.get("results", [])
+def build_market_data(exposure: dict, earnings_api: dict, context_items: list) -> dict:
     earnings = earnings_api if earnings_api else extract_earnings_from_context(context_items)
-
-    components["market_data"] = {
+    return {
         "exposure": exposure.get("exposure", 0),
         "earnings": earnings
     }
-    components["news"] = news_data
-    components["context"] = context_items
 
-    llm_payload = {
-        "query": payload.user_query,
+def build_llm_payload(query: str, components: dict) -> dict:
+    return {
+        "query": query,
         "market_data": components["market_data"],
         "news": components["news"],
         "retrieved_chunks": components["context"]
     }
 
-    llm_response = safe_request(
-        'post', 
-        service_url("llm", "brief"),
-        llm_payload,
-        timeout=30
-    ) or {"summary": "Summary service unavailable"}
+def brief_key(llm_payload: dict) -> str:
+    """Normalized query plus a fingerprint of the market data, news and context it is answered from"""
+    query = " ".join(llm_payload["query"].lower().split()).rstrip("?.! ")
+    data = json.dumps({k: v for k, v in llm_payload.items() if k != "query"}, sort_keys=True, default=str)
+    return hashlib.sha1(f"{query}\n{data}".encode("utf-8")).hexdigest()
+
+async def request_summary(llm_payload: dict):
+    """The LLM agent's summary, or None if it couldn't be generated"""
+    llm_response = await safe_request('post', "llm", "brief", llm_payload)
+    return llm_response.get("summary") if llm_response else None
+
+def start_market_fetches() -> dict:
+    """Start the upstream calls that don't depend on the question, so they can run while it is still being transcribed"""
+    return {
+        "exposure": asyncio.create_task(cached_request("api", "exposure")),
+        "earnings": asyncio.create_task(cached_request("api", "earnings")),
+        "news": asyncio.create_task(cached_request("scraper", "news")),
+    }
+
+async def gather_components(query: str, fetches: dict = None) -> dict:
+    fetches = fetches or start_market_fetches()
+
+    # Independent upstream calls run concurrently; each is bounded by its own
+    # SERVICE_CONFIG timeout, so the LLM waits on the slowest, not the sum.
+    exposure, earnings_api, news_data, retrieved = await asyncio.gather(
+        fetches["exposure"],
+        fetches["earnings"],
+        fetches["news"],
+        safe_request(
+            'post',
+            "retriever", "query",
+            {"question": query, "top_k": 3}
+        ),
+    )
+    exposure = exposure or {"exposure": 0}
+    earnings_api = earnings_api or {}
+    news_data = news_data or {}
+    retrieved = retrieved or {"results": ["Market context unavailable"]}
+
+    context_items = retrieved.get("results", [])
+    return {
+        "market_data": build_market_data(exposure, earnings_api, context_items),
+        "news": news_data,
+        "context": context_items
+    }
+
+async def build_brief(query: str, fetches: dict = None) -> dict:
+    components = await gather_components(query, fetches)
+    llm_payload = build_llm_payload(query, components)
+
+    # Repeats of a question over unchanged data skip the LLM; identical concurrent briefs share one call
+    summary = await brief_cache.get_or_fetch(
+        brief_key(llm_payload),
+        lambda: request_summary(llm_payload),
+        BRIEF_CACHE_TTL
+    )
 
     return {
-        "summary": llm_response.get("summary", "Summary generation failed"),
+        "summary": summary or "Summary service unavailable",
         "components": components
     }
 
+@app.post("/brief")
+async def generate_brief(payload: UserQuery):
+    return await build_brief(payload.user_query)
+
+async def summary_events(llm_payload: dict):
+    """("delta", text) pairs from the LLM agent's token stream, then ("summary", text);
+    falls back to the blocking endpoint"""
+    key = brief_key(llm_payload)
+    cached = brief_cache.get(key)
+    if cached is not None:
+        yield "summary", cached
+        return
+
+    url = service_url("llm", "brief_stream")
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=SERVICE_CONFIG["llm"]["timeout"],
+        sock_read=SERVICE_CONFIG["llm"]["timeout"]
+    )
+    streamed = []
+    try:
+        async with http_session.post(url, json=llm_payload, timeout=timeout) as response:
+            response.raise_for_status()
+            async for event, data in iter_sse(response):
+                if event == "token":
+                    streamed.append(data["text"])
+                    yield "delta", data["text"]
+                elif event == "summary":
+                    brief_cache.put(key, data["summary"], BRIEF_CACHE_TTL)
+                    yield "summary", data["summary"]
+                    return
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+        logger.warning(f"Summary stream failed: {url} - {str(e) or type(e).__name__}")
+
+    if streamed:
+        # Stream broke mid-generation: keep what the client has already seen
+        yield "summary", "".join(streamed).strip()
+        return
+
+    summary = await request_summary(llm_payload)
+    brief_cache.put(key, summary, BRIEF_CACHE_TTL)
+    yield "summary", summary or "Summary service unavailable"
+
+async def stream_summary(llm_payload: dict):
+    """Relay the summary as SSE: deltas while it is generated, then the whole text"""
+    async for kind, text in summary_events(llm_payload):
+        if kind == "delta":
+            yield sse_event("summary_delta", {"text": text})
+        else:
+            yield sse_event("summary", {"summary": text})
+
+async def brief_events(payload: UserQuery):
+    """Emit each brief component as soon as its agents answer, then the summary"""
+    pending = {
+        asyncio.create_task(cached_request("api", "exposure")): "exposure",
+        asyncio.create_task(cached_request("api", "earnings")): "earnings",
+        asyncio.create_task(cached_request("scraper", "news")): "news",
+        asyncio.create_task(safe_request(
+            'post',
+            "retriever", "query",
+            {"question": payload.user_query, "top_k": 3}
+        )): "context",
+    }
+    results = {}
+    components = {}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[pending.pop(task)] = task.result()
+
+            if "news" in results and "news" not in components:
+                components["news"] = results["news"] or {}
+                yield sse_event("news", components["news"])
+
+            if "context" in results and "context" not in components:
+                retrieved = results["context"] or {"results": ["Market context unavailable"]}
+                components["context"] = retrieved.get("results", [])
+                yield sse_event("context", components["context"])
+
+            # Earnings fall back to the retrieved context, so only wait on it when needed
+            if ("market_data" not in components and "exposure" in results and "earnings" in results
+                    and (results["earnings"] or "context" in components)):
+                components["market_data"] = build_market_data(
+                    results["exposure"] or {"exposure": 0},
+                    results["earnings"] or {},
+                    components.get("context", [])
+                )
+                yield sse_event("market_data", components["market_data"])
+    finally:
+        for task in pending:
+            task.cancel()
+
+    async for event in stream_summary(build_llm_payload(payload.user_query, components)):
+        yield event
+    yield sse_event("done", {})
+
+@app.post("/brief/stream")
+async def stream_brief(payload: UserQuery):
+    return StreamingResponse(
+        brief_events(payload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def open_speech(text: str, errors: list, raw: bool = False):
+    """Start the voice agent's streaming synthesis; returns the open response, or None on failure.
+    ``raw`` asks for bare PCM (sample rate in X-Sample-Rate) to concatenate with other sentences"""
+    form = aiohttp.FormData()
+    form.add_field("text", text)
+    if raw:
+        form.add_field("raw", "true")
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=SERVICE_CONFIG["voice"]["timeout"],
+        sock_read=SERVICE_CONFIG["voice"]["timeout"]
+    )
+    try:
+        response = await http_session.post(service_url("voice", "tts_stream"), data=form, timeout=timeout)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        errors.append(f"TTS failed: {str(e) or type(e).__name__}")
+        return None
+    if response.status != 200:
+        errors.append(f"TTS failed with status {response.status}")
+        response.release()
+        return None
+    return response
+
+async def relay_audio(response: aiohttp.ClientResponse):
+    try:
+        async for chunk in response.content.iter_any():
+            yield chunk
+    finally:
+        response.release()
+
+async def transcribe(audio: UploadFile, errors: list):
+    """The voice agent's transcript of an upload, or None if STT failed"""
+    form = aiohttp.FormData()
+    form.add_field(
+        name='file',
+        value=await audio.read(),
+        filename=audio.filename,
+        content_type=audio.content_type
+    )
+    timeout = aiohttp.ClientTimeout(total=SERVICE_CONFIG["voice"]["timeout"])
+    try:
+        async with http_session.post(service_url("voice", "stt"), data=form, timeout=timeout) as stt_resp:
+            if stt_resp.status == 200:
+                return (await stt_resp.json()).get("transcript")
+            errors.append(f"STT failed with status {stt_resp.status}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        errors.append(f"STT failed: {str(e) or type(e).__name__}")
+    return None
+
+def cancel_fetches(fetches: dict):
+    for task in fetches.values():
+        task.cancel()
+
+# Text side of recent voice briefs, by brief id; the audio response can't carry the summary
+VOICE_BRIEFS_MAX = 256
+voice_briefs: "OrderedDict[str, dict]" = OrderedDict()
+
+def remember_brief(record: dict) -> str:
+    """Keep a voice brief's text side for ``GET /voice-brief/{brief_id}``; returns its id"""
+    brief_id = uuid.uuid4().hex
+    voice_briefs[brief_id] = record
+    while len(voice_briefs) > VOICE_BRIEFS_MAX:
+        voice_briefs.popitem(last=False)
+    return brief_id
+
 @app.post("/voice-brief")
 async def voice_to_brief(audio: UploadFile = File(...)):
+    """Answer a spoken question with a spoken brief, streamed as WAV while it is synthesized.
+
+    The transcribed query and the brief id travel in X-Brief-* headers; the summary,
+    components and errors are at ``GET /voice-brief/{brief_id}``, as headers can't hold
+    a summary of any length. If speech can't be produced the response is JSON instead.
+    """
     query_text = "What's our Asia tech exposure?"  
     brief = {}
-    audio_base64 = None
     errors = []
+    speech = None
+    # Market data doesn't depend on the question: fetch it while STT runs
+    fetches = start_market_fetches()
 
     try:
         #  STT 
-        async with aiohttp.ClientSession() as session:
-            audio_bytes = await audio.read()
-            form = aiohttp.FormData()
-            form.add_field(
-                name='file',
-                value=audio_bytes,
-                filename=audio.filename,
-                content_type=audio.content_type
-            )
-            async with session.post(service_url("voice", "stt"), data=form, timeout=15) as stt_resp:
-                if stt_resp.status == 200:
-                    stt_result = await stt_resp.json()
-                    query_text = stt_result.get("transcript", query_text)
-                else:
-                    errors.append(f"STT failed with status {stt_resp.status}")
+        query_text = await transcribe(audio, errors) or query_text
 
         # Generate Brief 
-        brief = await generate_brief(UserQuery(user_query=query_text))
+        brief = await build_brief(query_text, fetches)
 
-        #  TTS 
-        async with aiohttp.ClientSession() as session:
-            tts_form = aiohttp.FormData()
-            tts_form.add_field("text", brief["summary"])
-
-            async with session.post(service_url("voice", "tts"), data=tts_form, timeout=20) as tts_resp:
-                if tts_resp.status == 200:
-                    audio_result = await tts_resp.read()
-                    audio_base64 = base64.b64encode(audio_result).decode("utf-8")
-                else:
-                    errors.append(f"TTS failed with status {tts_resp.status}")
+        #  TTS: sentences stream back as they are synthesized
+        speech = await open_speech(brief["summary"], errors)
 
     except Exception as e:
         logger.exception("Unhandled error during voice brief")
         errors.append(str(e))
+        cancel_fetches(fetches)
+
+    summary = brief.get("summary", "Briefing failed")
+    if speech is None:
+        return JSONResponse({
+            "query": query_text,
+            "summary": summary,
+            "components": brief.get("components", {}),
+            "audio": None,
+            "errors": errors
+        })
+
+    brief_id = remember_brief({"query": query_text, "summary": summary,
+                               "components": brief.get("components", {}), "errors": errors, "done": True})
+    return StreamingResponse(
+        relay_audio(speech),
+        media_type="audio/wav",
+        headers={
+            "X-Brief-Query": quote(query_text),
+            "X-Brief-Id": brief_id,
+            "Cache-Control": "no-cache"
+        }
+    )
+
+# A sentence ends at . ! or ? followed by whitespace and something that can start a sentence
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*(\s+)(?=[A-Z0-9\"'(\[$])")
+ABBREVIATIONS = {"inc.", "corp.", "co.", "ltd.", "vs.", "e.g.", "i.e.", "approx.", "u.s.", "mr.", "ms.", "dr.", "no."}
+
+class SentenceBuffer:
+    """Cuts a token stream into sentences, each released once the text after it shows it has ended"""
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        sentences, start = [], 0
+        for match in SENTENCE_END.finditer(self.text):
+            candidate = self.text[start:match.start(1)].strip()
+            last_word = candidate.rsplit(None, 1)[-1].lower().rstrip("\"')]") if candidate else ""
+            if last_word in ABBREVIATIONS:
+                continue
+            if candidate:
+                sentences.append(candidate)
+            start = match.end()
+        self.text = self.text[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest, self.text = self.text.strip(), ""
+        return [rest] if rest else []
+
+def wav_header(sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """RIFF/WAVE header for 16-bit PCM of unknown length, as streamed WAVs mark it"""
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * channels * sample_width,
+                          channels * sample_width, sample_width * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+async def pipelined_speech(llm_payload: dict, record: dict):
+    """WAV of the summary with each sentence sent to TTS as soon as the LLM has finished it.
+
+    Sentence requests are opened as they are cut, so synthesis of one overlaps
+    generation of the next, and relayed strictly in order behind one header.
+    """
+    speeches: asyncio.Queue = asyncio.Queue()
+    errors = record["errors"]
+
+    def speak(sentences: list):
+        for sentence in sentences:
+            speeches.put_nowait(asyncio.create_task(open_speech(sentence, errors, raw=True)))
+
+    async def produce():
+        buffer, streamed = SentenceBuffer(), False
+        try:
+            async for kind, text in summary_events(llm_payload):
+                if kind == "delta":
+                    streamed = True
+                    speak(buffer.feed(text))
+                else:
+                    record["summary"] = text
+                    if not streamed:
+                        # The blocking fallback answered: speak the summary in one go
+                        speak(buffer.feed(text))
+            speak(buffer.flush())
+        except Exception as e:
+            logger.exception("Summary generation failed during voice brief")
+            errors.append(str(e))
+        finally:
+            record["done"] = True
+            speeches.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    header_sent = False
+    try:
+        while (task := await speeches.get()) is not None:
+            response = await task
+            if response is None:
+                continue
+            if not header_sent:
+                yield wav_header(int(response.headers.get("X-Sample-Rate", 22050)))
+                header_sent = True
+            async for chunk in relay_audio(response):
+                yield chunk
+    finally:
+        producer.cancel()
+        while not speeches.empty():
+            task = speeches.get_nowait()
+            if task is None:
+                continue
+            if task.done() and not task.cancelled() and task.result() is not None:
+                task.result().release()
+            task.cancel()
+
+@app.post("/voice-brief/stream")
+async def voice_to_brief_stream(audio: UploadFile = File(...)):
+    """Pipelined voice brief: market data is fetched during STT, the transcript goes straight into
+    the brief, and speech starts with the first sentence the LLM completes.
+
+    The response is a streaming WAV with the query and the brief id in X-Brief-* headers;
+    the summary, components and errors are at ``GET /voice-brief/{brief_id}`` once it ends.
+    If no speech can be produced the response is JSON, as from ``/voice-brief``.
+    """
+    errors = []
+    fetches = start_market_fetches()
+    try:
+        query_text = await transcribe(audio, errors) or "What's our Asia tech exposure?"
+        components = await gather_components(query_text, fetches)
+    except Exception as e:
+        logger.exception("Unhandled error during voice brief")
+        cancel_fetches(fetches)
+        return JSONResponse({"query": None, "summary": "Briefing failed", "components": {},
+                             "audio": None, "errors": errors + [str(e)]})
+
+    record = {"query": query_text, "summary": None, "components": components, "errors": errors, "done": False}
+    brief_id = remember_brief(record)
 
+    audio_stream = pipelined_speech(build_llm_payload(query_text, components), record)
+    try:
+        # Wait for the first audio so a TTS outage can still be answered with JSON
+        first = await audio_stream.__anext__()
+    except StopAsyncIteration:
+        return JSONResponse({
+            "query": query_text,
+            "summary": record["summary"] or "Briefing failed",
+            "components": components,
+            "audio": None,
+            "errors": errors
+        })
+
+    async def relay():
+        try:
+            yield first
+            async for chunk in audio_stream:
+                yield chunk
+        finally:
+            await audio_stream.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type="audio/wav",
+        headers={
+            "X-Brief-Query": quote(query_text),
+            "X-Brief-Id": brief_id,
+            "Cache-Control": "no-cache"
+        }
+    )
+
+@app.get("/voice-brief/{brief_id}")
+async def get_voice_brief(brief_id: str):
+    record = voice_briefs.get(brief_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired brief id")
+    return {"brief_id": brief_id, **record}
+
+@app.get("/metrics")
+async def metrics():
     return {
-        "query": query_text,
-        "summary": brief.get("summary", "Briefing failed"),
-        "components": brief.get("components", {}),
-        "audio_base64": audio_base64,
-        "errors": errors
+        "upstream_cache": upstream_cache.metrics(),
+        "brief_cache": brief_cache.metrics(),
+        "voice_briefs": len(voice_briefs)
     }
-
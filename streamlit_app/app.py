@@ -1,6 +1,8 @@
+from urllib.parse import unquote
 import streamlit as st
 import requests
-import base64
+import struct
+import json
 
 st.set_page_config(page_title="Finance Briefing Assistant", layout="centered")
 
@@ -12,19 +14,65 @@ option = st.radio("Choose input method:", ("Text Query", "Voice Upload"))
 ORCHESTRATOR_URL = "http://orchestrator:8000"
 
 
+def iter_sse(response):
+    """Yield (event, data) pairs from a streaming text/event-stream response"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].lstrip())
+
+
+def finalize_wav(data: bytes) -> bytes:
+    """Fill in the sizes a streamed WAV header leaves open, for players that need them"""
+    if data[:4] != b"RIFF" or data[36:40] != b"data":
+        return data
+    return data[:4] + struct.pack("<I", len(data) - 8) + data[8:40] + struct.pack("<I", len(data) - 44) + data[44:]
+
+
 if option == "Text Query":
     query = st.text_input("Enter your query", "What's our Asia tech exposure?")
     if st.button("Generate Brief"):
-        with st.spinner("Generating summary..."):
-            response = requests.post(
-                f"{ORCHESTRATOR_URL}/brief", json={"user_query": query}
-            )
-            if response.status_code == 200:
-                result = response.json()
-                st.success("Summary:")
-                st.write(result.get("summary"))
-            else:
-                st.error("Failed to generate summary.")
+        status = st.empty()
+        summary_box = st.empty()
+        market_box, news_box, context_box = st.container(), st.container(), st.container()
+        status.info("Fetching market data, news and context...")
+        try:
+            with requests.post(
+                f"{ORCHESTRATOR_URL}/brief/stream",
+                json={"user_query": query},
+                stream=True,
+                timeout=(5, 60)
+            ) as response:
+                response.raise_for_status()
+                summary = ""
+                for event, data in iter_sse(response):
+                    if event == "market_data":
+                        with market_box.expander("Market data", expanded=False):
+                            st.json(data)
+                    elif event == "news":
+                        with news_box.expander("News", expanded=False):
+                            st.json(data)
+                    elif event == "context":
+                        with context_box.expander("Retrieved context", expanded=False):
+                            for item in data:
+                                st.write(f"- {item}")
+                    elif event == "summary_delta":
+                        status.info("Generating summary...")
+                        summary += data["text"]
+                        summary_box.markdown(summary)
+                    elif event == "summary":
+                        summary_box.markdown(data["summary"])
+                    elif event == "done":
+                        break
+                status.success("Summary:")
+        except requests.exceptions.RequestException:
+            status.error("Failed to generate summary.")
 
 else:
     uploaded_file = st.file_uploader("Upload your voice (MP3/WAV)", type=["mp3", "wav"])
@@ -32,15 +80,23 @@ else:
         with st.spinner("Processing audio and generating brief..."):
             files = {'audio': (uploaded_file.name, uploaded_file, uploaded_file.type)}
             response = requests.post(f"{ORCHESTRATOR_URL}/voice-brief", files=files)
-            if response.status_code == 200:
+            if response.status_code == 200 and response.headers.get("content-type", "").startswith("audio/"):
+                st.success(f"Transcribed Query: {unquote(response.headers.get('X-Brief-Query', ''))}")
+                # The summary is too long for a header: look it up by the brief id
+                brief = requests.get(f"{ORCHESTRATOR_URL}/voice-brief/{response.headers.get('X-Brief-Id', '')}")
+                if brief.status_code == 200:
+                    st.write("**Summary:**")
+                    st.write(brief.json().get("summary"))
+                    for error in brief.json().get("errors", []):
+                        st.warning(error)
+                st.audio(finalize_wav(response.content), format="audio/wav")
+            elif response.status_code == 200:
+                # No audio could be synthesized; the brief comes back as JSON
                 result = response.json()
                 st.success(f"Transcribed Query: {result['query']}")
                 st.write("**Summary:**")
                 st.write(result.get("summary"))
-
-                # Play the audio if available
-                audio_base64 = result.get("audio_base64")
-                if audio_base64:
-                    st.audio(base64.b64decode(audio_base64), format="audio/wav")
+                for error in result.get("errors", []):
+                    st.warning(error)
             else:
                 st.error("Voice processing failed.")